@@ -1,35 +1,127 @@
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    # the trackers below don't need it, only AnalysisEngine does
+    numpy = None
+
+# inputs of AnalysisEngine.tick, in this order, and the keys of their velocity in the analysis values
+ANALOG_INPUTS = ['LX', 'LY', 'RX', 'RY', 'LT', 'RT']
+VELOCITY_KEYS = ['LXVel', 'LYVel', 'RXVel', 'RYVel', 'LTVel', 'RTVel']
+# windows of the velocities in seconds, the short one is fps // 5 ticks at the nominal rate
+LONG_TERM_WINDOW = 1.
+# length of the density window in seconds
+DENSITY_WINDOW = 60
+# time stamps closer than this are the same instant, ie.: the ideal time stamps of the nominal rate
+TIME_EPSILON = 1e-9
+
+
+def getShortTermWindow(fps):
+    return (fps // 5) / float(fps)
+
+
+def getDuration(timestamp, last_time, fps):
+    # time covered by a sample, the first sample and the samples after a long pause count for at most the window
+    if last_time is None:
+        return 1. / fps
+    return min(max(timestamp - last_time, 0.), LONG_TERM_WINDOW)
+
+
+# Every tracker takes the time stamp of each sample, in seconds from any monotonic clock: the velocities and the
+# density are computed over time windows, whatever the rate and the regularity of the ticks. Samples given without
+# time stamp are timed at the nominal rate, 'fps'. The velocities are changes per nominal tick (1 / fps seconds),
+# so they keep the scale they had when the trackers counted ticks.
+
 class VelocityTracker:
     def __init__(self, fps):
         self._tick = 0
-        self._buffer_tick = 0
         self._FPS = fps
         self._instant_velocity = 0
         self._short_term_velocity = 0
         self._long_term_velocity = 0
-        self._BUFFER_LENGTH = fps // 5
-        self._buffer = [0]*self._BUFFER_LENGTH
-        self._history = [0]*fps
-        self._getDiscreetVel = lambda i: abs(self._buffer[i % self._BUFFER_LENGTH] - self._buffer[(i - 1) % self._BUFFER_LENGTH])
+        self._SHORT_TERM_WINDOW = getShortTermWindow(fps)
+        self._last_value = 0
+        self._last_time = None
+        # (time stamp, duration, difference with the previous value) of the samples of the short term window
+        self._diffs = deque()
+        # (time stamp, duration, short term velocity * duration) of the samples of the long term window
+        self._history = deque()
+        # running sums of both windows, updated with the entries entering and leaving them. The durations are the
+        # time covered by the samples of a window, at least the window itself. The non-zero counts give exact zeros
+        # once the input is still
+        self._diff_sum = 0
+        self._diff_duration = 0
+        self._nonzero_diffs = 0
+        self._history_sum = 0
+        self._history_duration = 0
+        self._nonzero_history = 0
+        self._since_resync = 0
 
     def __getitem__(self, item):
         if item == 'InstantVel': return self._instant_velocity
         elif item == 'ShortTermVel': return self._short_term_velocity
         elif item == 'LongTermVel': return self._long_term_velocity
 
-    def _computeVelocity(self):
-        self._instant_velocity = self._getDiscreetVel(self._buffer_tick)
-        vel_sum = 0
-        for i in range(self._BUFFER_LENGTH):
-            vel_sum += self._getDiscreetVel(i)
-        self._short_term_velocity = vel_sum / self._BUFFER_LENGTH
-        self._history[self._tick] = self._short_term_velocity
-        self._long_term_velocity = sum(self._history) / self._FPS
+    def _resync(self):
+        # sums computed again from scratch once per window length, the float error can't build up
+        self._since_resync = 0
+        self._diff_sum = sum(diff for t, duration, diff in self._diffs)
+        self._diff_duration = sum(duration for t, duration, diff in self._diffs)
+        self._nonzero_diffs = sum(1 for t, duration, diff in self._diffs if diff != 0)
+        self._history_sum = sum(weight for t, duration, weight in self._history)
+        self._history_duration = sum(duration for t, duration, weight in self._history)
+        self._nonzero_history = sum(1 for t, duration, weight in self._history if weight != 0)
+
+    def _computeVelocity(self, value, timestamp):
+        duration = getDuration(timestamp, self._last_time, self._FPS)
+        diff = abs(value - self._last_value)
+        self._last_value = value
+        self._last_time = timestamp
+        self._instant_velocity = diff / (duration * self._FPS) if duration > 0 else diff
+
+        diffs = self._diffs
+        diffs.append((timestamp, duration, diff))
+        self._diff_sum += diff
+        self._diff_duration += duration
+        self._nonzero_diffs += diff != 0
+        limit = timestamp - self._SHORT_TERM_WINDOW + TIME_EPSILON
+        while diffs[0][0] <= limit:
+            t, old_duration, old = diffs.popleft()
+            self._diff_sum -= old
+            self._diff_duration -= old_duration
+            self._nonzero_diffs -= old != 0
+        if self._nonzero_diffs:
+            self._short_term_velocity = \
+                self._diff_sum / (max(self._diff_duration, self._SHORT_TERM_WINDOW) * self._FPS)
+        else:
+            self._short_term_velocity = 0.
 
-    def tick(self, value):
-        self._tick = (self._tick + 1) % self._FPS
-        self._buffer_tick = self._tick % self._BUFFER_LENGTH
-        self._buffer[self._buffer_tick] = value
-        self._computeVelocity()
+        history = self._history
+        weight = self._short_term_velocity * duration
+        history.append((timestamp, duration, weight))
+        self._history_sum += weight
+        self._history_duration += duration
+        self._nonzero_history += weight != 0
+        limit = timestamp - LONG_TERM_WINDOW + TIME_EPSILON
+        while history[0][0] <= limit:
+            t, old_duration, old = history.popleft()
+            self._history_sum -= old
+            self._history_duration -= old_duration
+            self._nonzero_history -= old != 0
+        if self._nonzero_history:
+            self._long_term_velocity = self._history_sum / max(self._history_duration, LONG_TERM_WINDOW)
+        else:
+            self._long_term_velocity = 0.
+
+    def tick(self, value, timestamp=None):
+        if timestamp is None:
+            self._tick += 1
+            timestamp = self._tick / float(self._FPS)
+        self._since_resync += 1
+        if self._since_resync >= len(self._history):
+            self._resync()
+        self._computeVelocity(value, timestamp)
 
 
 class StickVelocityTracker:
@@ -41,9 +133,9 @@ class StickVelocityTracker:
         if item == 'X': return self._x_axis
         elif item == 'Y': return self._y_axis
 
-    def tick(self, x_value, y_value):
-        self._x_axis.tick(x_value)
-        self._y_axis.tick(y_value)
+    def tick(self, x_value, y_value, timestamp=None):
+        self._x_axis.tick(x_value, timestamp)
+        self._y_axis.tick(y_value, timestamp)
 
 
 class TriggerVelocityTracker(VelocityTracker):
@@ -51,54 +143,243 @@ class TriggerVelocityTracker(VelocityTracker):
         VelocityTracker.__init__(self, fps)
 
 
+def getDensityWeighting(length):
+    # brackets of the density window of 'length' seconds, in seconds before now, and their weight
+    # 0-7.5 sec. accounts for 75%
+    # 7.5-30 sec. accounts for 15%
+    # 30-60 sec. accounts for 10%
+    return {(0, length / 8.) : .75,
+            (length / 8., length / 2.) : .15,
+            (length / 2., length) : .1}
+
+
+class TimeBrackets:
+    """
+    class TimeBrackets
+
+    Counts time stamped events in consecutive brackets of time before now, ie.: the presses of the last 7.5 seconds,
+    of the 22.5 seconds before, and so on. Events are only moved from a bracket to the next when they get old enough,
+    so the cost depends on the number of events, not on the number of ticks. The counts can be numbers or numpy
+    arrays, one count per gamepad.
+
+    :Args:
+
+        weighting: dict
+            {(start, end): weight} of the brackets, in seconds before now, as getDensityWeighting.
+        zero: number or numpy array
+            Initial count of the brackets.
+    """
+    def __init__(self, weighting, zero=0):
+        self._brackets = sorted((start, end, weight) for (start, end), weight in weighting.items())
+        self._events = [deque() for bracket in self._brackets]
+        self._counts = [zero for bracket in self._brackets]
+
+    def add(self, timestamp, count):
+        self._events[0].append((timestamp, count))
+        self._counts[0] = self._counts[0] + count
+
+    def advance(self, now):
+        """
+        Move the events that got older than their bracket to the next one, or out of the window.
+        :return: True if a count changed
+        """
+        changed = False
+        for k, (start, end, weight) in enumerate(self._brackets):
+            events = self._events[k]
+            limit = now - end + TIME_EPSILON
+            while events and events[0][0] <= limit:
+                event = events.popleft()
+                self._counts[k] = self._counts[k] - event[1]
+                if k + 1 < len(self._brackets):
+                    self._events[k + 1].append(event)
+                    self._counts[k + 1] = self._counts[k + 1] + event[1]
+                changed = True
+        return changed
+
+    def getRate(self):
+        # weighted events per second of the brackets
+        rate = 0
+        for (start, end, weight), count in zip(self._brackets, self._counts):
+            rate = rate + count / (end - start) * weight
+        return rate
+
+
 class DensityTracker:
     def __init__(self, buttons, fps):
         self._btns = buttons
         self._FPS = fps
         self._tick = 0
-        self._time_tick = 0 # in seconds
-        self._BUFFER_LENGTH = 60 # in seconds
-        self._BUFFER_LENGTH_TICKS = self._BUFFER_LENGTH * self._FPS # in ticks
-        self._buffer = [0] * self._BUFFER_LENGTH_TICKS
+        self._BUFFER_LENGTH = DENSITY_WINDOW # in seconds
         self._btns_last_state = {}
         for btn in self._btns:
             self._btns_last_state[btn] = 0
-
-        # 0-10 sec. accounts for 50%
-        # 10-20 sec. accounts for 30%
-        # 30-60 sec. accounts for 20%
-        self._weighting = {(0, int(self._BUFFER_LENGTH_TICKS // 8)) : .75,
-                           (int(self._BUFFER_LENGTH_TICKS // 8), int(self._BUFFER_LENGTH_TICKS // 2)) : .15,
-                           (int(self._BUFFER_LENGTH_TICKS // 2), self._BUFFER_LENGTH_TICKS) : .1}
+        self._weighting = getDensityWeighting(self._BUFFER_LENGTH)
+        self._brackets = TimeBrackets(self._weighting)
         self._density = 0
 
-    def _readValues(self, values):
-        pos = self._tick + (self._time_tick * self._FPS)
-        self._buffer[pos] = 0
+    def _readValues(self, values, timestamp):
+        presses = 0
         for btn in self._btns:
             val = values[btn]
             if val != self._btns_last_state[btn]:
                 self._btns_last_state[btn] = val
                 if val:
-                    self._buffer[pos] += 1
+                    presses += 1
+        if presses:
+            self._brackets.add(timestamp, presses)
+        return presses
 
-    def _computeDensity(self):
-        pos = self._tick + (self._time_tick * self._FPS)
-        self._density = 0
-        for bracket, weight in self._weighting.items():
-            bracket_total = 0
-            for i in range(*bracket):
-                bracket_total += self._buffer[(pos - i) % self._BUFFER_LENGTH_TICKS]
-            self._density += bracket_total / (bracket[1]-bracket[0]) * weight
-        self._density *= 60
-
-    def tick(self, values):
-        self._readValues(values)
-        self._tick += 1
-        if self._tick == self._FPS:
-            self._tick = 0
-            self._time_tick = (self._time_tick + 1) % self._BUFFER_LENGTH
+    def tick(self, values, timestamp=None):
+        if timestamp is None:
+            self._tick += 1
+            timestamp = self._tick / float(self._FPS)
+        pressed = self._readValues(values, timestamp)
+        if self._brackets.advance(timestamp) or pressed:
+            self._density = self._brackets.getRate()
 
     def get(self):
-        self._computeDensity()
+        # weighted presses per second
         return self._density
+
+
+class AnalysisEngine:
+    """
+    class AnalysisEngine
+
+    Computes the analysis values of several gamepads at once with numpy. The six analog inputs of every gamepad are
+    the rows of a single ring buffer of shape (channels, samples), along with the time stamp of every sample, so each
+    feature is one array operation over all the inputs: the windows are masks of the time stamps and the velocities
+    are summed from the buffers on every tick. The button presses of all the gamepads are counted together by a
+    TimeBrackets. The results are those of StickVelocityTracker, TriggerVelocityTracker and DensityTracker.
+    The buffers grow when the samples of the last second don't fit anymore, ie.: when the tick rate goes up.
+
+    Usage:
+        engine = AnalysisEngine(60, ['A', 'B', 'X', 'Y'], count=2)
+        engine.tick([[lx, ly, rx, ry, lt, rt], ...], [[a, b, x, y], ...], time.perf_counter())
+        engine.fill([analysis_values_0, analysis_values_1])
+
+    :Args:
+
+        fps: int
+            Nominal ticks per second, as given to the trackers.
+        buttons: list
+            Names of the buttons counted by the density, the columns of the button states given to tick().
+        count: int
+            Number of gamepads.
+    """
+    def __init__(self, fps, buttons, count=1):
+        if numpy is None:
+            raise RuntimeError("The numpy analysis engine requires numpy")
+        self._FPS = fps
+        self._buttons = list(buttons)
+        self._count = count
+        channels = count * len(ANALOG_INPUTS)
+
+        # velocities, see VelocityTracker
+        self._tick = 0
+        self._SHORT_TERM_WINDOW = getShortTermWindow(fps)
+        self._index = 0
+        capacity = 2 * fps
+        self._times = numpy.full(capacity, -numpy.inf)
+        self._durations = numpy.zeros(capacity)
+        self._diffs = numpy.zeros((channels, capacity))
+        # short term velocity * duration of each sample
+        self._history = numpy.zeros((channels, capacity))
+        self._last_values = numpy.zeros(channels)
+        self._last_time = None
+        self._instant_velocity = numpy.zeros(channels)
+        self._short_term_velocity = numpy.zeros(channels)
+        self._long_term_velocity = numpy.zeros(channels)
+
+        # density, see DensityTracker
+        self._brackets = TimeBrackets(getDensityWeighting(DENSITY_WINDOW), numpy.zeros(count, dtype=int))
+        self._btns_last_state = numpy.zeros((count, len(self._buttons)), dtype=int)
+        self._density = numpy.zeros(count)
+
+    def getButtons(self):
+        return self._buttons
+
+    def _grow(self):
+        # the oldest sample becomes the first column, the new columns are after the newest one
+        index = self._index
+        self._times = numpy.concatenate([numpy.roll(self._times, -index), numpy.full(len(self._times), -numpy.inf)])
+        self._durations = numpy.concatenate([numpy.roll(self._durations, -index), numpy.zeros(len(self._durations))])
+        self._diffs = numpy.concatenate([numpy.roll(self._diffs, -index, axis=1), numpy.zeros(self._diffs.shape)],
+                                        axis=1)
+        self._history = numpy.concatenate([numpy.roll(self._history, -index, axis=1),
+                                           numpy.zeros(self._history.shape)], axis=1)
+        self._index = len(self._times) // 2
+
+    def _tickVelocities(self, values, timestamp):
+        if self._times[self._index] > timestamp - LONG_TERM_WINDOW + TIME_EPSILON:
+            # the oldest sample is still in the long term window
+            self._grow()
+        i = self._index
+        duration = getDuration(timestamp, self._last_time, self._FPS)
+        diff = numpy.abs(values - self._last_values)
+        self._last_values = values
+        self._last_time = timestamp
+        self._instant_velocity = diff / (duration * self._FPS) if duration > 0 else diff
+
+        self._times[i] = timestamp
+        self._durations[i] = duration
+        self._diffs[:, i] = diff
+        short_window = self._times > timestamp - self._SHORT_TERM_WINDOW + TIME_EPSILON
+        short_duration = max(self._durations.dot(short_window), self._SHORT_TERM_WINDOW)
+        self._short_term_velocity = self._diffs.dot(short_window) / (short_duration * self._FPS)
+        self._history[:, i] = self._short_term_velocity * duration
+        long_window = self._times > timestamp - LONG_TERM_WINDOW + TIME_EPSILON
+        long_duration = max(self._durations.dot(long_window), LONG_TERM_WINDOW)
+        self._long_term_velocity = self._history.dot(long_window) / long_duration
+        self._index = (i + 1) % len(self._times)
+
+    def _tickDensity(self, states, timestamp):
+        # a press is a button changing to a non zero value
+        changed = states != self._btns_last_state
+        pressed = False
+        if changed.any():
+            presses = numpy.add.reduce(changed & (states != 0), axis=1)
+            self._btns_last_state = states
+            pressed = presses.any()
+            if pressed:
+                self._brackets.add(timestamp, presses)
+        if self._brackets.advance(timestamp) or pressed:
+            self._density = self._brackets.getRate()
+
+    def tick(self, inputs, states, timestamp=None):
+        """
+        Add the inputs of one tick.
+        :param inputs: values of ANALOG_INPUTS of every gamepad, shape (count, 6)
+        :param states: values of the buttons of every gamepad, in the order of getButtons(), shape (count, buttons)
+        :param timestamp: time of the sample in seconds, ie.: time.perf_counter() when it was polled. Defaults to the
+        time of the next tick at the nominal rate
+        """
+        if timestamp is None:
+            self._tick += 1
+            timestamp = self._tick / float(self._FPS)
+        self._tickVelocities(numpy.array(inputs, dtype=float).reshape(-1), timestamp)
+        self._tickDensity(numpy.array(states, dtype=int), timestamp)
+
+    def getVelocities(self, index, kind='LongTermVel'):
+        """
+        :param kind: 'InstantVel', 'ShortTermVel' or 'LongTermVel', as the keys of VelocityTracker
+        :return: velocities of the ANALOG_INPUTS of a gamepad
+        """
+        velocities = {'InstantVel': self._instant_velocity, 'ShortTermVel': self._short_term_velocity,
+                      'LongTermVel': self._long_term_velocity}[kind]
+        start = index * len(ANALOG_INPUTS)
+        return velocities[start:start + len(ANALOG_INPUTS)].tolist()
+
+    def getDensity(self, index):
+        return float(self._density[index])
+
+    def fill(self, analysis_values):
+        """
+        Write the long term velocities and the density of every gamepad in its analysis values.
+        :param analysis_values: list of the analysis value dictionaries of the gamepads
+        """
+        velocities = self._long_term_velocity.reshape(self._count, len(ANALOG_INPUTS)).tolist()
+        densities = self._density.tolist()
+        for values, device_velocities, density in zip(analysis_values, velocities, densities):
+            values.update(zip(VELOCITY_KEYS, device_velocities))
+            values['Density'] = density
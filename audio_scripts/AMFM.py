@@ -375,7 +375,8 @@ def LPFUp():
 
     logAndPrint("Setting LPF cutoff to {:.2f}Hz".format(LPF_freq))
     lp_freq.value = LPF_freq
-xb1_controller.buttons['X'].setOnHoldCallback(LPFUp, True)
+# the filter sweeps repeat on a fixed grid of deadlines, a late repeat doesn't slow the sweep down
+xb1_controller.buttons['X'].setOnHoldCallback(LPFUp, True, policy="skip")
 
 
 def LPFDown():
@@ -385,7 +386,7 @@ def LPFDown():
 
     logAndPrint("Setting LPF cutoff to {:.2f}Hz".format(LPF_freq))
     lp_freq.value = LPF_freq
-xb1_controller.buttons['A'].setOnHoldCallback(LPFDown, True)
+xb1_controller.buttons['A'].setOnHoldCallback(LPFDown, True, policy="skip")
 
 
 HPF_state = False
@@ -413,7 +414,7 @@ def HPFUp():
     logAndPrint("Setting HPF cutoff to {:.2f}Hz".format(HPF_freq))
     if HPF_state:
         hp_freq.value = HPF_freq
-xb1_controller.buttons['Y'].setOnHoldCallback(HPFUp, True)
+xb1_controller.buttons['Y'].setOnHoldCallback(HPFUp, True, policy="skip")
 
 
 def HPFDown():
@@ -424,5 +425,5 @@ def HPFDown():
     logAndPrint("Setting HPF cutoff to {:.2f}Hz".format(HPF_freq))
     if HPF_state:
         hp_freq.value = HPF_freq
-xb1_controller.buttons['B'].setOnHoldCallback(HPFDown, True)
+xb1_controller.buttons['B'].setOnHoldCallback(HPFDown, True, policy="skip")
 # [end ASSIGNING CONTROLLER BUTTONS]
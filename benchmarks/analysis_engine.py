@@ -0,0 +1,93 @@
+"""
+Benchmark of the numpy analysis engine against the tracker objects, as the server runs them.
+
+Simulates 1 to 8 gamepads playing (sticks and triggers moving, buttons pressed now and then) and measures the time of
+one analysis tick of all the gamepads at several tick rates: with one StickVelocityTracker, TriggerVelocityTracker and
+DensityTracker per gamepad, as update_analysis in controller_server.py, and with a single analysis.AnalysisEngine.
+Checks that both give the same analysis values.
+
+usage: python benchmarks/analysis_engine.py [ticks]
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from analysis import (StickVelocityTracker, TriggerVelocityTracker, DensityTracker, AnalysisEngine, ANALOG_INPUTS,
+                      VELOCITY_KEYS)
+
+RATES = [60, 250, 1000]
+DEVICE_COUNTS = [1, 2, 4, 8]
+BUTTONS = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB']
+
+
+def generateFrames(nticks, count, seed=1):
+    # analog inputs and button states of every gamepad for every tick
+    rand = random.Random(seed)
+    states = [[0] * len(BUTTONS) for i in range(count)]
+    frames = []
+    for tick in range(nticks):
+        inputs = [[math.sin(tick / (10. + index + channel)) for channel in range(len(ANALOG_INPUTS))]
+                  for index in range(count)]
+        for device_states in states:
+            for b in range(len(BUTTONS)):
+                if device_states[b] or rand.random() < 0.005:
+                    device_states[b] = 1 - device_states[b]
+        frames.append((inputs, [list(device_states) for device_states in states]))
+    return frames
+
+
+def runTrackers(frames, fps, count):
+    trackers = [(StickVelocityTracker(fps), StickVelocityTracker(fps), TriggerVelocityTracker(fps),
+                 TriggerVelocityTracker(fps), DensityTracker(BUTTONS, fps)) for i in range(count)]
+    analysis = [{} for i in range(count)]
+    start = time.perf_counter()
+    for inputs, states in frames:
+        for (ls, rs, lt, rt, density), values, (lx, ly, rx, ry, ltv, rtv), device_states, in zip(
+                trackers, analysis, inputs, states):
+            ls.tick(lx, ly)
+            rs.tick(rx, ry)
+            lt.tick(ltv)
+            rt.tick(rtv)
+            density.tick(dict(zip(BUTTONS, device_states)))
+            values['LXVel'] = ls['X']['LongTermVel']
+            values['LYVel'] = ls['Y']['LongTermVel']
+            values['RXVel'] = rs['X']['LongTermVel']
+            values['RYVel'] = rs['Y']['LongTermVel']
+            values['LTVel'] = lt['LongTermVel']
+            values['RTVel'] = rt['LongTermVel']
+            values['Density'] = density.get()
+    return (time.perf_counter() - start) / len(frames), analysis
+
+
+def runEngine(frames, fps, count):
+    engine = AnalysisEngine(fps, BUTTONS, count)
+    analysis = [{} for i in range(count)]
+    start = time.perf_counter()
+    for inputs, states in frames:
+        engine.tick(inputs, states)
+        engine.fill(analysis)
+    return (time.perf_counter() - start) / len(frames), analysis
+
+
+def run(nticks):
+    print("{:>6s} {:>8s} {:>14s} {:>14s} {:>12s}".format("fps", "devices", "trackers us", "engine us", "max |diff|"))
+    for fps in RATES:
+        for count in DEVICE_COUNTS:
+            frames = generateFrames(nticks, count)
+            trackers_time, trackers_analysis = runTrackers(frames, fps, count)
+            engine_time, engine_analysis = runEngine(frames, fps, count)
+            worst = 0.
+            for expected, values in zip(trackers_analysis, engine_analysis):
+                assert expected['Density'] == values['Density'], "the densities differ"
+                for key in VELOCITY_KEYS:
+                    worst = max(worst, abs(expected[key] - values[key]))
+            print("{:6d} {:8d} {:14.1f} {:14.1f} {:12.2e}".format(
+                fps, count, trackers_time * 1e6, engine_time * 1e6, worst))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
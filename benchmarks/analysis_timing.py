@@ -0,0 +1,95 @@
+"""
+Benchmark of the analysis trackers of the server at other poll rates than the one they are built for.
+
+Builds the trackers for 60 fps, as the server does, and feeds them the same movement (a stick moving at constant
+speed) and the same playing (4 button presses per second, for more than the 60 seconds of the density) sampled on
+several schedules: 60, 250 and 1000 Hz, 60 Hz with jitter, 60 Hz with overruns (stalls of 50 ms now and then) and
+irregular event-driven timing. Each schedule is analysed with the time stamp of every sample, and without time stamps,
+as when the trackers counted ticks. Reports the long term velocity of the stick, in stick units per 60 Hz tick, and
+the density, in presses per second, against the value they should have.
+
+usage: python benchmarks/analysis_timing.py [seconds]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from analysis import StickVelocityTracker, DensityTracker
+
+FPS = 60
+BUTTONS = ['A', 'B', 'X', 'Y']
+# stick units per second, the stick moves from -1 to 1 and stays there
+STICK_SPEED = 0.5
+PRESSES_PER_SECOND = 4.
+PRESS_LENGTH = 0.1
+# time of the velocity measure, after one second of movement
+VELOCITY_TIME = 3.
+
+
+def getSchedules(seconds, seed=1):
+    # time stamps of the samples of every schedule
+    rand = random.Random(seed)
+
+    def regular(rate):
+        return [k / float(rate) for k in range(1, int(seconds * rate) + 1)]
+
+    def jittered():
+        return sorted(t + rand.uniform(-0.004, 0.004) for t in regular(FPS))
+
+    def overrun():
+        times, t = [], 0.
+        while t < seconds:
+            t += 0.05 if rand.random() < 0.05 else 1. / FPS
+            times.append(t)
+        return times
+
+    def event_driven():
+        times, t = [], 0.
+        while t < seconds:
+            t += rand.expovariate(100.)
+            times.append(t)
+        return times
+
+    return [("60 Hz", regular(60)), ("250 Hz", regular(250)), ("1000 Hz", regular(1000)),
+            ("60 Hz jitter", jittered()), ("60 Hz overrun", overrun()), ("events", event_driven())]
+
+
+def getStick(t):
+    return min(1., -1. + STICK_SPEED * t)
+
+
+def getButtons(t):
+    # the presses go round the buttons
+    press = int(t * PRESSES_PER_SECOND)
+    held = t * PRESSES_PER_SECOND - press < PRESS_LENGTH * PRESSES_PER_SECOND
+    return {btn: int(held and press % len(BUTTONS) == i) for i, btn in enumerate(BUTTONS)}
+
+
+def analyse(times, timed):
+    stick, density = StickVelocityTracker(FPS), DensityTracker(BUTTONS, FPS)
+    velocity = None
+    for t in times:
+        timestamp = t if timed else None
+        stick.tick(getStick(t), 0., timestamp)
+        density.tick(getButtons(t), timestamp)
+        if velocity is None and t >= VELOCITY_TIME:
+            velocity = stick['X']['LongTermVel']
+    return velocity, density.get()
+
+
+def run(seconds):
+    print("{:14s} {:>8s} {:>12s} {:>12s} {:>12s} {:>12s}".format(
+        "schedule", "samples", "vel ticks", "vel timed", "dens ticks", "dens timed"))
+    print("{:14s} {:>8s} {:12.5f} {:12.5f} {:12.2f} {:12.2f}".format(
+        "expected", "", STICK_SPEED / FPS, STICK_SPEED / FPS, PRESSES_PER_SECOND, PRESSES_PER_SECOND))
+    for name, times in getSchedules(seconds):
+        ticks_velocity, ticks_density = analyse(times, False)
+        timed_velocity, timed_density = analyse(times, True)
+        print("{:14s} {:8d} {:12.5f} {:12.5f} {:12.2f} {:12.2f}".format(
+            name, len(times), ticks_velocity, timed_velocity, ticks_density, timed_density))
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 70.)
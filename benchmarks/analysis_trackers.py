@@ -0,0 +1,197 @@
+"""
+Benchmark of the analysis trackers of the server, against their previous implementation.
+
+Feeds the same input stream (still, moving smoothly, then jumping) to analysis.VelocityTracker, with time windows
+updated from running sums, and to the reference tracker below, which counts ticks and sums its whole buffer and
+history on every tick. Reports the time per tick at several polling rates and the largest difference between the
+outputs of both. They aren't equal: the reference buffer is circular and also sums the difference between its newest
+and oldest values.
+
+Then feeds the same button presses (bursts and pauses, over more than the 60 seconds of the buffer) to
+analysis.DensityTracker, with time brackets, and to the reference tracker walking its whole buffer in get(). Reports
+the time of a tick followed by a get(), as in the server, and the largest difference between the densities, in presses
+per second. The reference gives presses per tick * 60, its density is scaled by fps / 60 to be compared. They aren't
+equal either: the reference brackets are one tick late and include the press 60 seconds ago.
+
+usage: python benchmarks/analysis_trackers.py [ticks]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from analysis import VelocityTracker, DensityTracker
+
+RATES = [60, 250, 1000]
+VELOCITY_KEYS = ['InstantVel', 'ShortTermVel', 'LongTermVel']
+DENSITY_BUTTONS = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB']
+DENSITY_SECONDS = 150
+# densities compared every so many ticks, the reference get() takes milliseconds at 1000 fps
+DENSITY_CHECK_INTERVAL = 97
+DENSITY_TIMED_TICKS = 300
+
+
+class ReferenceVelocityTracker:
+    # VelocityTracker before the running sums
+    def __init__(self, fps):
+        self._tick = 0
+        self._buffer_tick = 0
+        self._FPS = fps
+        self._instant_velocity = 0
+        self._short_term_velocity = 0
+        self._long_term_velocity = 0
+        self._BUFFER_LENGTH = fps // 5
+        self._buffer = [0]*self._BUFFER_LENGTH
+        self._history = [0]*fps
+        self._getDiscreetVel = lambda i: abs(self._buffer[i % self._BUFFER_LENGTH] - self._buffer[(i - 1) % self._BUFFER_LENGTH])
+
+    def __getitem__(self, item):
+        if item == 'InstantVel': return self._instant_velocity
+        elif item == 'ShortTermVel': return self._short_term_velocity
+        elif item == 'LongTermVel': return self._long_term_velocity
+
+    def _computeVelocity(self):
+        self._instant_velocity = self._getDiscreetVel(self._buffer_tick)
+        vel_sum = 0
+        for i in range(self._BUFFER_LENGTH):
+            vel_sum += self._getDiscreetVel(i)
+        self._short_term_velocity = vel_sum / self._BUFFER_LENGTH
+        self._history[self._tick] = self._short_term_velocity
+        self._long_term_velocity = sum(self._history) / self._FPS
+
+    def tick(self, value):
+        self._tick = (self._tick + 1) % self._FPS
+        self._buffer_tick = self._tick % self._BUFFER_LENGTH
+        self._buffer[self._buffer_tick] = value
+        self._computeVelocity()
+
+
+class ReferenceDensityTracker:
+    # DensityTracker before the bracket counters
+    def __init__(self, buttons, fps):
+        self._btns = buttons
+        self._FPS = fps
+        self._tick = 0
+        self._time_tick = 0 # in seconds
+        self._BUFFER_LENGTH = 60 # in seconds
+        self._BUFFER_LENGTH_TICKS = self._BUFFER_LENGTH * self._FPS # in ticks
+        self._buffer = [0] * self._BUFFER_LENGTH_TICKS
+        self._btns_last_state = {}
+        for btn in self._btns:
+            self._btns_last_state[btn] = 0
+        self._weighting = {(0, int(self._BUFFER_LENGTH_TICKS // 8)) : .75,
+                           (int(self._BUFFER_LENGTH_TICKS // 8), int(self._BUFFER_LENGTH_TICKS // 2)) : .15,
+                           (int(self._BUFFER_LENGTH_TICKS // 2), self._BUFFER_LENGTH_TICKS) : .1}
+        self._density = 0
+
+    def _readValues(self, values):
+        pos = self._tick + (self._time_tick * self._FPS)
+        self._buffer[pos] = 0
+        for btn in self._btns:
+            val = values[btn]
+            if val != self._btns_last_state[btn]:
+                self._btns_last_state[btn] = val
+                if val:
+                    self._buffer[pos] += 1
+
+    def _computeDensity(self):
+        pos = self._tick + (self._time_tick * self._FPS)
+        self._density = 0
+        for bracket, weight in self._weighting.items():
+            bracket_total = 0
+            for i in range(*bracket):
+                bracket_total += self._buffer[(pos - i) % self._BUFFER_LENGTH_TICKS]
+            self._density += bracket_total / (bracket[1]-bracket[0]) * weight
+        self._density *= 60
+
+    def tick(self, values):
+        self._readValues(values)
+        self._tick += 1
+        if self._tick == self._FPS:
+            self._tick = 0
+            self._time_tick = (self._time_tick + 1) % self._BUFFER_LENGTH
+
+    def get(self):
+        self._computeDensity()
+        return self._density
+
+
+def generateStream(nticks, seed=1):
+    # still, moving smoothly and jumping, in turns of 500 ticks
+    rand = random.Random(seed)
+    value = 0.
+    stream = []
+    for i in range(nticks):
+        phase = (i // 500) % 3
+        if phase == 1:
+            value = max(-1., min(1., value + rand.uniform(-0.1, 0.1)))
+        elif phase == 2:
+            value = rand.choice([0., 1., rand.random()])
+        stream.append(value)
+    return stream
+
+
+def generatePresses(fps, seconds, seed=1):
+    # button states of every tick: bursts of about 4 presses per second for 20 seconds, then 15 seconds of rest
+    rand = random.Random(seed)
+    values = {btn: 0 for btn in DENSITY_BUTTONS}
+    frames = []
+    for i in range(int(fps * seconds)):
+        playing = (i / float(fps)) % 35 < 20
+        for btn in DENSITY_BUTTONS:
+            if values[btn] or (playing and rand.random() < 4. / fps / len(DENSITY_BUTTONS)):
+                values[btn] = 1 - values[btn]
+        frames.append(dict(values))
+    return frames
+
+
+def timeDensity(tracker, frames):
+    start = time.perf_counter()
+    for values in frames:
+        tracker.tick(values)
+        tracker.get()
+    return (time.perf_counter() - start) / len(frames)
+
+
+def timeTracker(tracker, stream):
+    start = time.perf_counter()
+    for value in stream:
+        tracker.tick(value)
+    return (time.perf_counter() - start) / len(stream)
+
+
+def run(nticks):
+    stream = generateStream(nticks)
+    print("{:>6s} {:>16s} {:>16s} {:>14s}".format("fps", "reference us/tk", "windows us/tk", "max |diff|"))
+    for fps in RATES:
+        reference, tracker = ReferenceVelocityTracker(fps), VelocityTracker(fps)
+        worst = 0.
+        for value in stream:
+            reference.tick(value)
+            tracker.tick(value)
+            for key in VELOCITY_KEYS:
+                worst = max(worst, abs(reference[key] - tracker[key]))
+        print("{:6d} {:16.2f} {:16.2f} {:14.2e}".format(
+            fps, timeTracker(ReferenceVelocityTracker(fps), stream) * 1e6,
+            timeTracker(VelocityTracker(fps), stream) * 1e6, worst))
+
+    print()
+    print("{:>6s} {:>16s} {:>16s} {:>14s}".format("fps", "reference us/tk", "brackets us/tk", "max |diff|"))
+    for fps in RATES:
+        frames = generatePresses(fps, DENSITY_SECONDS)
+        reference, tracker = ReferenceDensityTracker(DENSITY_BUTTONS, fps), DensityTracker(DENSITY_BUTTONS, fps)
+        worst = 0.
+        for i, values in enumerate(frames):
+            reference.tick(values)
+            tracker.tick(values)
+            if i % DENSITY_CHECK_INTERVAL == 0:
+                worst = max(worst, abs(reference.get() * fps / 60. - tracker.get()))
+        print("{:6d} {:16.2f} {:16.2f} {:14.2e}".format(
+            fps, timeDensity(ReferenceDensityTracker(DENSITY_BUTTONS, fps), frames[:DENSITY_TIMED_TICKS]) * 1e6,
+            timeDensity(DensityTracker(DENSITY_BUTTONS, fps), frames) * 1e6, worst))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
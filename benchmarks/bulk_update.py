@@ -0,0 +1,69 @@
+"""
+Per-frame cost of feeding a Controller with whole state frames.
+
+Times Controller.mainDataCallback on an idle controller and on a controller whose sticks move on every frame, with
+and without the noise filter (epsilon), and with the frames read from state vectors as main.py reads its shared
+arrays.
+
+usage: python benchmarks/bulk_update.py [frames]
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyo import Server
+import controller
+
+CONTINUOUS_REF = ['LX', 'LY', 'RX', 'RY', 'LT', 'RT']
+BUTTONS_REF = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB', 'DPAD1', 'DPAD2']
+
+
+def buildStates(nframes, moving):
+    states = []
+    for i in range(nframes):
+        value = math.sin(i / 10.) * 0.8 if moving else 0.
+        continuous = [value, -value, value / 2, 0., 0., 0.]
+        states.append((continuous, [0] * len(BUTTONS_REF)))
+    return states
+
+
+def toDict(continuous, buttons):
+    data = dict(zip(CONTINUOUS_REF, continuous))
+    data.update(zip(BUTTONS_REF[:-2], buttons[:-2]))
+    data['DPAD'] = buttons[-2:]
+    return data
+
+
+def timeIt(func, states):
+    start = time.perf_counter()
+    for state in states:
+        func(state)
+    return (time.perf_counter() - start) / len(states) * 1e6
+
+
+def run(nframes):
+    server = Server(audio='offline').boot()
+    ctl = controller.Controller()
+
+    for moving in (False, True):
+        states = buildStates(nframes, moving)
+        dicts = [toDict(*state) for state in states]
+        label = "moving" if moving else "idle"
+
+        print("{:6} mainDataCallback         : {:.2f} us/frame".format(label, timeIt(ctl.mainDataCallback, dicts)))
+
+        def epsilon(data):
+            ctl.mainDataCallback(data, epsilon=0.01)
+        print("{:6} mainDataCallback (eps)   : {:.2f} us/frame".format(label, timeIt(epsilon, dicts)))
+
+        def vector(state):
+            ctl.mainDataCallback(toDict(*state), epsilon=0.002)
+        print("{:6} from vectors, as main.py : {:.2f} us/frame".format(label, timeIt(vector, states)))
+    ctl.cleanup()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,86 @@
+"""
+Benchmark of the delta-plus-keyframe transmission mode of the server.
+
+Simulates a session alternating idle periods and playing at 60 fps, encodes it in "full" and "delta" modes and
+decodes every packet into a Controller. Reports the packets, bytes and OSC messages per second of both modes, and
+checks that a client losing delta packets is back in sync after the next keyframe.
+
+usage: python benchmarks/delta_stream.py [simulated seconds]
+"""
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pythonosc.osc_packet import OscPacket
+from pyo import Server
+import controller
+from osc_encode import CONTROLLER_ROOT_ADDRESS, TIME_ADDRESS, controller_values, analysis_values, createTemplate
+
+FPS = 60
+KEYFRAME_INTERVAL = 1.
+PACKET_LOSS = 0.05
+
+
+def simulate(rand, frame):
+    # 20 seconds idle, 20 seconds playing
+    t = frame / float(FPS)
+    playing = int(t / 20) % 2 == 1
+    for key in ['A', 'B', 'X', 'Y']:
+        if playing and rand.random() < 2. / FPS:
+            controller_values[key] = 1 - controller_values[key]
+        elif not playing:
+            controller_values[key] = 0
+    controller_values['LX'] = math.sin(t * 3) if playing else 0.
+    controller_values['LY'] = math.cos(t * 2) if playing else 0.
+    analysis_values['LXVel'] = abs(math.cos(t * 3)) if playing else 0.
+    analysis_values['Density'] = 0.3 if playing else 0.
+
+
+def run(duration, ctl):
+    for mode in ("full", "delta"):
+        rand = random.Random(1)
+        loss = random.Random(2)
+        template, build = createTemplate()
+        state = {} # values of the client, as decoded
+        packets = nbytes = messages = 0
+        last_keyframe = None
+        resync_checks = 0
+        for frame in range(int(duration * FPS)):
+            now = frame / float(FPS)
+            simulate(rand, frame)
+            build(now)
+            keyframe = mode == "full" or last_keyframe is None or now - last_keyframe >= KEYFRAME_INTERVAL
+            if keyframe:
+                data = bytes(template.getData())
+                template.markSent()
+                last_keyframe = now
+            else:
+                data = template.getDeltaData(["{}{}".format(CONTROLLER_ROOT_ADDRESS, TIME_ADDRESS)])
+            if data is None:
+                continue
+            packets += 1
+            nbytes += len(data)
+            if not keyframe and loss.random() < PACKET_LOSS:
+                continue
+            for timed_msg in OscPacket(data).messages:
+                msg = timed_msg.message
+                ctl.oscDataCallback(msg.address, *msg.params)
+                state[msg.address] = msg.params
+                messages += 1
+            if keyframe:
+                # after a keyframe the client has the same values as the server
+                assert state == {msg.message.address: msg.message.params
+                                 for msg in OscPacket(bytes(template.getData())).messages}, "client out of sync"
+                resync_checks += 1
+        print("{:5s}: {:6.1f} packets/s {:8.0f} bytes/s {:7.1f} messages/s ({} resync checks)".format(
+            mode, packets / duration, nbytes / duration, messages / duration, resync_checks))
+
+
+if __name__ == "__main__":
+    server = Server(audio='offline').boot()
+    ctl = controller.Controller()
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 120, ctl)
+    ctl.cleanup()
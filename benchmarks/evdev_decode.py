@@ -0,0 +1,99 @@
+"""
+Benchmark of the evdev backend against a recorded event file and a fake device.
+
+Writes a recording of random gamepad events in the kernel's input_event format, decodes it with EvdevGamepad and
+checks the final state. Then feeds the same events through a pipe, as a fake device would, and checks the state
+again.
+
+usage: python benchmarks/evdev_decode.py [number of events]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import evdev_backend
+from evdev_backend import EV_ABS, EV_KEY, EV_SYN, packEvent
+
+
+def generateEvents(nevents, seed=1):
+    rand = random.Random(seed)
+    buttons = list(evdev_backend.BUTTON_CODES.keys())
+    events = []
+    for i in range(nevents):
+        if rand.random() < 0.3:
+            events.append((EV_KEY, rand.choice(buttons), rand.randint(0, 1)))
+        elif rand.random() < 0.1:
+            events.append((EV_ABS, rand.choice([0x10, 0x11]), rand.randint(-1, 1)))
+        else:
+            code = rand.choice(list(evdev_backend.AXIS_CODES.keys()))
+            name, low, high = evdev_backend.AXIS_CODES[code]
+            events.append((EV_ABS, code, rand.randint(low, high)))
+        events.append((EV_SYN, 0, 0))
+    return events
+
+
+def decodeAll(gamepad):
+    state = {}
+    while gamepad.is_connected():
+        if gamepad.wait(1):
+            for name, value in gamepad.read():
+                state[name] = value
+    return state
+
+
+def run(nevents):
+    events = generateEvents(nevents)
+    data = b"".join(packEvent(type, code, value, i * 0.001) for i, (type, code, value) in enumerate(events))
+
+    # recorded file
+    path = os.path.join(tempfile.mkdtemp(), "capture")
+    with open(path, "wb") as f:
+        f.write(data)
+    start = time.perf_counter()
+    gamepad = evdev_backend.EvdevGamepad(path)
+    file_state = decodeAll(gamepad)
+    elapsed = time.perf_counter() - start
+    gamepad.close()
+    os.remove(path)
+    print("recorded file : {} events in {:.3f} s ({:.2f} us/event)".format(
+        len(events), elapsed, elapsed / len(events) * 1e6))
+
+    # fake device, the events are written in small bursts
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        size = evdev_backend.EVENT_STRUCT.size
+        for i in range(0, len(data), size * 10):
+            os.write(write_fd, data[i:i + size * 10])
+        os.close(write_fd)
+
+    gamepad = evdev_backend.EvdevGamepad(read_fd)
+    writer = threading.Thread(target=write)
+    start = time.perf_counter()
+    writer.start()
+    pipe_state = decodeAll(gamepad)
+    elapsed = time.perf_counter() - start
+    writer.join()
+    gamepad.close()
+    print("fake device   : {} events in {:.3f} s ({:.2f} us/event)".format(
+        len(events), elapsed, elapsed / len(events) * 1e6))
+
+    assert file_state == pipe_state, "the file and the pipe decoded differently"
+    for name, value in file_state.items():
+        if name == 'DPAD':
+            assert all(v in (-1, 0, 1) for v in value)
+        elif name in evdev_backend.TRIGGERS:
+            assert 0. <= value <= 1.
+        else:
+            assert -1. <= value <= 1.
+    print("final state   : {}".format(sorted(file_state.items())))
+    print("OK")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
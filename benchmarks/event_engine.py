@@ -0,0 +1,97 @@
+"""
+Benchmark of the controller event logic with the replay harness.
+
+Generates a random stream of button states (presses, MultiPress, combinations, held buttons) and replays it on a
+virtual clock with both event engines, "tick" (TickButton) and "thread" (Button and CallbackQueue on the callback
+scheduler), reporting how much faster than real time the Button, ButtonCombination and MultiPress logic runs. Checks
+that both engines fire the same callbacks at the same times, and that a combination still fires while a button of
+another combination is held.
+
+usage: python benchmarks/event_engine.py [simulated seconds]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyo import Server
+from harness import ControllerHarness
+
+ENGINES = ['tick', 'thread']
+BUTTONS = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB']
+
+
+def generateStream(duration, presses_per_second=10, seed=1):
+    rand = random.Random(seed)
+    events = []
+    t = 0.
+    while t < duration:
+        t += rand.expovariate(presses_per_second)
+        btn = rand.choice(BUTTONS)
+        events.append((t, btn, 1))
+        events.append((t + rand.choice([0.02, 0.05, 0.1, 0.3, 1.2, 2.]), btn, 0))
+    events.sort()
+    stream = []
+    pressed = set()
+    for t, btn, value in events:
+        # skip the presses of buttons already down
+        if value and btn in pressed:
+            continue
+        if value:
+            pressed.add(btn)
+        elif btn in pressed:
+            pressed.discard(btn)
+        else:
+            continue
+        stream.append((t, {btn: value}))
+    return stream
+
+
+def checkCombinations(engine):
+    # X is held, as for the LPF sweep of AMFM.py, while Y and B are pressed 20 ms apart
+    harness = ControllerHarness(engine=engine)
+    ctl = harness.controller
+    ctl.registerCombination(['X', 'A'], harness.recorder('X+A'))
+    ctl.registerCombination(['Y', 'B'], harness.recorder('Y+B'))
+    harness.play([(1., {'X': 1}), (3., {'Y': 1}), (3.02, {'B': 1}), (3.2, {'X': 0, 'Y': 0, 'B': 0})])
+    fired = [name for t, name, args in harness.getEvents()]
+    assert fired == ['Y+B'], "combinations fired while X was held with the {} engine: {}".format(engine, fired)
+    harness.cleanup()
+
+
+def replay(stream, engine):
+    harness = ControllerHarness(engine=engine)
+    harness.watch(BUTTONS)
+    ctl = harness.controller
+    ctl.buttons['A'].setOnHoldCallback(harness.recorder('A hold'), repeat=True)
+    ctl.registerMultiPress('X', 2, harness.recorder('X double'))
+    ctl.registerMultiPress('X', 3, harness.recorder('X triple'))
+    ctl.registerCombination(['LS', 'RS'], harness.recorder('LS+RS'))
+    ctl.registerCombination(['LB', 'RB', 'Y'], harness.recorder('LB+RB+Y'))
+
+    start = time.perf_counter()
+    harness.play(stream)
+    elapsed = time.perf_counter() - start
+    events = [(round(t, 9), name, args) for t, name, args in harness.getEvents()]
+    harness.cleanup()
+    return events, elapsed
+
+
+def run(duration):
+    stream = generateStream(duration)
+    results = {}
+    for engine in ENGINES:
+        checkCombinations(engine)
+        events, elapsed = replay(stream, engine)
+        results[engine] = events
+        print("{:6s}: {} states, {} callbacks, {:.0f} simulated seconds in {:.3f} s : {:.0f}x real time".format(
+            engine, len(stream), len(events), duration, elapsed, duration / elapsed))
+    assert results['tick'] == results['thread'], "the engines fire different callbacks"
+
+
+if __name__ == "__main__":
+    # shared by the harnesses
+    server = Server(audio='offline').boot()
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 3600)
@@ -0,0 +1,104 @@
+"""
+Benchmark of the fan-out of the server's bundle to several destinations.
+
+Compares the time per frame of mirroring the controller to 1 to 8 local receivers by encoding the bundle once per
+destination, as running one server per synth did, with encoding it once and sending the same bytes with OscFanOut.
+Then adds a destination refusing every packet and checks that it neither slows down nor starves the others.
+
+usage: python benchmarks/fanout.py [number of frames]
+"""
+import os
+import random
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import osc_fanout
+from osc_fanout import OscFanOut
+from osc_encode import buildWithBuilders, createTemplate, randomize
+
+MAX_DESTINATIONS = 8
+# sending to the broadcast address without SO_BROADCAST fails right away
+FAILING_DESTINATION = ("255.255.255.255", 5005)
+
+
+def createReceivers(count):
+    receivers = []
+    for i in range(count):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.setblocking(False)
+        receivers.append(receiver)
+    return receivers
+
+
+def drain(receivers):
+    counts = []
+    for receiver in receivers:
+        count = 0
+        while True:
+            try:
+                receiver.recv(65536)
+            except BlockingIOError:
+                break
+            count += 1
+        counts.append(count)
+    return counts
+
+
+def run(nframes):
+    rand = random.Random(1)
+    template, build = createTemplate()
+    print("{:>12s} {:>18s} {:>18s}".format("destinations", "encode each us", "fan-out us"))
+    for count in range(1, MAX_DESTINATIONS + 1):
+        receivers = createReceivers(count)
+        addresses = [receiver.getsockname() for receiver in receivers]
+
+        # one encoding and one socket per destination
+        sockets = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for address in addresses]
+        start = time.perf_counter()
+        for i in range(nframes):
+            randomize(rand)
+            for sock, address in zip(sockets, addresses):
+                sock.sendto(buildWithBuilders(i * 0.016), address)
+        each = time.perf_counter() - start
+        for sock in sockets:
+            sock.close()
+        drain(receivers)
+
+        # one encoding for all the destinations
+        fanout = OscFanOut(addresses)
+        start = time.perf_counter()
+        for i in range(nframes):
+            randomize(rand)
+            fanout.send(build(i * 0.016))
+        fanned = time.perf_counter() - start
+        fanout.close()
+        drain(receivers)
+        print("{:12d} {:18.1f} {:18.1f}".format(count, each / nframes * 1e6, fanned / nframes * 1e6))
+        for receiver in receivers:
+            receiver.close()
+
+    # a failing destination between two working ones
+    receivers = createReceivers(2)
+    addresses = [receivers[0].getsockname(), FAILING_DESTINATION, receivers[1].getsockname()]
+    for name, destinations in (("without", [addresses[0], addresses[2]]), ("with", addresses)):
+        fanout = OscFanOut(destinations)
+        start = time.perf_counter()
+        for i in range(nframes):
+            fanout.send(build(i * 0.016))
+        elapsed = time.perf_counter() - start
+        received = drain(receivers)
+        assert received == [nframes, nframes], "a working destination missed packets: {}".format(received)
+        print("{:7s} failing destination: {:8.1f} us/frame, status {}".format(
+            name, elapsed / nframes * 1e6, [status for destination, status in fanout.getStatus()]))
+        fanout.close()
+    assert fanout.getStatus()[1][1] == osc_fanout.STATUS_ERROR
+    print("OK")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,93 @@
+"""
+Benchmark of the client's jitter buffer on a simulated network.
+
+Time stamps 60 frames per second, delays each one by a random transit time (a base delay, an exponential jitter
+and occasional spikes) and a fixed clock offset between the server and the client, then releases them through a
+JitterBuffer driven by a virtual clock. Compares the timing error between consecutive frames and the latency of
+applying every frame on arrival with the jitter buffer at several delays.
+
+usage: python benchmarks/jitter_buffer.py [simulated seconds]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyo import Server
+from controller import CallbackScheduler
+from harness import VirtualClock
+from jitter_buffer import JitterBuffer
+
+FPS = 60
+CLOCK_OFFSET = 5.3 # the client's clock is ahead of the server's
+BASE_TRANSIT = 0.001
+MEAN_JITTER = 0.0015
+SPIKE_PROBABILITY = 0.02
+SPIKE = 0.02
+STEP = 0.0001
+DELAYS = [0.002, 0.005, 0.01, 0.02]
+
+
+def simulateNetwork(duration, seed=1):
+    rand = random.Random(seed)
+    frames = []
+    for i in range(int(duration * FPS)):
+        # the server's loop wakes up late by up to a millisecond
+        timestamp = i / float(FPS) + rand.uniform(0, 0.001)
+        transit = BASE_TRANSIT + rand.expovariate(1. / MEAN_JITTER)
+        if rand.random() < SPIKE_PROBABILITY:
+            transit += rand.uniform(0, SPIKE)
+        frames.append((timestamp + CLOCK_OFFSET + transit, timestamp))
+    frames.sort()
+    return frames
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100. * len(values)))]
+
+
+def report(name, applied):
+    # applied: list of (apply time, time stamp), in the order they were applied
+    errors = [abs((t2 - t1) - (s2 - s1)) for (t1, s1), (t2, s2) in zip(applied, applied[1:])]
+    latencies = [t - s - CLOCK_OFFSET for t, s in applied]
+    print("{:12s}: interval error p50={:6.2f}ms p99={:6.2f}ms max={:6.2f}ms, latency p50={:6.2f}ms".format(
+        name, percentile(errors, 50) * 1000, percentile(errors, 99) * 1000, max(errors) * 1000,
+        percentile(latencies, 50) * 1000))
+
+
+def runBuffer(frames, delay):
+    clock = VirtualClock(frames[0][0] - 1)
+    scheduler = CallbackScheduler(clock)
+    applied = []
+    buffer = JitterBuffer(lambda timestamp: applied.append((clock(), timestamp)), delay, clock=clock,
+                          scheduler=scheduler)
+    index = 0
+    now = clock()
+    end = frames[-1][0] + 1
+    while now < end:
+        now += STEP
+        while index < len(frames) and frames[index][0] <= now:
+            arrival, timestamp = frames[index]
+            clock.set(max(arrival, clock()))
+            buffer.push(timestamp, timestamp)
+            index += 1
+        clock.set(now)
+        scheduler.runPending(now)
+    return applied, buffer.getStats()
+
+
+def run(duration):
+    frames = simulateNetwork(duration)
+    # without buffer the frames are applied on arrival, in the order they arrive
+    report("no buffer", frames)
+    for delay in DELAYS:
+        applied, stats = runBuffer(frames, delay)
+        report("{:.0f} ms buffer".format(delay * 1000), applied)
+        print("{:12s}  released={released} late={late} dropped={dropped}".format("", **stats))
+
+
+if __name__ == "__main__":
+    server = Server(audio='offline').boot()
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 30)
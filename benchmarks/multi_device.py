@@ -0,0 +1,122 @@
+"""
+Benchmark of the multi-gamepad mode of the server, from 1 to 8 simulated gamepads.
+
+For each number of gamepads, simulates every gamepad playing at 60 fps and measures the time per tick spent by the
+server updating the analysis trackers and filling the single bundle of all gamepads, then the time spent by the
+client decoding the bundle into a ControllerGroup. Checks that every controller of the group ends with the values
+of its own gamepad.
+
+usage: python benchmarks/multi_device.py [number of ticks]
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pythonosc.osc_packet import OscPacket
+from pyo import Server
+import controller
+from analysis import StickVelocityTracker, TriggerVelocityTracker, DensityTracker
+from osc_encode import controller_values, controller_data_types, analysis_values
+from osc_layout import buildOscTemplate
+
+FPS = 60
+MAX_DEVICES = 8
+BUTTONS = [key for key in controller_values if controller_data_types[key] == "i"]
+
+
+def createDevice(index):
+    return {'index': index, 'values': dict(controller_values), 'analysis': dict(analysis_values),
+            'ls_velocity': StickVelocityTracker(FPS), 'rs_velocity': StickVelocityTracker(FPS),
+            'lt_velocity': TriggerVelocityTracker(FPS), 'rt_velocity': TriggerVelocityTracker(FPS),
+            'density': DensityTracker(BUTTONS, FPS)}
+
+
+def simulate(device, tick):
+    # each gamepad plays its own phrase
+    t = tick / float(FPS) + device['index']
+    values = device['values']
+    values['LX'], values['LY'] = math.sin(t * 3), math.cos(t * 2)
+    values['RX'], values['RY'] = math.sin(t * 5), math.cos(t * 7)
+    values['LT'], values['RT'] = abs(math.sin(t)), abs(math.cos(t))
+    for i, key in enumerate(BUTTONS):
+        values[key] = 1 if (tick + device['index'] * 7 + i * 13) % 37 < 5 else 0
+    values['DPAD'] = ((tick // 20) % 3 - 1, 0)
+
+
+def updateAnalysis(device):
+    # same as update_analysis in the server
+    values, analysis = device['values'], device['analysis']
+    device['ls_velocity'].tick(values['LX'], values['LY'])
+    device['rs_velocity'].tick(values['RX'], values['RY'])
+    device['lt_velocity'].tick(values['LT'])
+    device['rt_velocity'].tick(values['RT'])
+    device['density'].tick({key: values[key] for key in BUTTONS})
+    analysis['LXVel'] = device['ls_velocity']['X']['LongTermVel']
+    analysis['LYVel'] = device['ls_velocity']['Y']['LongTermVel']
+    analysis['RXVel'] = device['rs_velocity']['X']['LongTermVel']
+    analysis['RYVel'] = device['rs_velocity']['Y']['LongTermVel']
+    analysis['LTVel'] = device['lt_velocity']['LongTermVel']
+    analysis['RTVel'] = device['rt_velocity']['LongTermVel']
+    analysis['Density'] = device['density'].get()
+
+
+def createTemplate(devices):
+    # layout of the server started with --devices above 1, as the ControllerGroup expects
+    template, set_time, setters = buildOscTemplate(len(devices), indexed=True)
+    device_setters = [(device,) + setters[device['index']] for device in devices]
+
+    def build(now):
+        for device, controller_setters, set_dpad, analysis_setters in device_setters:
+            values = device['values']
+            for key, setter in controller_setters:
+                setter(values[key])
+            set_dpad(*values['DPAD'])
+            analysis = device['analysis']
+            for key, setter in analysis_setters:
+                setter(analysis[key])
+        set_time(now)
+        return template.getData()
+    return build
+
+
+def run(nticks):
+    print("{:>7s} {:>12s} {:>12s} {:>12s} {:>10s}".format("devices", "server us", "client us", "per device", "bytes"))
+    for count in range(1, MAX_DEVICES + 1):
+        devices = [createDevice(index) for index in range(count)]
+        build = createTemplate(devices)
+        group = controller.ControllerGroup(count, engine="tick", tick_period=None)
+        server_time = client_time = 0.
+        nbytes = 0
+        for tick in range(nticks):
+            for device in devices:
+                simulate(device, tick)
+            start = time.perf_counter()
+            for device in devices:
+                updateAnalysis(device)
+            data = bytes(build(tick / float(FPS)))
+            server_time += time.perf_counter() - start
+            nbytes = len(data)
+            start = time.perf_counter()
+            for timed_msg in OscPacket(data).messages:
+                msg = timed_msg.message
+                group.oscDataCallback(msg.address, *msg.params)
+            client_time += time.perf_counter() - start
+
+        # every controller follows its own gamepad
+        for device in devices:
+            ctl = group[device['index']]
+            assert abs(ctl.sticks['LX'].input.value - device['values']['LX']) < 1e-6, "wrong gamepad"
+            assert ctl.buttons['A'].get() == device['values']['A'], "wrong gamepad"
+            assert abs(ctl.analysis['Density'].value - device['analysis']['Density']) < 1e-6, "wrong gamepad"
+        group.cleanup()
+        total = (server_time + client_time) / nticks * 1e6
+        print("{:7d} {:12.1f} {:12.1f} {:12.1f} {:10d}".format(
+            count, server_time / nticks * 1e6, client_time / nticks * 1e6, total / count, nbytes))
+
+
+if __name__ == "__main__":
+    server = Server(audio='offline').boot()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 600)
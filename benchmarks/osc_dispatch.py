@@ -0,0 +1,99 @@
+"""
+Throughput of Controller.oscDataCallback.
+
+Feeds the ~25 messages of a server frame (buttons, D-Pad, continuous inputs and analysis values) straight into the
+callback, without any network, and reports the number of messages handled per second. The same frames also go through
+a copy of the dispatch the Controller used before the address table (prefix formatting, startswith, rsplit and list
+conversion of the arguments), so that both figures come from the same run.
+
+usage: python benchmarks/osc_dispatch.py [frames]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyo import Server
+import controller
+
+
+def buildFrame(i):
+    frame = []
+    for btn in ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB']:
+        frame.append(("/XB1/btn/{}".format(btn), (0,)))
+    frame.append(("/XB1/btn/DPAD", (0, 0)))
+    for axis in controller.CONTINUOUS_INPUTS:
+        frame.append(("/XB1/cts/{}".format(axis), ((i % 100) / 100.,)))
+    for param in controller.ANALYSIS_PARAMS:
+        frame.append(("/ANA/{}".format(param), (0.5,)))
+    return frame
+
+
+def convertArgs(args, type):
+    # list conversion of the arguments, as before the address table
+    if len(args) > 1:
+        if type == "i":
+            return [int(arg) for arg in args]
+        if type == "f":
+            return [float(arg) for arg in args]
+    else:
+        if type == "i":
+            return int(args[0])
+        if type == "f":
+            return float(args[0])
+
+
+def getReferenceCallback(ctl):
+    # the prefix dispatch of Controller.oscDataCallback before the address table, on the objects of ctl
+
+    def analysis(which, *args):
+        ctl._analysis_objs[which].value = convertArgs(args, "f")
+
+    def continuous(which, *args):
+        arg = convertArgs(args, "f")
+        ctl._continuous_objs[which].value = arg
+        if which in ['LT', 'RT']:
+            ctl._button_objs[which].set(arg)
+
+    def buttons(which, *args):
+        arg = convertArgs(args, "i")
+        if which == 'DPAD':
+            ctl._dpad_obj.set(arg)
+        else:
+            ctl._button_objs[which].set(arg)
+
+    def callback(address, *args):
+        if address.startswith("{}{}".format(controller.CONTROLLER_ROOT_ADDRESS, controller.CONTINUOUS_INPUTS_ADDRESS)):
+            continuous(address.rsplit("/", 1)[1], *args)
+        elif address.startswith("{}{}".format(controller.CONTROLLER_ROOT_ADDRESS, controller.BUTTONS_ADDRESS)):
+            buttons(address.rsplit("/", 1)[1], *args)
+        elif address.startswith(controller.ANALYSIS_ROOT_ADDRESS):
+            analysis(address.rsplit("/", 1)[1], *args)
+
+    return callback
+
+
+def measure(callback, frames, nframes):
+    start = time.perf_counter()
+    for i in range(nframes):
+        for address, args in frames[i % 100]:
+            callback(address, *args)
+    return time.perf_counter() - start
+
+
+def run(nframes):
+    ctl = controller.Controller()
+    frames = [buildFrame(i) for i in range(100)]
+    nmessages = nframes * len(frames[0])
+
+    for name, callback in [("prefix (before)", getReferenceCallback(ctl)), ("table (after)", ctl.oscDataCallback)]:
+        elapsed = measure(callback, frames, nframes)
+        print("{:16s} {} messages in {:.3f} s : {:.0f} messages/s ({:.2f} us/message)".format(
+            name, nmessages, elapsed, nmessages / elapsed, elapsed / nmessages * 1e6))
+    ctl.cleanup()
+
+
+if __name__ == "__main__":
+    server = Server(audio='offline').boot()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
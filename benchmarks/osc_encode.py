@@ -0,0 +1,123 @@
+"""
+Benchmark of the encoding of the server's OSC bundle.
+
+Compares the time per frame spent building the bundle with pythonosc's builders, as sendOSCData used to, with the
+time spent patching a pre-encoded OscBundleTemplate, and checks that both produce the same bytes.
+
+usage: python benchmarks/osc_encode.py [number of frames]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pythonosc import osc_bundle_builder, osc_message_builder
+from osc_template import OscBundleTemplate
+
+CONTROLLER_ROOT_ADDRESS = '/XB1'
+ANALYSIS_ROOT_ADDRESS = '/ANA'
+BUTTONS_ADDRESS = '/btn'
+CONTINUOUS_INPUTS_ADDRESS = '/cts'
+TIME_ADDRESS = '/time'
+controller_values = {'A':0, 'B':0, 'X':0, 'Y':0, 'LB':0, 'RB':0, 'LS':0, 'RS':0, 'BACK':0, 'START':0, 'XB':0,
+                     'DPAD':(0,0), 'LX':0, 'LY':0, 'RX':0, 'RY':0, 'LT':0, 'RT':0}
+controller_data_types = {'A':"i", 'B':"i", 'X':"i", 'Y':"i", 'LB':"i", 'RB':"i", 'LS':"i", 'RS':"i", 'BACK':"i",
+                         'START':"i", 'XB':"i", 'DPAD':["i","i"], 'LX':"f", 'LY':"f", 'RX':"f", 'RY':"f", 'LT':"f",
+                         'RT':"f"}
+analysis_values = {'LXVel':0, 'LYVel':0, 'RXVel':0, 'RYVel':0, 'LTVel':0, 'RTVel':0, 'Density':0}
+
+
+def getControllerAddress(key):
+    if "i" in controller_data_types[key]:
+        return "{}{}/{}".format(CONTROLLER_ROOT_ADDRESS, BUTTONS_ADDRESS, key)
+    return "{}{}/{}".format(CONTROLLER_ROOT_ADDRESS, CONTINUOUS_INPUTS_ADDRESS, key)
+
+
+def buildWithBuilders(now):
+    # previous implementation of sendOSCData
+    controller_bundle_builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+    for key in controller_values:
+        if "i" in controller_data_types[key]:
+            address = "{}{}/{}".format(CONTROLLER_ROOT_ADDRESS, BUTTONS_ADDRESS, key)
+        elif controller_data_types[key] == "f":
+            address = "{}{}/{}".format(CONTROLLER_ROOT_ADDRESS, CONTINUOUS_INPUTS_ADDRESS, key)
+        msg = osc_message_builder.OscMessageBuilder(address)
+        if key == 'DPAD':
+            msg.add_arg(controller_values[key][0], controller_data_types[key][0])
+            msg.add_arg(controller_values[key][1], controller_data_types[key][1])
+        else:
+            msg.add_arg(controller_values[key], controller_data_types[key])
+        controller_bundle_builder.add_content(msg.build())
+
+    analysis_bundle_builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+    for key in analysis_values:
+        msg = osc_message_builder.OscMessageBuilder("{}/{}".format(ANALYSIS_ROOT_ADDRESS, key))
+        msg.add_arg(analysis_values[key], "f")
+        analysis_bundle_builder.add_content(msg.build())
+
+    osc_data = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+    time_msg = osc_message_builder.OscMessageBuilder("{}{}".format(CONTROLLER_ROOT_ADDRESS, TIME_ADDRESS))
+    time_msg.add_arg(now, "d")
+    osc_data.add_content(time_msg.build())
+    osc_data.add_content(controller_bundle_builder.build())
+    osc_data.add_content(analysis_bundle_builder.build())
+    return osc_data.build().dgram
+
+
+def createTemplate():
+    template = OscBundleTemplate([
+        ("{}{}".format(CONTROLLER_ROOT_ADDRESS, TIME_ADDRESS), "d"),
+        [(getControllerAddress(key), "".join(controller_data_types[key])) for key in controller_values],
+        [("{}/{}".format(ANALYSIS_ROOT_ADDRESS, key), "f") for key in analysis_values]])
+    set_time = template.getSetter("{}{}".format(CONTROLLER_ROOT_ADDRESS, TIME_ADDRESS))
+    controller_setters = [(key, template.getSetter(getControllerAddress(key))) for key in controller_values
+                          if key != 'DPAD']
+    set_dpad = template.getSetter(getControllerAddress('DPAD'))
+    analysis_setters = [(key, template.getSetter("{}/{}".format(ANALYSIS_ROOT_ADDRESS, key)))
+                        for key in analysis_values]
+
+    def build(now):
+        for key, setter in controller_setters:
+            setter(controller_values[key])
+        set_dpad(*controller_values['DPAD'])
+        for key, setter in analysis_setters:
+            setter(analysis_values[key])
+        set_time(now)
+        return template.getData()
+    return template, build
+
+
+def randomize(rand):
+    for key in controller_values:
+        if key == 'DPAD':
+            controller_values[key] = (rand.randint(-1, 1), rand.randint(-1, 1))
+        elif controller_data_types[key] == "i":
+            controller_values[key] = rand.randint(0, 1)
+        else:
+            controller_values[key] = rand.uniform(-1, 1)
+    for key in analysis_values:
+        analysis_values[key] = rand.uniform(0, 1)
+
+
+def run(nframes):
+    rand = random.Random(1)
+    template, build_with_template = createTemplate()
+
+    # both paths must produce the same datagram
+    for i in range(100):
+        randomize(rand)
+        now = time.time()
+        assert bytes(build_with_template(now)) == buildWithBuilders(now), "template differs from pythonosc"
+
+    for name, build in (("pythonosc builders", buildWithBuilders), ("template", build_with_template)):
+        start = time.perf_counter()
+        for i in range(nframes):
+            build(i * 0.016)
+        elapsed = time.perf_counter() - start
+        print("{:20s}: {:8.2f} us/frame".format(name, elapsed / nframes * 1e6))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,133 @@
+"""
+Benchmark of the server window rendering, redrawing everything every frame against draw.DirtyScreen.
+
+Renders the server window for an idle controller (nothing changes) and for an active one (sticks, triggers, buttons
+and values changing every frame) in three ways: everything drawn with font.render and pygame.display.flip every
+frame as before, everything drawn from the glyph cache, and only the changed widgets drawn and updated with
+DirtyScreen. Reports the time per frame and the area sent to the display. Runs without a window by default, where
+sending pixels to the display costs nothing: with a real window the cost of pygame.display.flip and update grows
+with the area.
+
+usage: python benchmarks/render.py [frames]
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import draw
+from draw import (DirtyScreen, COLORS, DEFAULT_FONT, draw_button, draw_xbox_button, draw_stick,
+                  draw_trigger, draw_d_pad, draw_text, layout_values, layout_osc_status)
+from osc_encode import controller_values, analysis_values
+from structs import Struct
+
+OSC_STATUS = {0: 'OSC OK', 1: 'OSC Error', 2: 'Destination unreachable', 3: 'Paused', 4: 'Dropping packets'}
+DESTINATIONS = [(("127.0.0.1", 5005), 0)]
+
+
+def create_display():
+    # same layout as the server's display elements
+    buttons = {name: Struct(rect=pygame.Rect(*rect), value=0) for name, rect in [
+        ('A', (560, 200, 20, 20)), ('B', (600, 160, 20, 20)), ('X', (520, 160, 20, 20)), ('Y', (560, 120, 20, 20)),
+        ('LB', (40, 80, 40, 20)), ('RB', (560, 80, 40, 20)), ('BACK', (240, 160, 20, 20)),
+        ('START', (400, 160, 20, 20)), ('LS', (60, 160, 20, 20)), ('RS', (400, 240, 20, 20)),
+        ('XB', (320, 100, 20, 20))]}
+    left_stick = Struct(rect=pygame.Rect(0, 0, 80, 40), x=0.0, y=0.0)
+    right_stick = Struct(rect=pygame.Rect(0, 0, 40, 40), x=0.0, y=0.0)
+    left_stick.rect.center = buttons['LS'].rect.center
+    right_stick.rect.center = buttons['RS'].rect.center
+    d_pad_posx = {-1: 0, 0: 20, 1: 40}
+    d_pad_posy = {1: 0, 0: 20, -1: 40}
+    d_pad = {(x, y): Struct(rect=pygame.Rect(220 + d_pad_posx[x], 220 + d_pad_posy[y], 20, 20), value=0)
+             for y in (1, 0, -1) for x in (-1, 0, 1)}
+    return Struct(buttons=buttons, left_stick=left_stick, right_stick=right_stick,
+                  left_trigger=Struct(rect=pygame.Rect(40, 40, 40, 40), value=0.0),
+                  right_trigger=Struct(rect=pygame.Rect(560, 40, 40, 40), value=0.0), d_pad=d_pad)
+
+
+def play(display, frame):
+    t = frame / 60.
+    display.left_stick.x = controller_values['LX'] = math.sin(t * 3)
+    display.left_stick.y = controller_values['LY'] = math.cos(t * 2)
+    display.right_trigger.value = controller_values['RT'] = (math.sin(t) + 1) / 2
+    display.buttons['A'].value = controller_values['A'] = int(frame / 15) % 2
+    for key in analysis_values:
+        analysis_values[key] = abs(math.sin(t + len(key)))
+
+
+def render_full(screen, display, cached):
+    # the server's render before DirtyScreen, with or without the glyph cache
+    def text(string, pos):
+        if cached:
+            draw_text(string, pos, screen)
+        else:
+            screen.blit(DEFAULT_FONT.render(string, True, COLORS['white']), pos)
+
+    screen.fill(COLORS['black'])
+    for name, button in display.buttons.items():
+        if name == 'XB':
+            draw_xbox_button(button, screen)
+        else:
+            draw_button(button, screen)
+    draw_stick(display.left_stick, screen)
+    draw_stick(display.right_stick, screen)
+    draw_trigger(display.left_trigger, screen)
+    draw_trigger(display.right_trigger, screen)
+    draw_d_pad(display.d_pad, screen)
+    for string, pos in layout_values(controller_values, analysis_values):
+        text(string, pos)
+    for string, pos in layout_osc_status(OSC_STATUS, DESTINATIONS, '/XB1', '/ANA', 250.):
+        text(string, pos)
+    pygame.display.flip()
+    return screen.get_width() * screen.get_height()
+
+
+def render_dirty(dirty_screen, display):
+    for name, button in display.buttons.items():
+        if name == 'XB':
+            dirty_screen.addXboxButton(name, button)
+        else:
+            dirty_screen.addButton(name, button)
+    dirty_screen.addStick('left stick', display.left_stick)
+    dirty_screen.addStick('right stick', display.right_stick)
+    dirty_screen.addTrigger('left trigger', display.left_trigger)
+    dirty_screen.addTrigger('right trigger', display.right_trigger)
+    dirty_screen.addDPad('d-pad', display.d_pad)
+    for string, pos in layout_values(controller_values, analysis_values):
+        dirty_screen.addText(pos, string, pos)
+    for string, pos in layout_osc_status(OSC_STATUS, DESTINATIONS, '/XB1', '/ANA', 250.):
+        dirty_screen.addText(pos, string, pos)
+    return sum(rect.w * rect.h for rect in dirty_screen.update())
+
+
+def run(frames):
+    screen = pygame.display.set_mode((640, 480))
+    print("{:8s} {:12s} {:>10s} {:>14s}".format("input", "renderer", "us/frame", "pixels/frame"))
+    for activity in ("idle", "active"):
+        for renderer in ("full", "full+cache", "dirty"):
+            display = create_display()
+            dirty_screen = DirtyScreen(screen)
+            draw._glyph_cache.clear()
+            pixels = 0
+            elapsed = 0.
+            for frame in range(frames):
+                if activity == "active":
+                    play(display, frame)
+                start = time.perf_counter()
+                if renderer == "dirty":
+                    pixels += render_dirty(dirty_screen, display)
+                else:
+                    pixels += render_full(screen, display, renderer == "full+cache")
+                elapsed += time.perf_counter() - start
+            print("{:8s} {:12s} {:10.1f} {:14.0f}".format(
+                activity, renderer, elapsed / frames * 1e6, pixels / float(frames)))
+        for key in analysis_values:
+            analysis_values[key] = 0.
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,60 @@
+"""
+Thread count and callback jitter of the controller timers under a synthetic load.
+
+Simulates 20 button presses per second spread over all the buttons of a Controller. Every press queues a
+deferred callback (like the MultiPress and combination logic does) and the benchmark measures how late each one
+fires compared to its deadline, as well as the number of live threads.
+
+usage: python benchmarks/scheduler_load.py [duration]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import controller
+
+PRESSES_PER_SECOND = 20
+EVENT_DELAY = 0.18
+HOLD_DELAY = 1
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.))]
+
+
+def run(duration):
+    lateness = []
+    thread_counts = []
+    queues = [(controller.CallbackQueue(EVENT_DELAY), controller.CallbackQueue(HOLD_DELAY))
+              for i in range(len(controller.BUTTON_INPUTS) - 1)]
+
+    def onEvent(deadline):
+        lateness.append(time.perf_counter() - deadline)
+
+    period = 1. / PRESSES_PER_SECOND
+    start = time.perf_counter()
+    for i in range(int(duration * PRESSES_PER_SECOND)):
+        target = start + i * period
+        time.sleep(max(0., target - time.perf_counter()))
+        event_queue, hold_queue = queues[i % len(queues)]
+        now = time.perf_counter()
+        # a press queues the basic callbacks and the hold event, the release cancels the hold event
+        event_queue.queue(onEvent, [now + EVENT_DELAY])
+        hold_queue.queue(onEvent, [now + HOLD_DELAY])
+        hold_queue.empty()
+        thread_counts.append(threading.active_count())
+
+    time.sleep(HOLD_DELAY + 0.5)
+    lateness = [l * 1000 for l in lateness]
+    print("presses : {}  callbacks fired : {}".format(int(duration * PRESSES_PER_SECOND), len(lateness)))
+    print("threads : max {}  avg {:.1f}".format(max(thread_counts), sum(thread_counts) / len(thread_counts)))
+    print("jitter (ms) : p50 {:.3f}  p95 {:.3f}  p99 {:.3f}  max {:.3f}".format(
+        percentile(lateness, 50), percentile(lateness, 95), percentile(lateness, 99), max(lateness)))
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,90 @@
+"""
+Benchmark of the session capture file format and of the replay tool.
+
+Records a simulated session alternating idle periods and playing at the given input rate, then reports the cost
+of recording a frame, the size of the file per frame against the uncompressed frames, the speed of reading it
+back and of rebuilding the OSC bundles at maximum speed as replay.py does. Checks that every state is read back
+unchanged.
+
+usage: python benchmarks/session_capture.py [simulated seconds] [input rate in Hz]
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import state_packet
+from replay import createOscTemplate
+from session_capture import CaptureWriter, CaptureReader, FRAME_TIME
+
+
+def simulate(rand, t, values, analysis):
+    # 10 seconds idle, 10 seconds playing
+    playing = int(t / 10) % 2 == 1
+    for key in ['A', 'B', 'X', 'Y']:
+        if playing and rand.random() < 0.02:
+            values[key] = 1 - values[key]
+        elif not playing:
+            values[key] = 0
+    values['LX'] = math.sin(t * 3) if playing else 0.
+    values['LY'] = math.cos(t * 2) if playing else 0.
+    analysis['LXVel'] = abs(math.cos(t * 3)) if playing else 0.
+    analysis['Density'] = 0.3 if playing else 0.
+
+
+def run(duration, rate):
+    rand = random.Random(1)
+    values = {key: 0 for key in state_packet.BUTTONS + state_packet.CONTINUOUS_INPUTS}
+    values['DPAD'] = (0, 0)
+    analysis = {key: 0. for key in state_packet.ANALYSIS_PARAMS}
+    encoder = state_packet.StatePacketEncoder(1)
+    path = os.path.join(tempfile.mkdtemp(), "session.xb1")
+    writer = CaptureWriter(path, 1, len(encoder))
+
+    nframes = int(duration * rate)
+    recorded = []
+    worst = total = 0.
+    for i in range(nframes):
+        t = i / float(rate)
+        simulate(rand, t, values, analysis)
+        packet = encoder.encode(1e9 + t, [(values, analysis)])
+        recorded.append(bytes(packet))
+        start = time.perf_counter()
+        writer.write(t, packet)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        worst = max(worst, elapsed)
+    writer.close()
+    size = os.path.getsize(path)
+    raw = nframes * (FRAME_TIME.size + len(encoder))
+    print("record : {:.2f} us/frame, worst {:.2f} ms (chunk compression)".format(
+        total / nframes * 1e6, worst * 1000))
+    print("file   : {} bytes, {:.1f} bytes/frame, {:.1f}x smaller than the raw frames".format(
+        size, size / float(nframes), raw / float(size)))
+
+    reader = CaptureReader(path)
+    start = time.perf_counter()
+    frames = list(reader)
+    elapsed = time.perf_counter() - start
+    assert [packet for timestamp, packet in frames] == recorded, "the capture doesn't match the recorded states"
+    assert [timestamp for timestamp, packet in frames] == [i / float(rate) for i in range(nframes)]
+    print("read   : {:.0f} frames/s".format(nframes / elapsed))
+
+    template, fill = createOscTemplate(1)
+    start = time.perf_counter()
+    for timestamp, packet in frames:
+        sequence, send_time, states = state_packet.decodeStates(packet)
+        fill(states, send_time)
+        template.getData()
+    elapsed = time.perf_counter() - start
+    print("replay : {:.0f} frames/s at maximum speed, {:.0f}x real time".format(
+        nframes / elapsed, nframes / elapsed / rate))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 60, float(sys.argv[2]) if len(sys.argv) > 2 else 250)
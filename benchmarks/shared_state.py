@@ -0,0 +1,137 @@
+"""
+Benchmark of the shared memory transport against UDP loopback, between two processes of the same machine.
+
+A writer process publishes the state at the given rate and a reader process receives it with each transport:
+OSC bundles over UDP parsed with pythonosc (the default transport), binary state packets over UDP, and binary state
+packets in shared memory read with SharedStateReader.wait at each poll interval (in ms, 1 and 0.1 by default).
+Reports the frames received out of the frames sent, the latency from publishing to reading and the CPU time of both
+processes per frame. The shared memory block only holds the last packet: a frame published twice between two polls
+is overwritten, and the polls cost CPU time even when nothing changed.
+
+usage: python benchmarks/shared_state.py [seconds per transport] [rate in Hz] [poll intervals in ms, ie.: 1,0.1]
+"""
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pythonosc.osc_packet import OscPacket
+import shared_state
+from osc_encode import controller_values, analysis_values, createTemplate
+from state_packet import StatePacketEncoder, getStruct
+
+PORT = 5199
+SHM_NAME = "xb1_state_benchmark"
+POLL_INTERVALS = [0.001, 0.0001]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100. * len(values)))]
+
+
+def reader(transport, interval, ready, done, results):
+    # reads until the writer is done, then gets the last frame
+    latencies = []
+    unpack = getStruct(1).unpack_from
+    if transport == "shm":
+        source = shared_state.SharedStateReader(None, SHM_NAME)
+        ready.set()
+        cpu = time.process_time()
+        while True:
+            finished = done.is_set()
+            packet = source.wait(0.05, interval)
+            if packet is not None:
+                latencies.append(time.time() - unpack(packet)[3])
+            elif finished:
+                break
+        source.close()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", PORT))
+        sock.settimeout(0.05)
+        ready.set()
+        cpu = time.process_time()
+        while True:
+            finished = done.is_set()
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                if finished:
+                    break
+                continue
+            if transport == "udp-osc":
+                messages = {msg.message.address: msg.message.params for msg in OscPacket(data).messages}
+                latencies.append(time.time() - messages['/XB1/time'][0])
+            else:
+                latencies.append(time.time() - unpack(data)[3])
+        sock.close()
+    results.put((latencies, time.process_time() - cpu))
+
+
+def writer(transport, duration, rate, done, finished, results):
+    # the block is closed once the reader got the last frame
+    template, build = createTemplate()
+    encoder = StatePacketEncoder(1)
+    if transport == "shm":
+        shm = shared_state.SharedStateWriter(len(encoder), SHM_NAME)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    period = 1. / rate
+    frames = 0
+    cpu = time.process_time()
+    start = next_frame = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        controller_values['LX'] = frames % 100 / 100.
+        now = time.time()
+        if transport == "udp-osc":
+            sock.sendto(build(now), ("127.0.0.1", PORT))
+        elif transport == "udp-binary":
+            sock.sendto(encoder.encode(now, [(controller_values, analysis_values)]), ("127.0.0.1", PORT))
+        else:
+            shm.publish(encoder.encode(now, [(controller_values, analysis_values)]))
+        frames += 1
+        next_frame += period
+        time.sleep(max(0., next_frame - time.perf_counter()))
+    cpu = time.process_time() - cpu
+    done.set()
+    finished.wait()
+    if transport == "shm":
+        shm.close()
+    else:
+        sock.close()
+    results.put((frames, cpu))
+
+
+def run(duration, rate, intervals):
+    print("{:16s} {:>15s} {:>9s} {:>9s} {:>14s} {:>14s}".format(
+        "transport", "received/sent", "p50 ms", "p99 ms", "writer us/fr", "reader us/fr"))
+    transports = [("udp-osc", None), ("udp-binary", None)] + [("shm", interval) for interval in intervals]
+    for transport, interval in transports:
+        # separate processes as the server and the client, each with its own resource tracker of the shared memory
+        ready, done, finished = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Event()
+        reader_results, writer_results = multiprocessing.Queue(), multiprocessing.Queue()
+        reader_process = multiprocessing.Process(target=reader, args=(transport, interval, ready, done, reader_results))
+        reader_process.start()
+        # the shared memory reader looks for the block until the writer creates it
+        ready.wait()
+        writer_process = multiprocessing.Process(target=writer,
+                                                 args=(transport, duration, rate, done, finished, writer_results))
+        writer_process.start()
+        latencies, reader_cpu = reader_results.get()
+        finished.set()
+        frames, writer_cpu = writer_results.get()
+        reader_process.join()
+        writer_process.join()
+        name = transport if interval is None else "{} {:g} ms".format(transport, interval * 1000)
+        print("{:16s} {:>15s} {:9.3f} {:9.3f} {:14.1f} {:14.1f}".format(
+            name, "{}/{}".format(len(latencies), frames), percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000, writer_cpu / frames * 1e6, reader_cpu / frames * 1e6))
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 5, float(sys.argv[2]) if len(sys.argv) > 2 else 500,
+        [float(ms) / 1000 for ms in sys.argv[3].split(",")] if len(sys.argv) > 3 else POLL_INTERVALS)
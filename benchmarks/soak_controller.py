@@ -0,0 +1,92 @@
+"""
+Soak test of the controller event logic.
+
+Drives a Controller with the "thread" engine through one simulated hour of random playing (presses, MultiPress,
+combinations, held buttons with repeated hold callbacks) on a virtual clock, and checks that the memory used, the
+number of threads and the number of pending callbacks stay flat.
+
+usage: python benchmarks/soak_controller.py [simulated seconds]
+"""
+import os
+import random
+import sys
+import threading
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyo import Server
+import controller
+
+FPS = 60
+BUTTONS = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB']
+MAX_MEMORY_GROWTH = 64 * 1024 # bytes, after the warm-up
+
+
+def run(duration):
+    now = [0.]
+    clock = lambda: now[0]
+    scheduler = controller.CallbackScheduler(clock=clock)
+    controller.setScheduler(scheduler)
+
+    server = Server(audio='offline').boot()
+    ctl = controller.Controller(engine="thread", clock=clock)
+
+    calls = [0]
+
+    def count(*args):
+        calls[0] += 1
+
+    def hold():
+        calls[0] += 1
+
+    for btn in BUTTONS:
+        ctl.buttons[btn].setOnPressCallback(count)
+        ctl.buttons[btn].setOnReleaseCallback(count)
+        ctl.buttons[btn].setCallback(count)
+    ctl.buttons['A'].setOnHoldCallback(hold, repeat=True)
+    ctl.buttons['B'].setOnHoldCallback(hold)
+    ctl.registerMultiPress('X', 2, count)
+    ctl.registerMultiPress('X', 3, count)
+    ctl.registerCombination(['LS', 'RS'], count)
+    ctl.registerCombination(['LB', 'RB', 'Y'], count)
+
+    rand = random.Random(1)
+    pressed = {}
+    samples = []
+    tracemalloc.start()
+    nframes = int(duration * FPS)
+    for frame in range(nframes):
+        now[0] = frame / float(FPS)
+        # about 10 presses per second, held from one frame to two seconds
+        if rand.random() < 10. / FPS:
+            btn = rand.choice(BUTTONS)
+            if btn not in pressed:
+                pressed[btn] = now[0] + rand.choice([0.02, 0.05, 0.1, 0.3, 1.2, 2.])
+                ctl.oscDataCallback('/XB1/btn/{}'.format(btn), 1)
+        for btn, release_time in list(pressed.items()):
+            if now[0] >= release_time:
+                del pressed[btn]
+                ctl.oscDataCallback('/XB1/btn/{}'.format(btn), 0)
+        ctl.oscDataCallback('/XB1/cts/LX', rand.uniform(-1, 1))
+        scheduler.runPending(now[0])
+
+        if frame % (60 * FPS) == 0:
+            samples.append((now[0], tracemalloc.get_traced_memory()[0], threading.active_count(), scheduler.pending()))
+
+    tracemalloc.stop()
+    for t, memory, threads, pending in samples:
+        print("{:6.0f} s : memory {:8d} B  threads {}  pending callbacks {}".format(t, memory, threads, pending))
+    print("callbacks called : {}".format(calls[0]))
+
+    # the first samples are the warm-up
+    warm = samples[min(5, len(samples) - 1)]
+    assert samples[-1][1] - warm[1] < MAX_MEMORY_GROWTH, "memory is growing"
+    assert max(s[2] for s in samples) == min(s[2] for s in samples), "thread count is growing"
+    assert max(s[3] for s in samples) < 100, "pending callbacks are piling up"
+    ctl.cleanup()
+    print("OK")
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 3600)
@@ -0,0 +1,146 @@
+"""
+Benchmark of the binary state packet transport against the OSC bundle.
+
+Encodes random frames with both transports, decodes them into two Controllers and compares the bytes on the wire
+and the client decode time per frame. Checks that both controllers end every frame with the same values, that
+a packet of two gamepads gives each Controller the values of its own gamepad, and that the decoder follows a
+restarted server while it still ignores the late packets.
+
+usage: python benchmarks/state_packet.py [number of frames]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pythonosc.osc_packet import OscPacket
+from pyo import Server
+import controller
+from osc_encode import controller_values, analysis_values, createTemplate, randomize
+from state_packet import StatePacketEncoder, StatePacketDecoder
+
+
+def decodeOsc(ctl, data):
+    for timed_msg in OscPacket(data).messages:
+        msg = timed_msg.message
+        ctl.oscDataCallback(msg.address, *msg.params)
+
+
+def sameState(first, second):
+    for name, obj in first.sticks.items():
+        if obj.input.value != second.sticks[name].input.value:
+            return False
+    for name, obj in first.triggers.items():
+        if obj.input.value != second.triggers[name].input.value:
+            return False
+    for name, button in first.buttons.items():
+        if button.get() != second.buttons[name].get():
+            return False
+    for name, obj in first.analysis.items():
+        if obj.value != second.analysis[name].value:
+            return False
+    return list(first.dpad.getValue()) == list(second.dpad.getValue())
+
+
+def checkTwoGamepads(nframes):
+    # the gamepads of a two gamepads packet against the same states sent one gamepad per packet
+    rand = random.Random(2)
+    states = []
+    for i in range(nframes):
+        randomize(rand)
+        states.append((dict(controller_values), dict(analysis_values)))
+    pair_encoder = StatePacketEncoder(2)
+    single_encoders = [StatePacketEncoder(1), StatePacketEncoder(1)]
+    pair = [controller.Controller(engine="tick", tick_period=None) for i in range(2)]
+    singles = [controller.Controller(engine="tick", tick_period=None) for i in range(2)]
+    pair_decoder = StatePacketDecoder(pair)
+    single_decoders = [StatePacketDecoder([ctl]) for ctl in singles]
+    for i in range(nframes):
+        frame_states = [states[i], states[(i * 7 + 3) % nframes]]
+        assert pair_decoder.decode(bytes(pair_encoder.encode(i * 0.016, frame_states)))
+        for index, state in enumerate(frame_states):
+            single_decoders[index].decode(bytes(single_encoders[index].encode(i * 0.016, [state])))
+            assert sameState(pair[index], singles[index]), \
+                "gamepad {} of the two gamepads packet differs at frame {}".format(index, i)
+    for ctl in pair + singles:
+        ctl.cleanup()
+
+
+def checkRestart(nframes):
+    # servers restarted after a short and a long run, the new sequence numbers start behind the last one applied
+    rand = random.Random(3)
+    reference = controller.Controller(engine="tick", tick_period=None)
+    ctl = controller.Controller(engine="tick", tick_period=None)
+    reference_decoder = StatePacketDecoder([reference])
+    decoder = StatePacketDecoder([ctl])
+    now = 0.
+    packets = []
+    for run_frames in (nframes, 50, 10000):
+        encoder = StatePacketEncoder(1)
+        for i in range(run_frames):
+            now += 0.016
+            randomize(rand)
+            packets.append(bytes(encoder.encode(now, [(controller_values, analysis_values)])))
+            assert decoder.decode(packets[-1]), "the packet {} of a restarted server was ignored".format(i)
+            # a fresh decoder only sees the current server
+            StatePacketDecoder([reference]).decode(packets[-1])
+            assert sameState(ctl, reference), "the state differs after a restart, at packet {}".format(i)
+    stats = decoder.getStats()
+    assert stats['restarts'] == 2 and stats['late'] == 0 and stats['lost'] == 0, stats
+    # the packets reordered or duplicated by the network are still late
+    for data in [packets[-1], packets[-2], packets[-200]]:
+        assert not decoder.decode(data), "a late packet was applied"
+    assert decoder.getStats()['restarts'] == 2
+    for c in (reference, ctl):
+        c.cleanup()
+
+
+def run(nframes):
+    checkTwoGamepads(200)
+    checkRestart(100)
+    rand = random.Random(1)
+    template, build = createTemplate()
+    encoder = StatePacketEncoder(1)
+    osc_frames = []
+    binary_frames = []
+    for i in range(nframes):
+        # a button or a stick moves every frame, the analysis follows
+        randomize(rand) if i % 10 == 0 else controller_values.update(LX=rand.uniform(-1, 1))
+        osc_frames.append(bytes(build(i * 0.016)))
+        binary_frames.append(bytes(encoder.encode(i * 0.016, [(controller_values, analysis_values)])))
+
+    osc_ctl = controller.Controller(engine="tick", tick_period=None)
+    binary_ctl = controller.Controller(engine="tick", tick_period=None)
+    decoder = StatePacketDecoder([binary_ctl])
+
+    # both transports must give the same values
+    for i in range(min(nframes, 500)):
+        decodeOsc(osc_ctl, osc_frames[i])
+        decoder.decode(binary_frames[i])
+        assert sameState(osc_ctl, binary_ctl), "the transports differ at frame {}".format(i)
+
+    start = time.perf_counter()
+    for data in osc_frames:
+        decodeOsc(osc_ctl, data)
+    osc_time = time.perf_counter() - start
+    # the sequence numbers start over
+    decoder = StatePacketDecoder([binary_ctl])
+    start = time.perf_counter()
+    for data in binary_frames:
+        decoder.decode(data)
+    binary_time = time.perf_counter() - start
+
+    print("{:7s}: {:5d} bytes/frame {:8.2f} us/frame decode".format(
+        "osc", len(osc_frames[0]), osc_time / nframes * 1e6))
+    print("{:7s}: {:5d} bytes/frame {:8.2f} us/frame decode".format(
+        "binary", len(binary_frames[0]), binary_time / nframes * 1e6))
+    print("decoder stats: {}".format(decoder.getStats()))
+    osc_ctl.cleanup()
+    binary_ctl.cleanup()
+
+
+if __name__ == "__main__":
+    server = Server(audio='offline').boot()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -6,8 +6,14 @@ from pyo import *
 from typing import *
 import time
 import threading
+import heapq
+import itertools
+import collections
+import traceback
 import sys
 
+from latency import LatencyMonitor
+
 # setting this to true will print controller data every time time osc data is received
 DEBUG = False
 
@@ -15,6 +21,7 @@ CONTROLLER_ROOT_ADDRESS = '/XB1'
 ANALYSIS_ROOT_ADDRESS = '/ANA'
 BUTTONS_ADDRESS = '/btn'
 CONTINUOUS_INPUTS_ADDRESS = '/cts'
+TIME_ADDRESS = '/time'
 
 CONTINUOUS_INPUTS = ['LT', 'RT', 'LX', 'LY', 'RX', 'RY']
 BUTTON_INPUTS = ['A', 'B', 'X', 'Y', 'LB', 'LT', 'RB', 'RT', 'BACK', 'START', 'LS', 'RS', 'DPAD', 'XB']
@@ -27,32 +34,233 @@ def islambda(func):
   return isinstance(func, type(LAMBDA)) and func.__name__ == LAMBDA.__name__
 
 
-class CallbackTimer_base(threading.Thread):
-    def __init__(self, duration: Union[float, int], callback: callable, args: List[Any] = None, lock=None):
-        threading.Thread.__init__(self)
-        self._dur = duration
+def _invoke(callback, args, lock):
+    if lock:
+        lock.acquire()
+    try:
+        if args is None:
+            callback()
+        else:
+            callback(*args)
+    finally:
+        if lock:
+            lock.release()
+
+
+class ScheduledCallback:
+    """
+    class ScheduledCallback
+
+    Record of a callback in the CallbackScheduler, returned by CallbackScheduler.schedule(). A record is alive from
+    the moment it is scheduled until its callback has returned, or until it is stopped. Periodic records stay alive
+    until they are stopped.
+    Records can be scheduled again once they are done, which is how the timers and queues of this module reuse them.
+    """
+    def __init__(self, callback: callable = None, args: List[Any] = None, lock=None, period: Union[float, int] = None):
         self._callback = callback
         self._args = args
         self._lock = lock
+        self._period = period
+        self._deadline = 0
         self._is_alive = False
-        self._stop_event = threading.Event()
+        self._stopped = False
+        self._generation = 0 # incremented on every schedule, older entries of the record in the heap are ignored
+        self._on_done = None # called with the record once it is done
+        self._policy = LoopPolicyEnum.delay # how periodic records are scheduled again, see LoopPolicyEnum
+        self._stats = None # LoopStats of periodic records, if any
+
+    def _execute(self):
+        _invoke(self._callback, self._args, self._lock)
+
+    def _nextDeadline(self, deadline, now):
+        if self._policy == LoopPolicyEnum.delay:
+            return now + self._period
+        deadline += self._period
+        if self._policy == LoopPolicyEnum.skip and deadline <= now:
+            missed = int((now - deadline) // self._period) + 1
+            deadline += missed * self._period
+            if self._stats is not None:
+                self._stats.skipped += missed
+        return deadline
+
+    def stop(self):
+        self._stopped = True
+        self._is_alive = False
+
+    def is_alive(self):
+        return self._is_alive
+
+    def getCallback(self):
+        return self._callback
+
+    def getDeadline(self):
+        return self._deadline
+
+
+class CallbackScheduler(threading.Thread):
+    """
+    class CallbackScheduler
+
+    Runs every deferred and periodic callback of this module on a single thread instead of one thread per timer.
+    Pending callbacks are kept in a heap ordered by their deadline, stopped records are simply skipped when they
+    reach the top of the heap.
+    Callbacks run one after the other, so they should return quickly.
+
+    :Args:
+
+        clock: callable
+            Returns the current time in seconds. Defaults to time.monotonic.
+            With another clock, ie.: a virtual one, the thread should not be started: call runPending() instead.
+    """
+    def __init__(self, clock: callable = None):
+        threading.Thread.__init__(self, name="CallbackScheduler", daemon=True)
+        self._clock = clock if clock is not None else time.monotonic
+        self._heap = []
+        self._counter = itertools.count() # keeps the heap ordering stable for equal deadlines
+        self._cond = threading.Condition()
+
+    def _push(self, handle, deadline):
+        # must be called with self._cond acquired
+        handle._deadline = deadline
+        handle._is_alive = True
+        heapq.heappush(self._heap, (deadline, next(self._counter), handle, handle._generation))
+        # only wake the thread up if the new callback is due before the one it is waiting for
+        if self._heap[0][2] is handle:
+            self._cond.notify()
+
+    def _popDue(self, now):
+        # must be called with self._cond acquired
+        while self._heap:
+            deadline, count, handle, generation = self._heap[0]
+            if handle._stopped or handle._generation != generation:
+                heapq.heappop(self._heap)
+                continue
+            if deadline > now:
+                return None
+            heapq.heappop(self._heap)
+            # the callback is copied now, the record may be scheduled again while it runs
+            return handle, generation, deadline, handle._callback, handle._args, handle._lock
+        return None
+
+    def _next(self):
+        with self._cond:
+            while True:
+                entry = self._popDue(self._clock())
+                if entry is not None:
+                    return entry
+                if self._heap:
+                    self._cond.wait(self._heap[0][0] - self._clock())
+                else:
+                    self._cond.wait()
+
+    def _run(self, entry):
+        handle, generation, deadline, callback, args, lock = entry
+        if handle._stats is not None:
+            handle._stats.record(self._clock() - deadline)
+        try:
+            _invoke(callback, args, lock)
+        except Exception:
+            traceback.print_exc()
+
+        with self._cond:
+            if handle._generation != generation:
+                # scheduled again in the meantime
+                return
+            if handle._period is not None and not handle._stopped:
+                self._push(handle, handle._nextDeadline(deadline, self._clock()))
+                return
+            handle._is_alive = False
+            on_done = handle._on_done
+        if on_done:
+            on_done(handle)
 
     def run(self):
-        self._is_alive = True
-        time.sleep(self._dur)
-        if not self._stop_event.is_set():
-            if self._lock:
-                self._lock.acquire()
-            if self._args is None:
-                self._callback()
+        while True:
+            self._run(self._next())
+
+    def runPending(self, now: Union[float, int] = None):
+        """
+        Run every callback due at time 'now' on the calling thread, in deadline order.
+        Used to drive a scheduler that was not started, ie.: with a virtual clock.
+        :param now: defaults to the current time of the clock
+        """
+        if now is None:
+            now = self._clock()
+        while True:
+            with self._cond:
+                entry = self._popDue(now)
+            if entry is None:
+                break
+            self._run(entry)
+
+    def schedule(self, delay: Union[float, int], callback: callable, args: List[Any] = None, lock=None,
+                 period: Union[float, int] = None, handle: ScheduledCallback = None):
+        """
+        Schedule a callback.
+        :param delay: time in seconds before the first call
+        :param period: if given, the callback is called again every period seconds until the record is stopped
+        :param handle: record to reuse, a new one is created if None
+        :return: ScheduledCallback record
+        """
+        with self._cond:
+            if handle is None:
+                handle = ScheduledCallback()
             else:
-                self._callback(*self._args)
-            if self._lock:
-                self._lock.release()
-        self._is_alive = False
+                handle._generation += 1
+            handle._callback = callback
+            handle._args = args
+            handle._lock = lock
+            handle._period = period
+            handle._stopped = False
+            self._push(handle, self._clock() + delay)
+        return handle
+
+    def pending(self):
+        """
+        Number of entries in the heap, stopped ones included until they are discarded.
+        """
+        return len(self._heap)
 
-    def stop(self):
-        self._stop_event.set()
+    def nextDeadline(self):
+        """
+        Get the deadline of the next callback to be called, to drive a scheduler that was not started.
+        :return: float, or None if nothing is pending
+        """
+        with self._cond:
+            while self._heap:
+                deadline, count, handle, generation = self._heap[0]
+                if handle._stopped or handle._generation != generation:
+                    heapq.heappop(self._heap)
+                    continue
+                return deadline
+        return None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def getScheduler():
+    """
+    Get the scheduler shared by all the timers of this module, starting its thread on first use.
+    :return: CallbackScheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CallbackScheduler()
+            _scheduler.start()
+    return _scheduler
+
+
+def setScheduler(scheduler: CallbackScheduler):
+    """
+    Replace the scheduler shared by all the timers of this module. Timers already pending stay on the old one.
+    A scheduler set this way is not started.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
 
 
 class CallbackTimer:
@@ -61,26 +269,15 @@ class CallbackTimer:
         self._callback = callback
         self._args = args
         self._lock = lock
-        self._timer_objs = []
+        self._handle = ScheduledCallback()
 
     def start(self):
-        nobjs = len(self._timer_objs)
-        i = 0
-        # stop previous timers and delete old ones if any
-        while i < nobjs:
-            if self._timer_objs[i].is_alive():
-                self._timer_objs[i].stop()
-                i += 1
-            else:
-                del self._timer_objs[i]
-                nobjs -= 1
-
-        self._timer_objs.append(CallbackTimer_base(self._dur, self._callback, self._args, self._lock))
-        self._timer_objs[-1].start()
+        # stop the previous call if it is still pending, the record is reused
+        self._handle.stop()
+        getScheduler().schedule(self._dur, self._callback, self._args, self._lock, handle=self._handle)
 
     def stop(self):
-        if self._timer_objs:
-            self._timer_objs[-1].stop()
+        self._handle.stop()
 
     def setCallback(self, callback: callable, args: List[Any] = None):
         self._callback = callback
@@ -90,113 +287,195 @@ class CallbackTimer:
         self._lock = lock
 
     def is_alive(self):
-        return self._timer_objs[-1]._is_alive
+        return self._handle.is_alive()
 
 
 class CallbackQueue:
-    def __init__(self, delay: Union[float, int], lock=None):
+    """
+    class CallbackQueue
+
+    Calls each queued item once, after a fixed delay, on the callback scheduler.
+    The queue owns a pool of ScheduledCallback records that are reused. Items are given back to the pool as soon as
+    they are done, so the queue doesn't allocate while it is used within its capacity. The capacity is a soft bound:
+    when every record is in use a new one is made, so no item is ever dropped, and the records beyond the capacity
+    are let go once they are done. getStats() tells how often the queue had to grow.
+
+    :Args:
+
+        delay: int or float
+            Time between the moment an item is queued and the moment it is called.
+        lock: threading.Lock
+            Default lock acquired while the items are called.
+        capacity: int
+            Number of pooled records, the number of pending items the queue handles without allocating.
+    """
+    def __init__(self, delay: Union[float, int], lock=None, capacity=32):
         self._delay = delay
         self._lock = lock
-        self._items = []
-        self._async_cleanup = CallbackTimer(1, self._cleanup)
-
-    def _cleanup(self):
-        i = 0
-        max = len(self._items)
-        while i < max:
-            if not self._items[i].is_alive():
-                del self._items[i]
-                max -= 1
-            else:
-                i += 1
+        self._capacity = capacity
+        self._items = collections.OrderedDict() # pending records, in queuing order
+        self._pool = [self._newRecord() for i in range(capacity)]
+        self._records = capacity # records owned by the queue, pooled or pending
+        self._grown = 0
+        self._peak = 0
+        self._items_lock = threading.Lock()
+
+    def _newRecord(self):
+        record = ScheduledCallback()
+        record._on_done = self._release
+        return record
+
+    def _recycle(self, record):
+        # the records made beyond the capacity are let go
+        if self._records > self._capacity:
+            self._records -= 1
+        else:
+            self._pool.append(record)
+
+    def _release(self, record):
+        with self._items_lock:
+            if self._items.pop(record, None) is not None:
+                self._recycle(record)
 
     def queue(self, item: callable, args: List[Any] = None, offset=0.00, lock=None):
         if lock is None:
             lock = self._lock
-        self._items.append(CallbackTimer(self._delay+offset, item, args, lock))
-        self._items[-1].start()
+        with self._items_lock:
+            if self._pool:
+                record = self._pool.pop()
+            else:
+                record = self._newRecord()
+                self._records += 1
+                self._grown += 1
+                if DEBUG:
+                    print("CallbackQueue full, growing to {} records".format(self._records))
+            self._items[record] = True
+            self._peak = max(self._peak, len(self._items))
+            getScheduler().schedule(self._delay+offset, item, args, lock, handle=record)
 
     def empty(self):
-        for item in self._items:
-            item.stop()
-        self._async_cleanup.start()
+        with self._items_lock:
+            for record in self._items:
+                record.stop()
+                self._recycle(record)
+            self._items.clear()
 
     def is_empty(self):
-        for item in self._items:
-            if item.is_alive():
-                return False
-        return True
+        return not self._items
 
     def getItem(self):
         """
         Get the most recently queued item.
         :return: item
         """
-        return self._items[-1]
+        return next(reversed(self._items))
 
     def getItems(self):
         """
-        Get the complete list of items in the queue, dead or alive.
+        Get the list of items still pending.
         :return: list of items
         """
-        return self._items
+        return list(self._items)
 
+    def getStats(self):
+        """
+        Get the number of pending items, the capacity, the number of records made beyond the capacity and the
+        largest number of items pending at once.
+        :return: dict
+        """
+        return {'pending': len(self._items), 'capacity': self._capacity, 'grown': self._grown, 'peak': self._peak}
 
-class CallbackLoop_base(threading.Thread):
-    def __init__(self, duration: Union[float, int], callback: callable, args: List[Any] = None, lock=None):
-        threading.Thread.__init__(self)
-        self._dur = duration
-        self._callback = callback
-        self._args = args
-        self._lock = lock
-        self._is_alive = False
-        self._stop_event = threading.Event()
 
-    def run(self):
-        self._is_alive = True
-        while not self._stop_event.is_set():
-            if self._lock:
-                self._lock.acquire()
-            if self._args is None:
-                self._callback()
-            else:
-                self._callback(*self._args)
-            if self._lock:
-                self._lock.release()
+class LoopPolicyEnum:
+    delay = 0 # the next call is due one period after the end of the callback, the period stretches with its runtime
+    catchup = 1 # calls are due every period from the start, late calls are all made as soon as possible
+    skip = 2 # calls are due every period from the start, calls that are more than a period late are skipped
+    str_mapping = {"delay":delay, "catchup":catchup, "skip":skip}
 
-            time.sleep(self._dur)
-        self._is_alive = False
+    @classmethod
+    def getitem(cls, item):
+        return LoopPolicyEnum.str_mapping[item]
 
-    def stop(self):
-        self._stop_event.set()
+    @classmethod
+    def contains(cls, item):
+        for key, val in LoopPolicyEnum.str_mapping.items():
+            if item == val or item == key:
+                return True
+        return False
+
+
+class LoopStats:
+    """
+    class LoopStats
+
+    Timing statistics of a periodic callback.
+
+    :Args:
+
+        tolerance: int or float
+            A call is counted as late when it starts more than tolerance seconds after its deadline.
+    """
+    def __init__(self, tolerance: Union[float, int] = 0.002):
+        self._tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.late = 0
+        self.skipped = 0
+        self.max_lateness = 0.
+        self.total_lateness = 0.
+
+    def record(self, lateness):
+        self.ticks += 1
+        self.total_lateness += lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        if lateness > self._tolerance:
+            self.late += 1
+
+    def get(self):
+        return {'ticks': self.ticks, 'late': self.late, 'skipped': self.skipped, 'max_lateness': self.max_lateness,
+                'mean_lateness': self.total_lateness / self.ticks if self.ticks else 0.}
 
 
 class CallbackLoop:
-    def __init__(self, duration: Union[float, int], callback: callable, args: List[Any] = None, lock=None):
+    """
+    class CallbackLoop
+
+    Calls a callback periodically on the callback scheduler, until it is stopped.
+
+    :Args:
+
+        duration: int or float
+            Period of the loop.
+        callback: callable
+        args: list
+            Arguments passed to the callback.
+        lock: threading.Lock
+            Lock acquired while the callback is called.
+        policy: int or str
+            See LoopPolicyEnum. Defaults to "delay", a loop that waits one period after each call. The "catchup" and
+            "skip" policies keep the loop on a fixed grid of deadlines, so the period doesn't drift with the runtime
+            of the callback.
+    """
+    def __init__(self, duration: Union[float, int], callback: callable, args: List[Any] = None, lock=None,
+                 policy=LoopPolicyEnum.delay):
         self._dur = duration
         self._callback = callback
         self._args = args
         self._lock = lock
-        self._looper_objs = []
+        self._handle = ScheduledCallback()
+        self._handle._stats = LoopStats()
+        self.setPolicy(policy)
 
     def start(self):
-        nobjs = len(self._looper_objs)
-        i = 0
-        # stop previous timers and delete old ones if any
-        while i < nobjs:
-            if self._looper_objs[i].is_alive():
-                self._looper_objs[i].stop()
-                i += 1
-            else:
-                del self._looper_objs[i]
-                nobjs -= 1
-
-        self._looper_objs.append(CallbackLoop_base(self._dur, self._callback, self._args, self._lock))
-        self._looper_objs[-1].start()
+        # stop the previous loop if it is still running, the record is reused
+        self._handle.stop()
+        getScheduler().schedule(0, self._callback, self._args, self._lock, period=self._dur, handle=self._handle)
 
     def stop(self):
-        if self._looper_objs:
-            self._looper_objs[-1].stop()
+        self._handle.stop()
 
     def setCallback(self, callback: callable, args: List[Any] = None):
         self._callback = callback
@@ -205,8 +484,110 @@ class CallbackLoop:
     def setLock(self, lock):
         self._lock = lock
 
+    def setPolicy(self, policy):
+        if isinstance(policy, int):
+            if not LoopPolicyEnum.contains(policy):
+                raise ValueError("Unknown loop policy: {}".format(policy))
+            self._handle._policy = policy
+        elif isinstance(policy, str):
+            if policy not in LoopPolicyEnum.str_mapping:
+                raise ValueError("Unknown loop policy: '{}', valid policies are {}".format(
+                    policy, ", ".join(sorted(LoopPolicyEnum.str_mapping))))
+            self._handle._policy = LoopPolicyEnum.getitem(policy)
+        else:
+            raise TypeError("'policy' can either be of type int or str")
+
+    def getStats(self):
+        """
+        Get the timing statistics of the loop: number of calls, of late calls (more than 2 ms after their deadline),
+        of skipped calls, and the maximum and mean lateness in seconds.
+        :return: dict
+        """
+        return self._handle._stats.get()
+
+    def resetStats(self):
+        self._handle._stats.reset()
+
     def is_alive(self):
-        return self._looper_objs[-1]._is_alive
+        return self._handle.is_alive()
+
+
+class TickQueue:
+    """
+    class TickQueue
+
+    Same interface as CallbackQueue, except that nothing runs by itself: queued callbacks are called from tick(),
+    in deadline order, once the time given by the clock has reached their deadline.
+
+    :Args:
+
+        delay: int or float
+            Time between the moment an item is queued and the moment it is called.
+        clock: callable
+            Returns the current time in seconds. Defaults to time.monotonic.
+    """
+    def __init__(self, delay: Union[float, int], clock: callable = None):
+        self._delay = delay
+        self._clock = clock if clock is not None else time.monotonic
+        self._items = []
+
+    def queue(self, item: callable, args: List[Any] = None, offset=0.00, lock=None):
+        # the lock is ignored, callers of tick() are expected to serialize access themselves
+        handle = ScheduledCallback(item, args)
+        handle._deadline = self._clock() + self._delay + offset
+        handle._is_alive = True
+        self._items.append(handle)
+
+    def empty(self):
+        for item in self._items:
+            item.stop()
+        self._items = []
+
+    def is_empty(self):
+        for item in self._items:
+            if item.is_alive():
+                return False
+        return True
+
+    def nextDeadline(self):
+        """
+        Get the deadline of the next item to be called.
+        :return: float, or None if the queue is empty
+        """
+        deadline = None
+        for item in self._items:
+            if item._is_alive and (deadline is None or item._deadline < deadline):
+                deadline = item._deadline
+        return deadline
+
+    def tick(self, now: Union[float, int]):
+        """
+        Call every item whose deadline is due at time 'now'.
+        """
+        while True:
+            due = None
+            for item in self._items:
+                if item._is_alive and item._deadline <= now and (due is None or item._deadline < due._deadline):
+                    due = item
+            if due is None:
+                break
+            due._is_alive = False
+            due._execute()
+        self._items = [item for item in self._items if item._is_alive]
+
+    def getItem(self):
+        """
+        Get the most recently queued item.
+        :return: item
+        """
+        return self._items[-1]
+
+    def getItems(self):
+        """
+        Get the list of items still waiting in the queue.
+        :return: list of items
+        """
+        return self._items
 
 
 class ButtonModeEnum:
@@ -242,10 +623,13 @@ class Button:
             Time a button needs to be pressed for it to be considered a hold event.
         hold_repeat_delay: int or float
             Time between recurrent calls when a button is held down. Used when "repeat" is set to True.
+        clock: callable
+            Returns the current time in seconds. Defaults to time.time.
     """
     def __init__(self, name: AnyStr, event_delay: Union[int, float], hold_delay: Union[int, float],
-                 hold_repeat_delay: Union[int, float]):
+                 hold_repeat_delay: Union[int, float], clock: callable = None):
         self._button_str = name
+        self._clock = clock if clock is not None else time.time
         self._event_delay = event_delay
         self._hold_delay = hold_delay
         self._hold_repeat_delay = hold_repeat_delay
@@ -260,6 +644,7 @@ class Button:
 
         self._multipress_objs = []
         self._combination_objs = []
+        self._combination_matcher = None
 
         # threaded queue stuff
         self._state_lock = threading.Lock()
@@ -276,6 +661,8 @@ class Button:
         self._callback = lambda x: None # called both when the button is pressed and released
         # this callback passes the state variable as an argument
 
+        self._latency = None
+
     def _onPress(self):
         if DEBUG:
             print("[{}] pressed".format(self._button_str))
@@ -284,12 +671,15 @@ class Button:
             self._repeats += 1
         else:
             self._repeats = 1
-        self._timestamp = time.time()
+        self._timestamp = self._clock()
 
         # systematically queue the hold event, it'll get cancelled if the hold time wasn't long enough
         # or it'll get cancelled if a combination gets triggered
         self._hold_event_queue.queue(self._onHoldEvent, lock=self._state_lock)
 
+        self._dispatchPress()
+
+    def _dispatchPress(self):
         # if part of combination, either queue MultiPress events or the basic callback
         if self._combination_objs:
             if self._multipress_objs:
@@ -297,11 +687,11 @@ class Button:
                     for mp in self._multipress_objs:
                         if mp == self._repeats:
                             self._global_event_queue.empty()
-                            self._global_event_queue.queue(mp)
+                            self._queueItem(mp)
             if self._global_event_queue.is_empty():
                 self._QUEUE_BASIC_CALLBACKS_FLAG = True
                 self._global_event_queue.queue(self._onPressUpdateState)
-                self._global_event_queue.queue(self._onPressCallback, offset=0.01)
+                self._queueItem(self._onPressCallback, offset=0.01)
         else:
             # if there are MultiPress events, either : queue the current one if there are other MultiPress events
             # or : trigger the MultiPress if no other exists
@@ -312,13 +702,13 @@ class Button:
                         if self._repeats == mp:
                             if self._repeats < self._multipress_objs[-1]:
                                 self._global_event_queue.empty()
-                                self._global_event_queue.queue(mp)
+                                self._queueItem(mp)
                             else:
                                 mp()
                 else:
                     self._QUEUE_BASIC_CALLBACKS_FLAG = True
                     self._global_event_queue.queue(self._onPressUpdateState)
-                    self._global_event_queue.queue(self._onPressCallback, offset=0.01)
+                    self._queueItem(self._onPressCallback, offset=0.01)
             else:
                 self._TRIGGER_BASIC_CALLBACKS_FLAG = True
                 self._onPressUpdateState()
@@ -353,17 +743,19 @@ class Button:
                 self._hold_callback_loop.stop()
         else:
             self._hold_event_queue.empty()
+            self._dispatchRelease()
 
-            if self._TRIGGER_BASIC_CALLBACKS_FLAG:
-                self._onReleaseUpdateState()
-                self._onReleaseCallback()
-            else:
-                if self._QUEUE_BASIC_CALLBACKS_FLAG:
-                    self._global_event_queue.queue(self._onReleaseUpdateState)
-                    self._global_event_queue.queue(self._onReleaseCallback, offset=0.01)
+    def _dispatchRelease(self):
+        if self._TRIGGER_BASIC_CALLBACKS_FLAG:
+            self._onReleaseUpdateState()
+            self._onReleaseCallback()
+        else:
+            if self._QUEUE_BASIC_CALLBACKS_FLAG:
+                self._global_event_queue.queue(self._onReleaseUpdateState)
+                self._queueItem(self._onReleaseCallback, offset=0.01)
 
     def _isRepeatedPress(self):
-        if (time.time() - self._timestamp) <= self._event_delay:
+        if (self._clock() - self._timestamp) <= self._event_delay:
             return True
         else:
             return False
@@ -378,8 +770,11 @@ class Button:
         else:
             self._onHoldCallback()
 
-    def _queueItem(self, item):
-        self._global_event_queue.queue(item)
+    def _queueItem(self, item, offset=0.00):
+        # last callback of an event, its completion is the one measured by the latency stats
+        if self._latency is not None:
+            item = self._latency.wrapCallback(self._button_str, item)
+        self._global_event_queue.queue(item, offset=offset)
 
     def emptyQueue(self):
         self._global_event_queue.empty()
@@ -399,6 +794,8 @@ class Button:
 
         if self._TRIGGER_BASIC_CALLBACKS_FLAG:
             self._callback(self._state)
+            if self._latency is not None:
+                self._latency.recordCallback(self._button_str)
         else:
             if self._QUEUE_BASIC_CALLBACKS_FLAG:
                 self._global_event_queue.queue(self._callback, [self._state])
@@ -409,8 +806,8 @@ class Button:
 
         # this NEEDS to happen AFTER the queue is updated
         # because the code coming after this might cancel the queue
-        for combination in self._combination_objs:
-            combination.setButtonState(self._button_str, bool(self._value))
+        if self._combination_matcher is not None:
+            self._combination_matcher.setButtonState(self._button_str, bool(self._value))
 
     def get(self):
         return self._value
@@ -420,8 +817,9 @@ class Button:
             self._multipress_objs.append(MultiPress(repeats, callback))
         self._multipress_objs.sort()
 
-    def addCombinationEvent(self, combination_object):
+    def addCombinationEvent(self, combination_object, matcher):
         self._combination_objs.append(combination_object)
+        self._combination_matcher = matcher
 
     def setOnPressCallback(self, callback):
         assert callable(callback), "Callback must be of type 'callable'"
@@ -431,17 +829,31 @@ class Button:
         assert callable(callback), "Callback must be of type 'callable'"
         self._onReleaseCallback = callback
 
-    def setOnHoldCallback(self, callback, repeat=False):
+    def setOnHoldCallback(self, callback, repeat=False, policy=LoopPolicyEnum.delay):
+        """
+        :param repeat: call the callback again every hold_repeat_delay seconds while the button is held
+        :param policy: LoopPolicyEnum of the repeats, "skip" or "catchup" keep them on a fixed grid. The "tick" engine
+                       always repeats on a fixed grid
+        """
         assert callable(callback), "Callback must be of type 'callable'"
         self._onHoldCallback = callback
         self._REPEAT_HOLD_EVENT = repeat
         if repeat:
-            self._hold_callback_loop = CallbackLoop(self._hold_repeat_delay, callback)
+            self._hold_callback_loop = CallbackLoop(self._hold_repeat_delay, callback, policy=policy)
 
     def setCallback(self, callback):
         assert callable(callback), "Callback must be of type 'callable'"
         self._callback = callback
 
+    def setLatencyMonitor(self, monitor):
+        """
+        Record the completion of the press and release callbacks in the callback stage of a latency.LatencyMonitor.
+        The callbacks deferred by the event queue (MultiPress and combinations) are recorded when they return, the
+        hold events are not recorded.
+        :param monitor: LatencyMonitor, or None to stop recording
+        """
+        self._latency = monitor
+
     def setMode(self, mode):
         if isinstance(mode, int):
             if ButtonModeEnum.contains(mode):
@@ -461,6 +873,131 @@ class Button:
         return self._button_str
 
 
+class ButtonPhaseEnum:
+    idle = 0 # released
+    pressed = 1 # pressed, waiting for the hold delay to expire or for a release
+    held = 2 # the hold event fired, hold-repeat callbacks are running if enabled
+
+
+class TickButton(Button):
+    """
+    class TickButton
+
+    Thread-free implementation of Button, as a finite-state machine (see ButtonPhaseEnum) that only advances when
+    set() or tick() are called. Queued press/release callbacks, MultiPress events, hold and hold-repeat events all
+    come out of tick(), using the time given by the clock, so the timing of the events is reproducible.
+
+    The public interface is the same as Button.
+
+    :Args:
+
+        name, event_delay, hold_delay, hold_repeat_delay:
+            See Button.
+        clock: callable
+            Returns the current time in seconds. Defaults to time.monotonic.
+        lock: threading.RLock
+            Serializes set() and tick() when they are called from different threads.
+    """
+    def __init__(self, name: AnyStr, event_delay: Union[int, float], hold_delay: Union[int, float],
+                 hold_repeat_delay: Union[int, float], clock: callable = None, lock=None):
+        Button.__init__(self, name, event_delay, hold_delay, hold_repeat_delay,
+                        clock if clock is not None else time.monotonic)
+        self._lock = lock if lock is not None else threading.RLock()
+        self._phase = ButtonPhaseEnum.idle
+        self._now = 0 # time of the input being processed
+        self._last_press = None
+        self._hold_deadline = None
+        self._repeat_deadline = None
+        self._global_event_queue = TickQueue(self._event_delay, self._clock)
+
+    def _onPress(self):
+        if DEBUG:
+            print("[{}] pressed".format(self._button_str))
+
+        if self._last_press is not None and (self._now - self._last_press) <= self._event_delay:
+            self._repeats += 1
+        else:
+            self._repeats = 1
+        self._timestamp = self._last_press = self._now
+
+        self._phase = ButtonPhaseEnum.pressed
+        self._hold_deadline = self._now + self._hold_delay
+        self._dispatchPress()
+
+    def _onRelease(self):
+        if DEBUG:
+            print("[{}] released".format(self._button_str))
+
+        if self._phase == ButtonPhaseEnum.held:
+            self._repeat_deadline = None
+        else:
+            self._hold_deadline = None
+            self._dispatchRelease()
+        self._phase = ButtonPhaseEnum.idle
+
+    def _onHoldEvent(self):
+        if islambda(self._onHoldCallback):
+            return
+
+        self._phase = ButtonPhaseEnum.held
+        if self._REPEAT_HOLD_EVENT:
+            self._repeat_deadline = self._now + self._hold_repeat_delay
+        self._onHoldCallback()
+
+    def _expire(self, deadline):
+        self._now = deadline
+        if self._hold_deadline is not None and self._hold_deadline <= deadline:
+            self._hold_deadline = None
+            self._onHoldEvent()
+        elif self._repeat_deadline is not None and self._repeat_deadline <= deadline:
+            self._repeat_deadline += self._hold_repeat_delay
+            self._onHoldCallback()
+        else:
+            self._global_event_queue.tick(deadline)
+
+    def nextDeadline(self):
+        """
+        Get the time at which the next event of this button is due.
+        :return: float, or None if nothing is pending
+        """
+        deadline = self._global_event_queue.nextDeadline()
+        for other in (self._hold_deadline, self._repeat_deadline):
+            if other is not None and (deadline is None or other < deadline):
+                deadline = other
+        return deadline
+
+    def tick(self, now: Union[float, int] = None):
+        """
+        Advance the button to time 'now', firing every event due until then in order.
+        :param now: defaults to the current time of the clock
+        """
+        with self._lock:
+            if now is None:
+                now = self._clock()
+            while True:
+                deadline = self.nextDeadline()
+                if deadline is None or deadline > now:
+                    break
+                self._expire(deadline)
+            self._now = now
+
+    def emptyQueue(self):
+        self._global_event_queue.empty()
+        self._hold_deadline = None
+        self._resetFlags()
+
+    def set(self, value):
+        with self._lock:
+            now = self._clock()
+            self.tick(now)
+            if value != self._value:
+                self._value = value
+                self._enterCallbackLogic()
+
+    def getPhase(self):
+        return self._phase
+
+
 class DPad:
     """
     class DPad
@@ -503,27 +1040,18 @@ class ButtonCombination(object):
     
     :arguments:
         buttons : the list of buttons part of the combination
-        delta : maximum time (in seconds) allowed between the first and last button press for a combination to be valid.
         target_callback : function to be triggered by this combination as set by the user
-        event_callback : function to call when the combination happens, this is the controller's method that ensures
-                         the combination is valid which will put the combination in the queue.
+        mask : bitmask of the buttons, as given by CombinationMatcher.getMask()
     """
-    def __init__(self, buttons: List[str], delta: Union[float, int],
-                 target_callback: callable, event_callback: callable):
+    def __init__(self, buttons: List[str], target_callback: callable, mask: int):
         assert isinstance(buttons, list), "buttons attribute must be of type list"
         for elem in buttons:
             assert isinstance(elem, str), "buttons attribute must be a list of strings"
-        assert isinstance(delta, float), "delta attribute must be of type float"
         assert callable(target_callback), "target_callback attribute must be a callable"
 
-        self._btns = buttons
-        self._btns.sort()
-        self._btns_state = [False] * len(self._btns)
-        self._delta = delta
-        # the callback will always be set to the controllers main combination callback
+        self._btns = sorted(buttons)
         self._target_callback = target_callback
-        self._event_callback = event_callback
-        self._initial_time = 0
+        self._mask = mask
 
     def __iter__(self):
         for item in self._btns:
@@ -541,32 +1069,91 @@ class ButtonCombination(object):
     def __call__(self):
         self._target_callback()
 
-    def _allButtonsPressed(self):
-        for state in self._btns_state:
-            if not state:
-                return False
-        return True
+    def getMask(self):
+        return self._mask
 
-    def _allButtonsUnpressed(self):
-        for state in self._btns_state:
-            if state:
-                return False
-        return True
 
-    def _verifyTiming(self):
-        if (time.time() - self._initial_time) <= self._delta:
-            return True
-        else:
-            return False
+class CombinationMatcher(object):
+    """
+    class CombinationMatcher
+
+    Detects the button combinations of a controller.
+    Each button that is part of a combination gets a bit, the pressed buttons are kept as an integer bitmask and the
+    combinations are indexed by their mask and by their buttons. When a button is pressed, only the combinations it
+    is part of are checked: a combination is matched when all its buttons are pressed, whatever the other buttons held,
+    the last one less than delta seconds after the first one of its own buttons. The priority of the combinations
+    matched at once is left to event_callback.
+
+    :parent: object
+
+    :arguments:
+        delta : maximum time (in seconds) allowed between the first and last button press for a combination to be valid.
+        event_callback : function to call with the ButtonCombination when the combination happens, this is the
+                         controller's method that handles the priority of the combinations.
+        clock : function returning the current time in seconds, defaults to time.time
+    """
+    def __init__(self, delta: Union[float, int], event_callback: callable, clock: callable = None):
+        assert isinstance(delta, float), "delta attribute must be of type float"
+        self._delta = delta
+        self._event_callback = event_callback
+        self._clock = clock if clock is not None else time.time
+        self._bits = {} # button name -> bit
+        self._combinations = {} # mask -> ButtonCombination
+        self._button_combinations = {} # bit -> ButtonCombinations with this button, in the order of registration
+        self._initial_times = {} # mask -> time of the first press since none of the buttons of the mask were pressed
+        self._pressed = 0 # mask of the buttons currently pressed
+
+    def __iter__(self):
+        for combination in self._combinations.values():
+            yield combination
+
+    def __len__(self):
+        return len(self._combinations)
+
+    def getMask(self, buttons: List[str]):
+        mask = 0
+        for btn in buttons:
+            if btn not in self._bits:
+                self._bits[btn] = 1 << len(self._bits)
+            mask |= self._bits[btn]
+        return mask
+
+    def register(self, buttons: List[str], target_callback: callable):
+        """
+        Create and register a combination.
+        :return: ButtonCombination
+        """
+        mask = self.getMask(buttons)
+        if mask in self._combinations:
+            raise ValueError("Trying to register an already existing combination.")
+        combination = ButtonCombination(buttons, target_callback, mask)
+        self._combinations[mask] = combination
+        self._initial_times[mask] = 0
+        for bit in self._bits.values():
+            if mask & bit:
+                self._button_combinations.setdefault(bit, []).append(combination)
+        return combination
 
     def setButtonState(self, btn, state):
-        if state and self._allButtonsUnpressed():
-            self._initial_time = time.time()
+        bit = self._bits.get(btn)
+        if bit is None:
+            return
 
-        self._btns_state[self._btns.index(btn)] = state
+        if state:
+            now = self._clock()
+            previous = self._pressed
+            self._pressed |= bit
+            for combination in self._button_combinations.get(bit, ()):
+                mask = combination.getMask()
+                if not previous & mask:
+                    self._initial_times[mask] = now
+                if self._pressed & mask == mask and (now - self._initial_times[mask]) <= self._delta:
+                    self._event_callback(combination)
+        else:
+            self._pressed &= ~bit
 
-        if state and self._allButtonsPressed() and self._verifyTiming():
-            self._event_callback(self)
+    def getPressed(self):
+        return self._pressed
 
 
 class MultiPress(object):
@@ -602,42 +1189,119 @@ class MultiPress(object):
 
 
 class Scrub(PyoObject):
-    def __init__(self, obj, min=0, max=1):
+    """
+    class Scrub
+
+    Integrates the cubed value of a stick: holding the stick moves the output at a speed that follows the
+    deflection, and the output stays where it is when the stick is released. The output is clamped between min and
+    max. The integration is done by an Expr object, one sample at a time, so it runs inside the DSP graph.
+
+    :Args:
+
+        obj: PyoObject
+            Stick signal, between -1 and 1.
+        min: int or float
+            Minimum output value.
+        max: int or float
+            Maximum output value.
+        rate: int or float
+            Distance travelled per second at full deflection.
+    """
+    def __init__(self, obj, min=0, max=1, rate=1):
         PyoObject.__init__(self)
         self._obj = obj
         self._min = min
         self._max = max
-        self._update_time = 0.1
-        self._func_timer = CallbackLoop(self._update_time, self._update)
-        self._value = 0
-        self._sig = SigTo(self._value, time=self._update_time)
+        self._rate = rate
+        self._integrator = Expr(self._obj, self._getExpression())
 
-        self._base_objs = self._sig.getBaseObjects()
+        self._base_objs = self._integrator.getBaseObjects()
 
-        self._func_timer.start()
+    def _getExpression(self):
+        # $y[-1] is the previous output sample, sr the sampling rate
+        return "(min (max (+ $y[-1] (/ (* {!r} (* $x[0] (* $x[0] $x[0]))) sr)) {!r}) {!r})".format(
+            float(self._rate), float(self._min), float(self._max))
 
-    def stop(self):
-        PyoObject.stop(self)
-        self._func_timer.stop()
+    def setMin(self, value):
+        self._min = value
+        self._integrator.expr = self._getExpression()
 
-    def _update(self):
-        self._value += (self._obj.get()**3)/10
+    def setMax(self, value):
+        self._max = value
+        self._integrator.expr = self._getExpression()
+
+    def setRate(self, value):
+        self._rate = value
+        self._integrator.expr = self._getExpression()
+
+    @property
+    def min(self):
+        return self._min
 
-        if self._value < self._min:
-            self._value = self._min
-        elif self._value > self._max:
-            self._value = self._max
+    @min.setter
+    def min(self, value):
+        self.setMin(value)
+
+    @property
+    def max(self):
+        return self._max
+
+    @max.setter
+    def max(self, value):
+        self.setMax(value)
+
+    @property
+    def rate(self):
+        return self._rate
 
-        self._sig.value = self._value
+    @rate.setter
+    def rate(self, value):
+        self.setRate(value)
 
 
 class Controller:
-    def __init__(self):
+    """
+    class Controller
+
+    Receives the controller data and turns it into pyo objects and button events.
+
+    :Args:
+
+        engine: string
+            "thread" : button events are timed by the callback scheduler, in real time.
+            "tick" : buttons are TickButton objects, their events are resolved when tick() is called.
+        clock: callable
+            Returns the current time in seconds. Defaults to time.monotonic with the "tick" engine and to time.time
+            with the "thread" engine, whose timers always follow the clock of the callback scheduler.
+        tick_period: int, float or None
+            Period at which tick() is called automatically with the "tick" engine.
+            Set to None to call tick() yourself, ie.: to drive the controller with a virtual clock.
+        root_address: string
+            OSC root of the controller inputs, ie.: '/XB1/2' for the third gamepad of a server polling several ones.
+        analysis_root_address: string
+            OSC root of the analysis parameters, ie.: '/ANA/2'.
+    """
+    def __init__(self, engine="thread", clock: callable = None, tick_period: Union[float, int] = 0.005,
+                 root_address: AnyStr = CONTROLLER_ROOT_ADDRESS, analysis_root_address: AnyStr = ANALYSIS_ROOT_ADDRESS):
+        if engine not in ("thread", "tick"):
+            raise ValueError("engine must either be 'thread' or 'tick'")
+        self._engine = engine
+        self._root_address = root_address
+        self._analysis_root_address = analysis_root_address
         self._global_event_delay = 0.18
         self._hold_button_delay = 1
         self._hold_repeat_delay = 0.5
-        self._combinations = []
-        self._queue = CallbackQueue(self._global_event_delay)
+        self._tick_loop = None
+        if self._engine == "tick":
+            self._clock = clock if clock is not None else time.monotonic
+            self._tick_lock = threading.RLock()
+            self._queue = TickQueue(self._global_event_delay, self._clock)
+        else:
+            self._clock = clock if clock is not None else time.time
+            self._tick_lock = None
+            self._queue = CallbackQueue(self._global_event_delay)
+        self._combinations = CombinationMatcher(float(self._global_event_delay), self.onCombinationEvent, self._clock)
+        self._pending_combination = None
 
         # Initialize audio objects to receive controller data
 
@@ -672,19 +1336,83 @@ class Controller:
         for btn in BUTTON_INPUTS:
             if btn == 'DPAD':
                 self._dpad_obj = DPad()
+            elif self._engine == "tick":
+                self._button_objs[btn] = TickButton(name=btn, event_delay=self._global_event_delay,
+                                                    hold_delay=self._hold_button_delay,
+                                                    hold_repeat_delay=self._hold_repeat_delay,
+                                                    clock=self._clock, lock=self._tick_lock)
             else:
                 self._button_objs[btn] = Button(name=btn, event_delay=self._global_event_delay,
                                                 hold_delay=self._hold_button_delay,
-                                                hold_repeat_delay=self._hold_repeat_delay)
+                                                hold_repeat_delay=self._hold_repeat_delay, clock=self._clock)
+
+        # objects holding deadlines, advanced by tick()
+        self._tickables = [self._queue] + list(self._button_objs.values())
 
         # analysis
         self._analysis_objs = {}
         for param in ANALYSIS_PARAMS:
             self._analysis_objs[param] = SigTo(0)
 
+        self._latency = None
+        self._extra_osc_handlers = {}
+        self._buildOscDispatchTable()
+        self._buildStateSetters()
+
+        if self._engine == "tick" and tick_period is not None:
+            self._tick_loop = CallbackLoop(tick_period, self.tick)
+            self._tick_loop.start()
+
     def cleanup(self):
         for key, obj in self._scrub_objs.items():
             obj.stop()
+        if self._tick_loop:
+            self._tick_loop.stop()
+
+    def tick(self, now: Union[float, int] = None):
+        """
+        Resolve every button, MultiPress and combination event due at time 'now', in order.
+        Only used by the "tick" engine.
+        :param now: defaults to the current time of the clock
+        """
+        if self._engine != "tick":
+            return
+        with self._tick_lock:
+            if now is None:
+                now = self._clock()
+            tickables = self._tickables
+            while True:
+                # only the objects holding the earliest deadline are advanced
+                deadline = None
+                due = []
+                for obj in tickables:
+                    other = obj.nextDeadline()
+                    if other is None or other > now:
+                        continue
+                    if deadline is None or other < deadline:
+                        deadline = other
+                        due = [obj]
+                    elif other == deadline:
+                        due.append(obj)
+                if deadline is None:
+                    break
+                for obj in due:
+                    obj.tick(deadline)
+
+    def nextDeadline(self):
+        """
+        Get the time at which the next button, MultiPress or combination event is due.
+        Only used by the "tick" engine.
+        :return: float, or None if nothing is pending
+        """
+        if self._engine != "tick":
+            return None
+        deadline = None
+        for obj in self._tickables:
+            other = obj.nextDeadline()
+            if other is not None and (deadline is None or other < deadline):
+                deadline = other
+        return deadline
 
     def _convertArgs(self, args, type):
         if len(args) > 1:
@@ -698,78 +1426,177 @@ class Controller:
             if type == "f":
                 return float(args[0])
 
-    def _analysisDataCallback(self, which, *args):
-        arg = self._convertArgs(args, "f")
-        if DEBUG:
-            print('/{} : {}'.format(which, arg))
-        self._analysis_objs[which].value = arg
+    def _createAnalysisHandler(self, which):
+        obj = self._analysis_objs[which]
+        latency = self._latency
 
-    def _continuousInputDataCallback(self, which, *args):
-        arg = self._convertArgs(args, "f")
-        if DEBUG:
-            print('/{} : {}'.format(which, arg))
-        self._continuous_objs[which].value = arg
-        if which in ['LT', 'RT']:
-            self._button_objs[which].set(arg)
+        def handler(*args):
+            arg = float(args[0]) if len(args) == 1 else self._convertArgs(args, "f")
+            if DEBUG:
+                print('/{} : {}'.format(which, arg))
+            obj.value = arg
+            if latency is not None:
+                latency.recordDispatch(which)
+        return handler
+
+    def _createContinuousInputHandler(self, which):
+        obj = self._continuous_objs[which]
+        # the triggers are also buttons
+        button = self._button_objs[which] if which in ['LT', 'RT'] else None
+        latency = self._latency
+
+        def handler(*args):
+            arg = float(args[0]) if len(args) == 1 else self._convertArgs(args, "f")
+            if DEBUG:
+                print('/{} : {}'.format(which, arg))
+            obj.value = arg
+            if latency is not None:
+                latency.recordDispatch(which)
+            if button is not None:
+                # the button records the completion of its callbacks
+                button.set(arg)
+        return handler
+
+    def _createButtonHandler(self, which):
+        obj = self._dpad_obj if which == 'DPAD' else self._button_objs[which]
+        latency = self._latency
+
+        def handler(*args):
+            arg = int(args[0]) if len(args) == 1 else self._convertArgs(args, "i")
+            if DEBUG:
+                print('/{} : {}'.format(which, arg))
+            if latency is not None:
+                latency.recordDispatch(which)
+            obj.set(arg)
+            # the buttons record the completion of their callbacks, the D-Pad calls its callback right away
+            if latency is not None and which == 'DPAD':
+                latency.recordCallback(which)
+        return handler
+
+    def stampSendTime(self, send_time):
+        """
+        Give the time at which the server sent the values that follow, for the latency stats.
+        """
+        if self._latency is not None:
+            self._latency.stamp(send_time)
 
-    def _buttonsDataCallback(self, which, *args):
-        arg = self._convertArgs(args, "i")
-        if DEBUG:
-            print('/{} : {}'.format(which, arg))
-        if which == 'DPAD':
-            self._dpad_obj.set(arg)
-        else:
-            self._button_objs[which].set(arg)
+    def _buildOscDispatchTable(self):
+        self._osc_handlers = {}
+        for input in CONTINUOUS_INPUTS:
+            address = "{}{}/{}".format(self._root_address, CONTINUOUS_INPUTS_ADDRESS, input)
+            self._osc_handlers[address] = self._createContinuousInputHandler(input)
+        for btn in BUTTON_INPUTS:
+            address = "{}{}/{}".format(self._root_address, BUTTONS_ADDRESS, btn)
+            self._osc_handlers[address] = self._createButtonHandler(btn)
+        for param in ANALYSIS_PARAMS:
+            address = "{}/{}".format(self._analysis_root_address, param)
+            self._osc_handlers[address] = self._createAnalysisHandler(param)
+        # the server stamps the whole bundle once, under the main root
+        self._osc_handlers[CONTROLLER_ROOT_ADDRESS + TIME_ADDRESS] = self.stampSendTime
+        self._osc_handlers.update(self._extra_osc_handlers)
+
+    def enableLatencyStats(self, clock: callable = None):
+        """
+        Start measuring the time between the moment the server sends a bundle and the moment its values reach the
+        pyo objects and the Button callbacks. See latency.LatencyMonitor.
+        :param clock: must match the clock of the server, defaults to time.time
+        """
+        self._latency = LatencyMonitor(clock)
+        for button in self._button_objs.values():
+            button.setLatencyMonitor(self._latency)
+        self._buildOscDispatchTable()
+        self._buildStateSetters()
+
+    def getLatencyStats(self):
+        """
+        Get the 50th, 95th and 99th percentiles of the latency of each input, in seconds.
+        :return: dict, empty if the stats are not enabled
+        """
+        if self._latency is None:
+            return {}
+        return self._latency.getStats()
+
+    def dumpLatencyStats(self, log=print):
+        """
+        Write the latency stats with the given function, ie.: the session log's Monitor.log
+        """
+        if self._latency is not None:
+            self._latency.dump(log)
+
+    def registerOscAddress(self, address, callback):
+        """
+        Register a handler for an OSC address, or replace the handler of an existing one.
+        :param address: full OSC address, ie.: '/XB1/cts/LX'
+        :param callback: called with the arguments of the message
+        """
+        assert callable(callback), "Callback must be of type 'callable'"
+        self._extra_osc_handlers[address] = callback
+        self._osc_handlers[address] = callback
+
+    def getOscAddresses(self):
+        return list(self._osc_handlers.keys())
 
     def oscDataCallback(self, address, *args):
-        if address.startswith("{}{}".format(CONTROLLER_ROOT_ADDRESS, CONTINUOUS_INPUTS_ADDRESS)):
-            self._continuousInputDataCallback(address.rsplit("/", 1)[1], *args)
-        elif address.startswith("{}{}".format(CONTROLLER_ROOT_ADDRESS, BUTTONS_ADDRESS)):
-            self._buttonsDataCallback(address.rsplit("/", 1)[1], *args)
-        elif address.startswith(ANALYSIS_ROOT_ADDRESS):
-            self._analysisDataCallback(address.rsplit("/", 1)[1], *args)
-
-    def mainDataCallback(self, controller_data, analysis_data=None):
+        handler = self._osc_handlers.get(address)
+        if handler is not None:
+            handler(*args)
+
+    def _buildStateSetters(self):
+        # one setter per input name, used by mainDataCallback
+        self._state_setters = {}
         for btn in BUTTON_INPUTS:
             if btn == 'DPAD':
-                self._dpad_obj.set(controller_data[btn])
+                self._state_setters[btn] = self._dpad_obj.set
             else:
-                self._button_objs[btn].set(controller_data[btn])
-
+                self._state_setters[btn] = self._button_objs[btn].set
+        # LT and RT are replaced by the continuous setters, which also feed the trigger buttons
         for input in CONTINUOUS_INPUTS:
-            self._continuous_objs[input].value = controller_data[input]
-            if input in ['LT', 'RT']:
-                self._button_objs[input].set(controller_data[input])
+            self._state_setters[input] = self._createContinuousInputHandler(input)
+        for param in ANALYSIS_PARAMS:
+            self._state_setters[param] = self._createAnalysisHandler(param)
+        self._last_state = {}
 
-        if analysis_data:
-            for param in ANALYSIS_PARAMS:
-                self._analysis_objs[param].value = analysis_data[param]
+    def mainDataCallback(self, controller_data, analysis_data=None, epsilon=0.0):
+        """
+        Feed the controller with dictionaries of values, ie.: whole state frames. Only the objects whose value changed
+        since the last call are updated.
+        :param epsilon: changes of the continuous inputs smaller than epsilon are ignored to filter the sensor noise,
+                        reaching 0 (rest position), 1 or -1 (end of the range) is always applied
+        """
+        last_state = self._last_state
+        setters = self._state_setters
+        for data in (controller_data, analysis_data):
+            if not data:
+                continue
+            for key, value in data.items():
+                last = last_state.get(key)
+                if last != value:
+                    # the extremes always go through: the trigger buttons are only pressed at exactly 1
+                    if epsilon and -1 < value < 1 and value and last is not None and key in CONTINUOUS_INPUTS and \
+                            abs(value - last) < epsilon:
+                        continue
+                    if isinstance(value, list):
+                        # the D-Pad value can be modified in place by the caller
+                        value = list(value)
+                    last_state[key] = value
+                    setters[key](value)
 
     def onCombinationEvent(self, combination_obj):
-        if self._queue.is_empty():
-            for btn in combination_obj:
-                self._button_objs[btn].emptyQueue()
-            self._queue.queue(combination_obj)
-        else:
+        if not self._queue.is_empty():
             # if the new combination contains the same buttons as the previous one plus others, it has priority
-            for btn in self._queue.getItem():
-                if btn not in combination_obj:
-                    return
+            pending_mask = self._pending_combination.getMask()
+            if combination_obj.getMask() & pending_mask != pending_mask:
+                return
             self._queue.empty()
-            self._queue.queue(combination_obj)
-            for btn in combination_obj:
-                self._button_objs[btn].emptyQueue()
+        for btn in combination_obj:
+            self._button_objs[btn].emptyQueue()
+        self._pending_combination = combination_obj
+        self._queue.queue(combination_obj)
 
     def registerCombination(self, buttons, callback):
-        new = ButtonCombination(buttons, self._global_event_delay, callback, self.onCombinationEvent)
-        for comb in self._combinations:
-            if comb == new:
-                raise ValueError("Trying to register an already existing combination.")
-
-        self._combinations.append(new)
-
+        new = self._combinations.register(buttons, callback)
         for btn in new:
-            self._button_objs[btn].addCombinationEvent(new)
+            self._button_objs[btn].addCombinationEvent(new, self._combinations)
 
     def registerMultiPress(self, button, repeats, callback):
         self._button_objs[button].addMultiPressEvent(repeats, callback)
@@ -810,3 +1637,88 @@ class Controller:
     @property
     def scrub(self):
         return self._scrub_objs
+
+
+class ControllerGroup:
+    """
+    class ControllerGroup
+
+    Creates one Controller per gamepad of a server polling several ones (controller_server.py --devices N), where
+    each gamepad publishes under its own root: /XB1/<index>/... and /ANA/<index>/...
+    A single dispatch table maps every address to its controller, so the cost of dispatching a message doesn't grow
+    with the number of gamepads. The time stamp of the bundle is forwarded to every controller.
+
+    Usage:
+        group = ControllerGroup(4)
+        group[2].buttons['A'].setOnPressCallback(callback)
+        dispatcher.set_default_handler(group.oscDataCallback)
+
+    :Args:
+
+        count: int
+            Number of gamepads.
+        kwargs:
+            Arguments given to every Controller, ie.: engine="tick".
+    """
+    def __init__(self, count: int, **kwargs):
+        self._controllers = []
+        for index in range(count):
+            self._controllers.append(Controller(root_address="{}/{}".format(CONTROLLER_ROOT_ADDRESS, index),
+                                                analysis_root_address="{}/{}".format(ANALYSIS_ROOT_ADDRESS, index),
+                                                **kwargs))
+        self._extra_osc_handlers = {}
+        self._buildOscDispatchTable()
+
+    def _timeStampCallback(self, send_time):
+        for ctl in self._controllers:
+            ctl.stampSendTime(send_time)
+
+    def _buildOscDispatchTable(self):
+        self._osc_handlers = {}
+        # the handlers of the controllers are called directly
+        for ctl in self._controllers:
+            self._osc_handlers.update(ctl._osc_handlers)
+        self._osc_handlers[CONTROLLER_ROOT_ADDRESS + TIME_ADDRESS] = self._timeStampCallback
+        self._osc_handlers.update(self._extra_osc_handlers)
+
+    def rebuildOscDispatchTable(self):
+        self._buildOscDispatchTable()
+
+    def enableLatencyStats(self, clock: callable = None):
+        for ctl in self._controllers:
+            ctl.enableLatencyStats(clock)
+        self._buildOscDispatchTable()
+
+    def dumpLatencyStats(self, log=print):
+        for index, ctl in enumerate(self._controllers):
+            ctl.dumpLatencyStats(lambda line, index=index: log("Gamepad {} : {}".format(index, line)))
+
+    def registerOscAddress(self, address, callback):
+        """
+        Register a handler for an OSC address, or replace the handler of an existing one. Handlers registered on
+        the controllers themselves are only dispatched by the group after calling rebuildOscDispatchTable().
+        """
+        assert callable(callback), "Callback must be of type 'callable'"
+        self._extra_osc_handlers[address] = callback
+        self._osc_handlers[address] = callback
+
+    def getOscAddresses(self):
+        return list(self._osc_handlers.keys())
+
+    def oscDataCallback(self, address, *args):
+        handler = self._osc_handlers.get(address)
+        if handler is not None:
+            handler(*args)
+
+    def cleanup(self):
+        for ctl in self._controllers:
+            ctl.cleanup()
+
+    def __getitem__(self, index):
+        return self._controllers[index]
+
+    def __len__(self):
+        return len(self._controllers)
+
+    def __iter__(self):
+        return iter(self._controllers)
@@ -12,6 +12,9 @@ import wx
 import time
 import os
 import controller
+import state_packet
+import jitter_buffer
+import shared_state
 import effects
 import utils
 from interface import DeviceSetup, CustomMessageDialog, Grid, Sliders, FileBrowser
@@ -19,6 +22,12 @@ from interface import DeviceSetup, CustomMessageDialog, Grid, Sliders, FileBrows
 CWD = os.getcwd()
 
 DEBUG = False # prints osc data received
+LATENCY_STATS = False # logs the input latency percentiles at the end of the session
+DEVICES = 1 # must match the --devices option of the server, the audio scripts play with the first gamepad
+TRANSPORT = "osc" # must match the --transport option of the server: "osc", "binary" or "shm" (same machine only)
+SHM_POLL_PERIOD = 0.002 # seconds between two reads of the shared memory block
+SHM_POLL_THREAD = False # reads the shared memory block from its own thread, SHM_POLL_PERIOD can then be ie.: 0.0002
+JITTER_BUFFER = 0 # seconds, applies the osc bundles at their time tag plus this delay (server started with --timetags)
 # [end GLOBALS AND IMPORTS]
 
 
@@ -74,8 +83,29 @@ def logAndPrint(*args):
 
 main_volume = Sig(1)
 
-xb1_controller = controller.Controller()
-osc_receiver = OscDataReceive(5005, "*", xb1_controller.oscDataCallback)
+if DEVICES > 1:
+    # one controller per gamepad, ie.: controllers[1].buttons['A']
+    controllers = controller.ControllerGroup(DEVICES)
+    xb1_controller = controllers[0]
+else:
+    controllers = xb1_controller = controller.Controller()
+if LATENCY_STATS:
+    controllers.enableLatencyStats()
+if TRANSPORT == "binary":
+    state_receiver = state_packet.StatePacketReceiver(5005, state_packet.StatePacketDecoder(
+        list(controllers) if DEVICES > 1 else [controllers]))
+elif TRANSPORT == "shm":
+    # no socket involved, read by the audio thread or by a thread polling faster than the audio buffer
+    shm_reader = shared_state.SharedStateReader(state_packet.StatePacketDecoder(
+        list(controllers) if DEVICES > 1 else [controllers]))
+    if SHM_POLL_THREAD:
+        shm_poller = shared_state.SharedStatePoller(shm_reader, SHM_POLL_PERIOD)
+    else:
+        shm_reader_pattern = Pattern(shm_reader.poll, time=SHM_POLL_PERIOD).play()
+elif JITTER_BUFFER:
+    osc_receiver = jitter_buffer.OscJitterReceiver(5005, controllers.oscDataCallback, JITTER_BUFFER)
+else:
+    osc_receiver = OscDataReceive(5005, "*", controllers.oscDataCallback)
 
 audio_scripts = ["AMFM.py", "test_granulation.py", "amb_gen.py"]
 script_index = 0 # select script to run here
@@ -137,5 +167,20 @@ main_win.Show()
 app.MainLoop()
 
 server.stop()
+if TRANSPORT == "binary":
+    state_receiver.stop()
+    logAndPrint("State packets : {}".format(state_receiver.getStats()))
+elif TRANSPORT == "shm":
+    if SHM_POLL_THREAD:
+        shm_poller.stop()
+    else:
+        shm_reader_pattern.stop()
+        shm_reader.close()
+    logAndPrint("Shared memory : {}".format(shm_reader.getStats()))
+elif JITTER_BUFFER:
+    osc_receiver.stop()
+    logAndPrint("Jitter buffer : {}".format(osc_receiver.getStats()))
+if LATENCY_STATS:
+    controllers.dumpLatencyStats(logAndPrint)
 mon.logSessionEnd()
-xb1_controller.cleanup()
+controllers.cleanup()
@@ -4,33 +4,51 @@
 
 # imports
 from operator import attrgetter
+import argparse
 import platform
-import pygame
-from pygame.locals import *
+import time
+
+BACKENDS = ["pygame", "evdev"]
+
+# the backend decides which modules are imported, the other arguments are parsed in the OSC setup
+backend_parser = argparse.ArgumentParser(add_help=False)
+backend_parser.add_argument("--backend", choices=BACKENDS, default="pygame",
+                            help="pygame: xinput/pygame joystick with the GUI, "
+                                 "evdev: headless Linux event device, without pygame")
+backend_parser.add_argument("--device", action="append", default=None,
+                            help="evdev backend: event device or recorded event file, repeat it for several "
+                                 "gamepads. Defaults to the gamepads found")
+backend_args = backend_parser.parse_known_args()[0]
+BACKEND = backend_args.backend
+
+if BACKEND == "pygame":
+    import pygame
+    from pygame.locals import *
 
 # custom imports
 from mappingobject import DualMappingObject
-from draw import *
+from structs import *
+if BACKEND == "pygame":
+    from draw import *
+else:
+    import evdev_backend
 from analysis import *
 
 PLATFORM = platform.uname()[0].upper()
 
-if PLATFORM == 'WINDOWS':
+if PLATFORM == 'WINDOWS' and BACKEND == "pygame":
     import xinput
 
 __version__ = '1.0.0'
 __vernum__ = tuple([int(s) for s in __version__.split('.')])
 DEBUG = False
 ENGINE_PAUSED = False
-GUI = True
+GUI = BACKEND == "pygame"
 
 max_fps = 60
 trigger_error_win = -3.051850947599719e-05
 controller_values = {'A':0, 'B':0, 'X':0, 'Y':0, 'LB':0, 'RB':0, 'LS':0, 'RS':0, 'BACK':0, 'START':0, 'XB':0,
                      'DPAD':(0,0), 'LX':0, 'LY':0, 'RX':0, 'RY':0, 'LT':0, 'RT':0}
-controller_data_types = {'A':"i", 'B':"i", 'X':"i", 'Y':"i", 'LB':"i", 'RB':"i", 'LS':"i", 'RS':"i", 'BACK':"i",
-                         'START':"i", 'XB':"i", 'DPAD':["i","i"], 'LX':"f", 'LY':"f", 'RX':"f", 'RY':"f", 'LT':"f",
-                         'RT':"f"}
 analysis_values = {'LXVel':0, 'LYVel':0, 'RXVel':0, 'RYVel':0, 'LTVel':0, 'RTVel':0, 'Density':0}
 # [end IMPORTS AND PROJECT VARIABLES]
 
@@ -40,63 +58,163 @@ analysis_values = {'LXVel':0, 'LYVel':0, 'RXVel':0, 'RYVel':0, 'LTVel':0, 'RTVel
 # OSC SETUP
 #/////////////////////////////
 
-import argparse
-from pythonosc import udp_client, osc_bundle_builder, osc_message_builder
+import atexit
+import threading
+from osc_layout import *
+from osc_fanout import OscFanOut, parseDestination
+from state_packet import StatePacketEncoder
+import shared_state
+from session_capture import CaptureWriter
+from latency import LatencyHistogram
 
 
-OSC_STATUS = {0:'Sending data', 1:'Error', 2:'Network unreachable', 3:'Paused'}
-OSC_STATUS_CODE = 0
-CONTROLLER_ROOT_ADDRESS = '/XB1'
-ANALYSIS_ROOT_ADDRESS = '/ANA'
-BUTTONS_ADDRESS = '/btn'
-CONTINUOUS_INPUTS_ADDRESS = '/cts'
+OSC_STATUS = {0:'Sending data', 1:'Error', 2:'Network unreachable', 3:'Paused', 4:'Dropping packets'}
 IP_ADDRESS = "127.0.0.1"
 OSC_PORT = 5005
+TRANSMISSION_MODES = ["full", "delta"]
+TRANSPORTS = ["osc", "binary", "shm"]
+ANALYSIS_ENGINES = ["python", "numpy"]
+KEYFRAME_INTERVAL = 1.
 
-parser = argparse.ArgumentParser()
+parser = argparse.ArgumentParser(parents=[backend_parser])
 parser.add_argument("--ip", default=IP_ADDRESS, help="The ip of the OSC server")
 parser.add_argument("--port", type=int, default=OSC_PORT, help="The port the OSC server is listening on")
+parser.add_argument("--dest", action="append", default=None,
+                    help="Destination as host:port, repeat it to mirror the controller to several synths. "
+                         "Multicast groups are accepted, ie.: 239.0.0.1:5005. Replaces --ip")
+parser.add_argument("--multicast-ttl", type=int, default=1,
+                    help="Hops of the packets sent to multicast groups, 1 keeps them on the local network")
+parser.add_argument("--transport", choices=TRANSPORTS, default="osc",
+                    help="osc: OSC bundles, binary: one fixed layout packet of the whole state per frame, "
+                         "decoded by state_packet.StatePacketDecoder, shm: the same packet published in a shared "
+                         "memory block for a synth on this machine (shared_state.SharedStateReader)")
+parser.add_argument("--shm-name", default=shared_state.SHM_NAME,
+                    help="Name of the shared memory block of the shm transport")
+parser.add_argument("--mode", choices=TRANSMISSION_MODES, default="full",
+                    help="full: send every value every frame, delta: only send the values that changed")
+parser.add_argument("--input-rate", type=float, default=0,
+                    help="Poll and send from a dedicated thread at this rate in Hz, ie.: 250 or 500. "
+                         "By default the controller is polled by the GUI loop at {} Hz".format(max_fps))
+parser.add_argument("--devices", type=int, default=1,
+                    help="Number of gamepads to poll. With more than one, each gamepad publishes under its own "
+                         "root, ie.: /XB1/0/btn/A and /ANA/0/Density")
+parser.add_argument("--analysis", choices=ANALYSIS_ENGINES, default=None,
+                    help="python: one tracker object per input, numpy: every input of every gamepad analysed "
+                         "together by analysis.AnalysisEngine. Defaults to numpy with several gamepads when it is "
+                         "installed, the tracker objects are faster for a single gamepad")
+parser.add_argument("--capture", default=None,
+                    help="Record every polled state into this file, for replay.py")
+parser.add_argument("--timetags", action="store_true",
+                    help="Stamp the bundles with their capture time instead of 'immediately', for the clients' "
+                         "jitter buffer (jitter_buffer.OscJitterReceiver)")
+parser.add_argument("--keyframe-interval", type=float, default=KEYFRAME_INTERVAL,
+                    help="Seconds between two full frames in delta mode, lets the clients resync")
 args = parser.parse_args()
-client = udp_client.SimpleUDPClient(args.ip, args.port)
+if args.transport != "osc" and args.mode == "delta":
+    parser.error("the delta mode only applies to the osc transport")
+if args.analysis is None:
+    args.analysis = "numpy" if numpy is not None and args.devices > 1 else "python"
+elif args.analysis == "numpy" and numpy is None:
+    parser.error("the numpy analysis engine requires numpy")
+# every bundle is encoded once and sent to all the destinations through the same socket
+if args.dest:
+    osc_destinations = [parseDestination(destination, args.port) for destination in args.dest]
+else:
+    osc_destinations = [(args.ip, args.port)]
+osc_fanout = OscFanOut(osc_destinations, args.multicast_ttl)
+
+
+osc_time_address = [OSC_TIME_ADDRESS]
+last_keyframe_time = None
+
+def build_osc_template():
+    """
+    Encode the layout of the bundle once, only the argument bytes are written every frame.
+    The messages of every device are batched in the same bundle, stamped with the send time for the client's
+    latency stats.
+    """
+    global osc_template, set_osc_time, device_setters
+    # with --devices above 1 every gamepad has its own root, even if only one is plugged in
+    osc_template, set_osc_time, setters = buildOscTemplate(len(devices), args.devices > 1)
+    device_setters = [(device,) + setters[device.index] for device in devices]
+
+
+def build_state_packet():
+    global state_encoder, device_states, shared_state_writer
+    state_encoder = StatePacketEncoder(len(devices))
+    device_states = [(device.values, device.analysis) for device in devices]
+    if args.transport == "shm":
+        shared_state_writer = shared_state.SharedStateWriter(len(state_encoder), args.shm_name)
+        atexit.register(shared_state_writer.close)
+
+
+capture_writer = None
+
+def build_capture():
+    global capture_encoder, capture_writer
+    if args.capture is None:
+        return
+    # separate encoder, the sequence numbers of the transport are left untouched
+    capture_encoder = StatePacketEncoder(len(devices))
+    capture_writer = CaptureWriter(args.capture, len(devices), len(capture_encoder))
+    atexit.register(capture_writer.close)
+
+def captureState():
+    capture_writer.write(time.monotonic(), capture_encoder.encode(time.time(), device_states))
+
+# packets per second counter
+PACKET_RATE = 0
+packet_count = 0
+packet_count_start = time.time()
+
+def countPacket(now, sent):
+    global PACKET_RATE, packet_count, packet_count_start
+    if sent:
+        packet_count += 1
+    if now - packet_count_start >= 1:
+        PACKET_RATE = packet_count / (now - packet_count_start)
+        packet_count = 0
+        packet_count_start = now
 
 def sendOSCData():
-    global OSC_STATUS_CODE
-    try:
-        # build all osc messages for the controller values
-        controller_bundle_builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
-        for key in controller_values:
-            # differentiate between buttons and continuous inputs
-            if "i" in controller_data_types[key]:
-                address = "{}{}/{}".format(CONTROLLER_ROOT_ADDRESS, BUTTONS_ADDRESS, key)
-            elif controller_data_types[key] == "f":
-                address = "{}{}/{}".format(CONTROLLER_ROOT_ADDRESS, CONTINUOUS_INPUTS_ADDRESS, key)
-            msg = osc_message_builder.OscMessageBuilder(address)
-            if key == 'DPAD':
-                msg.add_arg(controller_values[key][0], controller_data_types[key][0])
-                msg.add_arg(controller_values[key][1], controller_data_types[key][1])
-            else:
-                msg.add_arg(controller_values[key], controller_data_types[key])
-            controller_bundle_builder.add_content(msg.build())
-
-        # build all osc messages for the analysis values
-        analysis_bundle_builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
-        for key in analysis_values:
-            msg = osc_message_builder.OscMessageBuilder("{}/{}".format(ANALYSIS_ROOT_ADDRESS, key))
-            msg.add_arg(analysis_values[key], "f")
-            analysis_bundle_builder.add_content(msg.build())
-
-        # build final bundle
-        osc_data = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
-        osc_data.add_content(controller_bundle_builder.build())
-        osc_data.add_content(analysis_bundle_builder.build())
-        # send bundles over network
-        client.send(osc_data.build())
-    except InterruptedError:
-        OSC_STATUS_CODE = 1
-    except OSError:
-        OSC_STATUS_CODE = 2
+    global last_keyframe_time
+    for device, controller_setters, set_osc_dpad, analysis_setters in device_setters:
+        values = device.values
+        for key, setter in controller_setters:
+            setter(values[key])
+        set_osc_dpad(*values['DPAD'])
+        analysis = device.analysis
+        for key, setter in analysis_setters:
+            setter(analysis[key])
+    now = time.time()
+    set_osc_time(now)
+    if args.timetags:
+        osc_template.setTimeTag(now)
+    # send bundles over network, the errors are kept per destination by the fan-out
+    if args.mode == "delta" and last_keyframe_time is not None and \
+            now - last_keyframe_time < args.keyframe_interval:
+        # only the values that changed since the last frame, nothing when the controller is idle
+        data = osc_template.getDeltaData(osc_time_address)
+        if data is not None:
+            osc_fanout.send(data)
+        countPacket(now, data is not None)
     else:
-        OSC_STATUS_CODE = 0
+        osc_fanout.send(osc_template.getData())
+        osc_template.markSent()
+        last_keyframe_time = now
+        countPacket(now, True)
+
+def sendStatePacket():
+    now = time.time()
+    osc_fanout.send(state_encoder.encode(now, device_states))
+    countPacket(now, True)
+
+def publishSharedState():
+    now = time.time()
+    shared_state_writer.publish(state_encoder.encode(now, device_states))
+    countPacket(now, True)
+
+send_data = {"osc": sendOSCData, "binary": sendStatePacket, "shm": publishSharedState}[args.transport]
 
 # [end OSC SETUP]
 
@@ -109,34 +227,38 @@ def sendOSCData():
 XBOX_CONTROLLER = False
 JOYSTICK_NAME = ''
 joystick = None
+device_joys = [0] # id of the joystick of each device: pygame/xinput device number or EvdevGamepad
+xinput_joysticks = [] # polled by the loop, they post their events to pygame
 screen = None
 screen_rect = None
 clock = None
 
 def init():
     global XBOX_CONTROLLER, JOYSTICK_NAME, joystick, buttons_codes, axis_codes, d_pad_codes
-    global pygame, screen, screen_rect, clock
+    global pygame, screen, screen_rect, clock, device_joys, xinput_joysticks
 
     pygame.init()
     pygame.joystick.init()
 
     clock = pygame.time.Clock()
-    # Initialize a joystick object: grabs the first joystick
+    # Initialize the joystick objects: grabs the first args.devices joysticks
     if PLATFORM == 'WINDOWS':
         joysticks = xinput.XInputJoystick.enumerate_devices()
         if DEBUG:
             print("Joysticks returned by XInputJoystick : {}".format(joysticks))
-        device_numbers = list(map(attrgetter('device_number'), joysticks))
+        device_numbers = list(map(attrgetter('device_number'), joysticks))[:args.devices]
         if DEBUG:
             print("Joysticks device numbers : {}".format(device_numbers))
         if device_numbers:
+            device_joys = device_numbers
             joystick = pygame.joystick.Joystick(device_numbers[0])
             JOYSTICK_NAME = joystick.get_name().upper()
             if DEBUG:
                 print('Joystick: {} using "{}" device'.format(PLATFORM, JOYSTICK_NAME))
             if 'XBOX' in JOYSTICK_NAME:
                 XBOX_CONTROLLER = True
-                joystick = xinput.XInputJoystick(device_numbers[0])
+                xinput_joysticks = [xinput.XInputJoystick(number) for number in device_numbers]
+                joystick = xinput_joysticks[0]
                 buttons_codes = DualMappingObject((0,'A'), (1,'B'), (2,'X'), (3,'Y'), (4,'LB'), (5,'RB'), (6,'BACK'),
                                                   (7,'START'), (8,'LS'), (9,'RS'), (10,'XB'))
                 axis_codes = DualMappingObject(('LX',1), ('LY',0), ('RX',4), ('RY',3), ('LT',2), ('RT',5))
@@ -146,7 +268,8 @@ def init():
                 # put other logic here for handling platform + device type in the event loop
                 if DEBUG:
                     print('Using pygame joystick')
-                joystick.init()
+                for number in device_numbers:
+                    pygame.joystick.Joystick(number).init()
                 buttons_codes = DualMappingObject((0,'A'), (1,'B'), (2,'X'), (3,'Y'), (4,'LB'), (5,'RB'), (6,'BACK'),
                                                   (7,'START'), (8,'LS'), (9,'RS'), (10,'XB'))
                 axis_codes = DualMappingObject(('LX',0), ('LY',1), ('RX',4), ('RY',3), ('LT',2), ('RT',2))
@@ -158,13 +281,32 @@ def init():
             joysticks[-1].init()
             if DEBUG:
                 print("Detected joystick '", joysticks[-1].get_name(), "'")
+        if joysticks:
+            device_joys = list(range(min(len(joysticks), args.devices)))
         buttons_codes = DualMappingObject((11, 'A'), (12, 'B'), (13, 'X'), (14, 'Y'), (8, 'LB'), (9, 'RB'), (5, 'BACK'),
                                           (4, 'START'), (6, 'LS'), (7, 'RS'), (10, 'XB'))
         axis_codes = DualMappingObject(('LX', 0), ('LY', 1), ('RX', 2), ('RY', 3), ('LT', 4), ('RT', 5))
         d_pad_codes = DualMappingObject((1, 'DOWN'), (0, 'UP'), (2, 'LEFT'), (3, 'RIGHT'))
 
 
-init()
+def init_evdev():
+    global JOYSTICK_NAME, joystick, device_joys
+    paths = backend_args.device
+    if paths is None:
+        paths = evdev_backend.findGamepads()
+        if not paths:
+            raise SystemExit("No gamepad found, use --device to choose an event device")
+    device_joys = [evdev_backend.EvdevGamepad(path) for path in paths[:args.devices]]
+    joystick = device_joys[0]
+    JOYSTICK_NAME = joystick.getName()
+    if DEBUG:
+        print('Joystick: evdev using "{}"'.format(JOYSTICK_NAME))
+
+
+if BACKEND == "pygame":
+    init()
+else:
+    init_evdev()
 # [end PYGAME AND CONTROLLER INIT]
 
 
@@ -173,45 +315,55 @@ init()
 # DISPLAY ELEMENTS
 #/////////////////////////////
 
-# button display
-button_a = Struct(rect=Rect(560, 200, 20, 20), value=0)
-button_b = Struct(rect=Rect(600, 160, 20, 20), value=0)
-button_x = Struct(rect=Rect(520, 160, 20, 20), value=0)
-button_y = Struct(rect=Rect(560, 120, 20, 20), value=0)
-button_left_bumper = Struct(rect=Rect(40, 80, 40, 20), value=0)
-button_right_bumper = Struct(rect=Rect(560, 80, 40, 20), value=0)
-button_back = Struct(rect=Rect(240, 160, 20, 20), value=0)
-button_start = Struct(rect=Rect(400, 160, 20, 20), value=0)
-button_left_stick = Struct(rect=Rect(60, 160, 20, 20), value=0)
-button_right_stick = Struct(rect=Rect(400, 240, 20, 20), value=0)
-button_xbox = Struct(rect=Rect(320, 100, 20, 20), value=0)
-buttons = {
-    'A':button_a, 'B':button_b, 'X':button_x, 'Y':button_y,
-    'LB':button_left_bumper, 'RB':button_right_bumper,
-    'BACK':button_back, 'START':button_start,
-    'LS':button_left_stick, 'RS':button_right_stick, 'XB':button_xbox}
-
-# stick display
-left_stick = Struct(rect=Rect(0, 0, 80, 40), x=0.0, y=0.0)
-right_stick = Struct(rect=Rect(0, 0, 40, 40), x=0.0, y=0.0)
-left_stick.rect.center = button_left_stick.rect.center
-right_stick.rect.center = button_right_stick.rect.center
-
-# trigger display
-left_trigger = Struct(rect=Rect(40, 40, 40, 40), value=0.0)
-right_trigger = Struct(rect=Rect(560, 40, 40, 40), value=0.0)
-
-# d-pad display arrangement:
-# (-1,  1)    (0,  1)    (1,  1)
-# (-1,  0     (0,  0)    (1,  0)
-# (-1, -1)    (0, -1)    (1, -1)
-d_pad = {}
-d_pad_posx = {-1: 0, 0: 20, 1: 40}
-d_pad_posy = {1: 0, 0: 20, -1: 40}
-for y in 1, 0, -1:
-    for x in -1, 0, 1:
-        d_pad[x, y] = Struct(rect=Rect(220 + d_pad_posx[x], 220 + d_pad_posy[y], 20, 20), value=0)
-pressed_pads = [0,0]  # save state
+if BACKEND != "pygame":
+    def Rect(left, top, width, height):
+        # stand-in for pygame.Rect, the display elements only hold the values when nothing is drawn
+        return Struct(left=left, top=top, width=width, height=height, center=(left + width // 2, top + height // 2))
+
+def create_display_elements():
+    # display elements of one gamepad, they also hold the values read by the analysis
+
+    # button display
+    button_a = Struct(rect=Rect(560, 200, 20, 20), value=0)
+    button_b = Struct(rect=Rect(600, 160, 20, 20), value=0)
+    button_x = Struct(rect=Rect(520, 160, 20, 20), value=0)
+    button_y = Struct(rect=Rect(560, 120, 20, 20), value=0)
+    button_left_bumper = Struct(rect=Rect(40, 80, 40, 20), value=0)
+    button_right_bumper = Struct(rect=Rect(560, 80, 40, 20), value=0)
+    button_back = Struct(rect=Rect(240, 160, 20, 20), value=0)
+    button_start = Struct(rect=Rect(400, 160, 20, 20), value=0)
+    button_left_stick = Struct(rect=Rect(60, 160, 20, 20), value=0)
+    button_right_stick = Struct(rect=Rect(400, 240, 20, 20), value=0)
+    button_xbox = Struct(rect=Rect(320, 100, 20, 20), value=0)
+    buttons = {
+        'A':button_a, 'B':button_b, 'X':button_x, 'Y':button_y,
+        'LB':button_left_bumper, 'RB':button_right_bumper,
+        'BACK':button_back, 'START':button_start,
+        'LS':button_left_stick, 'RS':button_right_stick, 'XB':button_xbox}
+
+    # stick display
+    left_stick = Struct(rect=Rect(0, 0, 80, 40), x=0.0, y=0.0)
+    right_stick = Struct(rect=Rect(0, 0, 40, 40), x=0.0, y=0.0)
+    left_stick.rect.center = button_left_stick.rect.center
+    right_stick.rect.center = button_right_stick.rect.center
+
+    # trigger display
+    left_trigger = Struct(rect=Rect(40, 40, 40, 40), value=0.0)
+    right_trigger = Struct(rect=Rect(560, 40, 40, 40), value=0.0)
+
+    # d-pad display arrangement:
+    # (-1,  1)    (0,  1)    (1,  1)
+    # (-1,  0     (0,  0)    (1,  0)
+    # (-1, -1)    (0, -1)    (1, -1)
+    d_pad = {}
+    d_pad_posx = {-1: 0, 0: 20, 1: 40}
+    d_pad_posy = {1: 0, 0: 20, -1: 40}
+    for y in 1, 0, -1:
+        for x in -1, 0, 1:
+            d_pad[x, y] = Struct(rect=Rect(220 + d_pad_posx[x], 220 + d_pad_posy[y], 20, 20), value=0)
+    pressed_pads = [0,0]  # save state
+    return Struct(buttons=buttons, left_stick=left_stick, right_stick=right_stick, left_trigger=left_trigger,
+                  right_trigger=right_trigger, d_pad=d_pad, pressed_pads=pressed_pads)
 # [end DISPLAY ELEMENTS]
 
 
@@ -220,7 +372,8 @@ pressed_pads = [0,0]  # save state
 # EVENT HANDLING FUNCTIONS
 #/////////////////////////////
 
-def update_d_pad_mac(event, event_type):
+def update_d_pad_mac(device, event, event_type):
+    d_pad, pressed_pads = device.d_pad, device.pressed_pads
     d_pad[tuple(pressed_pads)].value = 0
     if event_type == JOYBUTTONDOWN:
         if d_pad_codes[event.button] == 'DOWN':
@@ -243,10 +396,11 @@ def update_d_pad_mac(event, event_type):
             pressed_pads[0] = 0
         if pressed_pads != [0,0]:
             d_pad[tuple(pressed_pads)].value = 1
-    controller_values['DPAD'] = pressed_pads
+    device.values['DPAD'] = pressed_pads
 
 
-def update_triggers_windows(axis, value):
+def update_triggers_windows(device, axis, value):
+    controller_values, left_trigger, right_trigger = device.values, device.left_trigger, device.right_trigger
     if XBOX_CONTROLLER:
         if axis == axis_codes['RT']:
             controller_values['RT'] = value
@@ -266,8 +420,8 @@ def update_triggers_windows(axis, value):
             right_trigger.value = -value
 
 
-def update_axis_motion_windows(axis, value):
-    global controller_values
+def update_axis_motion_windows(device, axis, value):
+    controller_values, left_stick, right_stick = device.values, device.left_stick, device.right_stick
     if axis == axis_codes['LY']:
         if XBOX_CONTROLLER:
             left_stick.y = stick_center_snap(value)
@@ -289,17 +443,18 @@ def update_axis_motion_windows(axis, value):
         right_stick.x = stick_center_snap(value)
         controller_values['RX'] = value
     else:
-        update_triggers_windows(axis, value)
+        update_triggers_windows(device, axis, value)
 
 
-def handle_axis_motion(axis, value):
-    global controller_values
+def handle_axis_motion(device, axis, value):
     if DEBUG:
-        print('JOYAXISMOTION: axis {}, value {}'.format(event.axis, event.value))
+        print('JOYAXISMOTION: axis {}, value {}'.format(axis, value))
     if axis in axis_codes:
         if PLATFORM == 'WINDOWS':
-            update_axis_motion_windows(axis, value)
+            update_axis_motion_windows(device, axis, value)
         elif PLATFORM == 'DARWIN':
+            controller_values, left_stick, right_stick = device.values, device.left_stick, device.right_stick
+            left_trigger, right_trigger = device.left_trigger, device.right_trigger
             controller_values[axis_codes[axis]] = -value if axis in [axis_codes['LY'], axis_codes['RY']] else value
             if axis == axis_codes['LT']:
                 left_trigger.value = (value + 1) / 2.
@@ -315,42 +470,71 @@ def handle_axis_motion(axis, value):
                 right_stick.x = stick_center_snap(value)
 
 
-def handle_button_down(event):
+def handle_button_down(device, event):
+    controller_values, buttons = device.values, device.buttons
     if DEBUG:
         print('JOYBUTTONDOWN: button {}'.format(event.button))
     if event.button in buttons_codes:
         controller_values[buttons_codes[event.button]] = 1
         buttons[buttons_codes[event.button]].value = 1
     elif PLATFORM == 'DARWIN' and event.button in d_pad_codes:
-        update_d_pad_mac(event, JOYBUTTONDOWN)
+        update_d_pad_mac(device, event, JOYBUTTONDOWN)
     else:
         if DEBUG:
             print('Button not mapped')
 
 
-def handle_button_up(event):
+def handle_button_up(device, event):
+    controller_values, buttons = device.values, device.buttons
     if DEBUG:
         print('JOYBUTTONUP: button {}'.format(event.button))
     if event.button in buttons_codes:
         controller_values[buttons_codes[event.button]] = 0
         buttons[buttons_codes[event.button]].value = 0
     elif PLATFORM == 'DARWIN' and event.button in d_pad_codes:
-        update_d_pad_mac(event, JOYBUTTONUP)
+        update_d_pad_mac(device, event, JOYBUTTONUP)
     else:
         if DEBUG:
             print('Button not mapped')
 
 
-def handle_hat_motion(event):
+def handle_hat_motion(device, event):
     # pygame sends this; xinput sends a button instead--the handler converts the button to a hat event
     if DEBUG:
         print('JOYHATMOTION: joy {} hat {} value {}'.format(event.joy, event.hat, event.value))
-    global pressed_pads
-    d_pad[tuple(pressed_pads)].value = 0
-    pressed_pads = event.value
+    device.d_pad[tuple(device.pressed_pads)].value = 0
+    device.pressed_pads = event.value
     if event.value != (0, 0):
-        d_pad[pressed_pads].value = 1
-    controller_values['DPAD'] = pressed_pads
+        device.d_pad[device.pressed_pads].value = 1
+    device.values['DPAD'] = device.pressed_pads
+
+
+def handle_evdev_input(device, name, value):
+    # the evdev backend gives values already normalized, by input name
+    if DEBUG:
+        print('EVDEV: {} {}'.format(name, value))
+    buttons, left_stick, right_stick = device.buttons, device.left_stick, device.right_stick
+    left_trigger, right_trigger = device.left_trigger, device.right_trigger
+    device.values[name] = value
+    if name in buttons:
+        buttons[name].value = value
+    elif name == 'LX':
+        left_stick.x = stick_center_snap(value)
+    elif name == 'LY':
+        left_stick.y = stick_center_snap(value)
+    elif name == 'RX':
+        right_stick.x = stick_center_snap(value)
+    elif name == 'RY':
+        right_stick.y = stick_center_snap(value)
+    elif name == 'LT':
+        left_trigger.value = value
+    elif name == 'RT':
+        right_trigger.value = value
+    elif name == 'DPAD':
+        device.d_pad[tuple(device.pressed_pads)].value = 0
+        device.pressed_pads = value
+        if value != (0, 0):
+            device.d_pad[value].value = 1
 
 # [end EVENT HANDLING FUNCTIONS]
 
@@ -360,162 +544,360 @@ def handle_hat_motion(event):
 # ANALYSIS OBJECTS
 #/////////////////////////////
 
-ls_velocity = StickVelocityTracker(max_fps)
-rs_velocity = StickVelocityTracker(max_fps)
-lt_velocity = TriggerVelocityTracker(max_fps)
-rt_velocity = TriggerVelocityTracker(max_fps)
-density = DensityTracker(list(buttons.keys()), max_fps)
+def create_analysis_objects(device):
+    device.ls_velocity = StickVelocityTracker(max_fps)
+    device.rs_velocity = StickVelocityTracker(max_fps)
+    device.lt_velocity = TriggerVelocityTracker(max_fps)
+    device.rt_velocity = TriggerVelocityTracker(max_fps)
+    device.density = DensityTracker(list(device.buttons.keys()), max_fps)
+
+analysis_engine = None
+
+def create_analysis_engine():
+    global analysis_engine
+    analysis_engine = AnalysisEngine(max_fps, list(devices[0].buttons.keys()), len(devices))
+
+def update_analysis(device, timestamp):
+    ls_velocity, rs_velocity = device.ls_velocity, device.rs_velocity
+    lt_velocity, rt_velocity, density = device.lt_velocity, device.rt_velocity, device.density
+    analysis_values, buttons = device.analysis, device.buttons
+    ls_velocity.tick(device.left_stick.x, device.left_stick.y, timestamp)
+    rs_velocity.tick(device.right_stick.x, device.right_stick.y, timestamp)
+    lt_velocity.tick(device.left_trigger.value, timestamp)
+    rt_velocity.tick(device.right_trigger.value, timestamp)
+    btn_values = {}
+    for btn in buttons:
+        btn_values[btn] = buttons[btn].value
+    density.tick(btn_values, timestamp)
+    analysis_values['LXVel'] = ls_velocity['X']['LongTermVel']
+    analysis_values['LYVel'] = ls_velocity['Y']['LongTermVel']
+    analysis_values['RXVel'] = rs_velocity['X']['LongTermVel']
+    analysis_values['RYVel'] = rs_velocity['Y']['LongTermVel']
+    analysis_values['LTVel'] = lt_velocity['LongTermVel']
+    analysis_values['RTVel'] = rt_velocity['LongTermVel']
+    analysis_values['Density'] = density.get()
+
+def update_analysis_engine(timestamp):
+    # all the gamepads in one tick of the engine
+    buttons = analysis_engine.getButtons()
+    analysis_engine.tick([[device.left_stick.x, device.left_stick.y, device.right_stick.x, device.right_stick.y,
+                           device.left_trigger.value, device.right_trigger.value] for device in devices],
+                         [[device.buttons[btn].value for btn in buttons] for device in devices], timestamp)
+    analysis_engine.fill([device.analysis for device in devices])
+
+def update_all_analysis(timestamp):
+    # 'timestamp' is the time.perf_counter() of the poll, the trackers compute their rates over real time
+    if analysis_engine is not None:
+        update_analysis_engine(timestamp)
+    else:
+        for device in devices:
+            update_analysis(device, timestamp)
 # [end ANALYSIS OBJECTS]
 
 
 
+#/////////////////////////////
+# DEVICES
+#/////////////////////////////
+
+# one entry per gamepad, with its values, display elements and analysis objects
+# the first device uses the module's controller_values and analysis_values, and is the one drawn by the GUI
+devices = []
+for index, joy in enumerate(device_joys):
+    device = create_display_elements()
+    device.index = index
+    device.joy = joy
+    device.values = controller_values if index == 0 else dict(controller_values)
+    device.analysis = analysis_values if index == 0 else dict(analysis_values)
+    if args.analysis == "python":
+        create_analysis_objects(device)
+    devices.append(device)
+devices_by_joy = {device.joy: device for device in devices}
+if args.analysis == "numpy":
+    create_analysis_engine()
+
+buttons = devices[0].buttons
+left_stick, right_stick = devices[0].left_stick, devices[0].right_stick
+left_trigger, right_trigger = devices[0].left_trigger, devices[0].right_trigger
+d_pad = devices[0].d_pad
+
+build_osc_template()
+build_state_packet()
+build_capture()
+# [end DEVICES]
+
+
+
+#/////////////////////////////
+# LOOP STATS
+#/////////////////////////////
+
+# time spent in each stage of the loops, and time between two sends
+LOOP_STAGES = ['poll', 'analysis', 'send', 'capture', 'send interval', 'render']
+loop_stats = {stage: LatencyHistogram() for stage in LOOP_STAGES}
+last_send_time = None
+
+def record_send_interval(now):
+    global last_send_time
+    if last_send_time is not None:
+        loop_stats['send interval'].record(now - last_send_time)
+    last_send_time = now
+
+def dump_loop_stats():
+    for stage in LOOP_STAGES:
+        histogram = loop_stats[stage]
+        if len(histogram):
+            print("Loop {:13s} : n={} p50={:.2f}ms p95={:.2f}ms p99={:.2f}ms".format(
+                stage, len(histogram), histogram.percentile(50) * 1000, histogram.percentile(95) * 1000,
+                histogram.percentile(99) * 1000))
+    if len(osc_fanout) > 1:
+        for (host, port), sent, dropped in osc_fanout.getStats():
+            print("Destination {}:{} : sent={} dropped={}".format(host, port, sent, dropped))
+
+atexit.register(dump_loop_stats)
+# [end LOOP STATS]
+
+
+
 #/////////////////////////////
 # MAIN LOOP
 #/////////////////////////////
 
+if BACKEND == "pygame":
+    JOYSTICK_EVENTS = [JOYAXISMOTION, JOYBUTTONDOWN, JOYBUTTONUP, JOYHATMOTION]
+
+# guards the controller values and the display elements when the input thread is used
+state_lock = threading.Lock()
+input_stop = threading.Event()
+
+def handle_joystick_event(event):
+    if DEBUG:
+        print('event: {}'.format(pygame.event.event_name(event.type)))
+    device = devices_by_joy.get(event.joy)
+    if device is None:
+        if len(devices) > 1:
+            # not one of the polled gamepads
+            return
+        device = devices[0]
+    if event.type == JOYAXISMOTION:
+        handle_axis_motion(device, event.axis, event.value)
+    elif event.type == JOYBUTTONDOWN:
+        handle_button_down(device, event)
+    elif event.type == JOYBUTTONUP:
+        handle_button_up(device, event)
+    elif event.type == JOYHATMOTION:
+        handle_hat_motion(device, event)
+
+
+def handle_key_event(event):
+    global ENGINE_PAUSED
+    if event.type == VIDEOEXPOSE and dirty_screen is not None:
+        # the window was covered, the unchanged widgets have to be drawn again too
+        dirty_screen.invalidate()
+    if ENGINE_PAUSED:
+        if event.type == KEYDOWN:
+            if event.key == K_SPACE:
+                ENGINE_PAUSED = False
+            elif event.key == K_q:
+                if pygame.key.get_mods() == KMOD_LMETA:
+                    quit()
+    elif event.type == KEYDOWN:
+        if event.key == K_ESCAPE:
+            quit()
+        elif event.key == K_q:
+            if pygame.key.get_mods() == KMOD_LMETA:
+                quit()
+        elif event.key == K_r:
+            if pygame.key.get_mods() == KMOD_LMETA:
+                pass # implement reset
+        elif event.key == K_SPACE:
+            ENGINE_PAUSED = True
+    elif event.type == QUIT:
+        quit()
+
+
+def poll_events():
+    # joystick and keyboard events from the same loop
+    for xinput_joystick in xinput_joysticks:
+        xinput_joystick.dispatch_events()
+    for event in pygame.event.get():
+        if event.type in JOYSTICK_EVENTS:
+            handle_joystick_event(event)
+        else:
+            handle_key_event(event)
+
+
+def poll_joystick():
+    # keyboard events are left to the GUI thread, which also pumps the events as SDL requires
+    for xinput_joystick in xinput_joysticks:
+        xinput_joystick.dispatch_events()
+    for event in pygame.event.get(JOYSTICK_EVENTS, pump=False):
+        handle_joystick_event(event)
+
+
+def poll_evdev(gamepads=None):
+    for device in devices if gamepads is None else [devices_by_joy[gamepad] for gamepad in gamepads]:
+        for name, value in device.joy.read():
+            handle_evdev_input(device, name, value)
+
+
+def input_step(poll, run_analysis=True):
+    start = time.perf_counter()
+    poll()
+    polled = time.perf_counter()
+    if run_analysis:
+        update_all_analysis(polled)
+    analysed = time.perf_counter()
+    if DEBUG:
+        print("Controller values : {}".format(controller_values))
+    # send the osc data or the state packet
+    send_data()
+    sent = time.perf_counter()
+    loop_stats['poll'].record(polled - start)
+    if run_analysis:
+        loop_stats['analysis'].record(analysed - polled)
+    loop_stats['send'].record(sent - analysed)
+    record_send_interval(sent)
+    if capture_writer is not None:
+        captureState()
+        loop_stats['capture'].record(time.perf_counter() - sent)
+
+
+def input_loop(rate, poll):
+    """
+    Poll the controller with 'poll' and send the OSC data at 'rate' Hz, independently of the GUI.
+    The analysis objects are only updated at about max_fps to save CPU, they are given the time of each poll and
+    don't depend on the rate or on its regularity.
+    """
+    period = 1. / rate
+    analysis_interval = max(1, int(round(rate / float(max_fps))))
+    count = 0
+    deadline = time.perf_counter()
+    while not input_stop.is_set():
+        if not ENGINE_PAUSED:
+            with state_lock:
+                input_step(poll, count % analysis_interval == 0)
+            count += 1
+        deadline += period
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -period:
+            # more than one period late, skip the missed sends
+            deadline = time.perf_counter()
+
+
+def take_snapshot():
+    # copies of everything the GUI draws, the input thread only waits for the copy, never for the rendering
+    with state_lock:
+        display = Struct(
+            buttons={name: Struct(rect=button.rect, value=button.value) for name, button in buttons.items()},
+            left_stick=Struct(rect=left_stick.rect, x=left_stick.x, y=left_stick.y),
+            right_stick=Struct(rect=right_stick.rect, x=right_stick.x, y=right_stick.y),
+            left_trigger=Struct(rect=left_trigger.rect, value=left_trigger.value),
+            right_trigger=Struct(rect=right_trigger.rect, value=right_trigger.value),
+            d_pad={pos: Struct(rect=pad.rect, value=pad.value) for pos, pad in d_pad.items()})
+        return display, dict(controller_values), dict(analysis_values)
+
+
+live_display = Struct(buttons=buttons, left_stick=left_stick, right_stick=right_stick, left_trigger=left_trigger,
+                      right_trigger=right_trigger, d_pad=d_pad)
+
+
+def render(display, values, analysis):
+    start = time.perf_counter()
+
+    # draw the controls
+    for name, button in display.buttons.items():
+        if name == 'XB':
+            dirty_screen.addXboxButton(name, button)
+        else:
+            dirty_screen.addButton(name, button)
+    dirty_screen.addStick('left stick', display.left_stick)
+    dirty_screen.addStick('right stick', display.right_stick)
+    dirty_screen.addTrigger('left trigger', display.left_trigger)
+    dirty_screen.addTrigger('right trigger', display.right_trigger)
+    dirty_screen.addDPad('d-pad', display.d_pad)
+
+    # draw program state
+    if ENGINE_PAUSED:
+        w, h = HUGE_FONT.size("PAUSED")
+        dirty_screen.addText('paused', "PAUSED", (320-int(w/2), 20), HUGE_FONT)
+
+    # the text lines are identified by their position
+    for text, pos in layout_values(values, analysis):
+        dirty_screen.addText(pos, text, pos)
+    destinations = [(("shm", args.shm_name), 0)] if args.transport == "shm" else osc_fanout.getStatus()
+    for text, pos in layout_osc_status(OSC_STATUS, destinations, CONTROLLER_ROOT_ADDRESS, ANALYSIS_ROOT_ADDRESS,
+                                       PACKET_RATE, ENGINE_PAUSED):
+        dirty_screen.addText(pos, text, pos)
+
+    # only the changed widgets are drawn and sent to the display
+    dirty_screen.update()
+    loop_stats['render'].record(time.perf_counter() - start)
+
+
+dirty_screen = None
+
 if GUI:
     screen = pygame.display.set_mode((640, 480))
     pygame.display.set_caption("XB1 OSC Synth Project - Server Window")
     screen_rect = screen.get_rect()
-
+    dirty_screen = DirtyScreen(screen)
+
+if BACKEND == "evdev":
+    # headless, the loop sleeps in select/epoll until the next frame, reading the events as they arrive
+    rate = args.input_rate or max_fps
+    period = 1. / rate
+    analysis_interval = max(1, int(round(rate / float(max_fps))))
+    count = 0
+    next_frame = time.perf_counter()
+    while True:
+        input_step(poll_evdev, count % analysis_interval == 0)
+        count += 1
+        next_frame += period
+        while True:
+            delay = next_frame - time.perf_counter()
+            if delay <= 0:
+                break
+            ready = evdev_backend.waitAny(device_joys, delay)
+            if ready:
+                poll_evdev(ready)
+        if delay < -period:
+            # more than one period late, skip the missed sends
+            next_frame = time.perf_counter()
+elif args.input_rate:
+    input_thread = threading.Thread(target=input_loop, args=(args.input_rate, poll_joystick), daemon=True)
+    input_thread.start()
+
+    def stop_input_thread():
+        input_stop.set()
+        input_thread.join()
+    atexit.register(stop_input_thread)
+
+    # the events are pumped at the input rate, the window is only redrawn at max_fps
+    pump_period = 1. / args.input_rate
+    next_render = time.perf_counter()
+    while True:
+        pygame.event.pump()
+        for event in pygame.event.get(exclude=JOYSTICK_EVENTS, pump=False):
+            handle_key_event(event)
+        if GUI and time.perf_counter() >= next_render:
+            next_render += 1. / max_fps
+            if not ENGINE_PAUSED:
+                render(*take_snapshot())
+        time.sleep(pump_period)
+elif GUI:
     while True:
         clock.tick(max_fps)
         if ENGINE_PAUSED:
             for event in pygame.event.get():
-                if event.type == KEYDOWN:
-                    if event.key == K_SPACE:
-                        ENGINE_PAUSED = False
-                        OSC_STATUS_CODE = 0
-                    elif event.key == K_q:
-                        if pygame.key.get_mods() == KMOD_LMETA:
-                            quit()
+                handle_key_event(event)
         else:
-            if XBOX_CONTROLLER:
-                joystick.dispatch_events()
-
-            for event in pygame.event.get():
-                if DEBUG:
-                    print('event: {}'.format(pygame.event.event_name(event.type)))
-                if event.type == JOYAXISMOTION:
-                    handle_axis_motion(event.axis, event.value)
-                elif event.type == JOYBUTTONDOWN:
-                    handle_button_down(event)
-                elif event.type == JOYBUTTONUP:
-                    handle_button_up(event)
-                elif event.type == JOYHATMOTION:
-                    handle_hat_motion(event)
-                elif event.type == KEYDOWN:
-                    if event.key == K_ESCAPE:
-                        quit()
-                    elif event.key == K_q:
-                        if pygame.key.get_mods() == KMOD_LMETA:
-                            quit()
-                    elif event.key == K_r:
-                        if pygame.key.get_mods() == KMOD_LMETA:
-                            pass # implement reset
-                    elif event.key == K_SPACE:
-                        ENGINE_PAUSED = True
-                elif event.type == QUIT:
-                    quit()
-
-            # analysis objects update
-            ls_velocity.tick(left_stick.x, left_stick.y)
-            rs_velocity.tick(right_stick.x, right_stick.y)
-            lt_velocity.tick(left_trigger.value)
-            rt_velocity.tick(right_trigger.value)
-            btn_values = {}
-            for btn in buttons:
-                btn_values[btn] = buttons[btn].value
-            density.tick(btn_values)
-            analysis_values['LXVel'] = ls_velocity['X']['LongTermVel']
-            analysis_values['LYVel'] = ls_velocity['Y']['LongTermVel']
-            analysis_values['RXVel'] = rs_velocity['X']['LongTermVel']
-            analysis_values['RYVel'] = rs_velocity['Y']['LongTermVel']
-            analysis_values['LTVel'] = lt_velocity['LongTermVel']
-            analysis_values['RTVel'] = rt_velocity['LongTermVel']
-            analysis_values['Density'] = density.get()
-
-            if DEBUG:
-                print("Controller values : {}".format(controller_values))
-
-            screen.fill(COLORS['black'])
-
-            # draw the controls
-            for button in buttons.values():
-                if button == button_xbox:
-                    draw_xbox_button(button, screen)
-                else:
-                    draw_button(button, screen)
-            draw_stick(left_stick, screen)
-            draw_stick(right_stick, screen)
-            draw_trigger(left_trigger, screen)
-            draw_trigger(right_trigger, screen)
-            draw_d_pad(d_pad, screen)
-
-            # send the osc data
-            sendOSCData()
-            # draw program state
-            if ENGINE_PAUSED:
-                w, h = HUGE_FONT.size("PAUSED")
-                screen.blit(HUGE_FONT.render("PAUSED", True, COLORS['white']), (320-int(w/2), 20))
-                OSC_STATUS_CODE = 3
-
-            draw_values(controller_values, analysis_values, screen)
-            draw_osc_satus(OSC_STATUS, OSC_STATUS_CODE, IP_ADDRESS, CONTROLLER_ROOT_ADDRESS, ANALYSIS_ROOT_ADDRESS,
-                           OSC_PORT, screen)
-
-            pygame.display.flip()
+            input_step(poll_events)
+            render(live_display, controller_values, analysis_values)
 else:
     while True:
         clock.tick(max_fps)
-        if XBOX_CONTROLLER:
-            joystick.dispatch_events()
-
-        for event in pygame.event.get():
-            if DEBUG:
-                print('event: {}'.format(pygame.event.event_name(event.type)))
-            if event.type == JOYAXISMOTION:
-                handle_axis_motion(event.axis, event.value)
-            elif event.type == JOYBUTTONDOWN:
-                handle_button_down(event)
-            elif event.type == JOYBUTTONUP:
-                handle_button_up(event)
-            elif event.type == JOYHATMOTION:
-                handle_hat_motion(event)
-            elif event.type == KEYDOWN:
-                if event.key == K_ESCAPE:
-                    quit()
-                elif event.key == K_q:
-                    if pygame.key.get_mods() == KMOD_LMETA:
-                        quit()
-                elif event.key == K_r:
-                    if pygame.key.get_mods() == KMOD_LMETA:
-                        pass  # implement reset
-                elif event.key == K_SPACE:
-                    ENGINE_PAUSED = True
-            elif event.type == QUIT:
-                quit()
-
-        # analysis objects update
-        ls_velocity.tick(left_stick.x, left_stick.y)
-        rs_velocity.tick(right_stick.x, right_stick.y)
-        lt_velocity.tick(left_trigger.value)
-        rt_velocity.tick(right_trigger.value)
-        btn_values = {}
-        for btn in buttons:
-            btn_values[btn] = buttons[btn].value
-        density.tick(btn_values)
-        analysis_values['LXVel'] = ls_velocity['X']['LongTermVel']
-        analysis_values['LYVel'] = ls_velocity['Y']['LongTermVel']
-        analysis_values['RXVel'] = rs_velocity['X']['LongTermVel']
-        analysis_values['RYVel'] = rs_velocity['Y']['LongTermVel']
-        analysis_values['LTVel'] = lt_velocity['LongTermVel']
-        analysis_values['RTVel'] = rt_velocity['LongTermVel']
-        analysis_values['Density'] = density.get()
-
-        if DEBUG:
-            print("Controller values : {}".format(controller_values))
-
-        # send the osc data
-        sendOSCData()
+        input_step(poll_events)
 # [end MAIN LOOP]
@@ -1,6 +1,8 @@
 import pygame
 import platform
 
+from structs import Struct, stick_center_snap
+
 PLATFORM = platform.uname()[0].upper()
 
 pygame.font.init()
@@ -17,24 +19,31 @@ elif PLATFORM == 'DARWIN':
     else:
         DEFAULT_FONT = pygame.font.SysFont('Helvetica', 12)
         HUGE_FONT = pygame.font.SysFont('Helvetica', 24)
+else:
+    DEFAULT_FONT = pygame.font.SysFont('DejaVu Sans', 12)
+    HUGE_FONT = pygame.font.SysFont('DejaVu Sans', 24)
 HUGE_FONT.set_bold(True)
 
 COLORS = {'black':pygame.Color('black'), 'white':pygame.Color('white'), 'red':pygame.Color('red')}
 DEFAULT_COLOR = COLORS['white']
+MAX_DESTINATION_LINES = 4
+# rendered text surfaces kept by get_glyph, the cache is emptied when it is full
+MAX_CACHED_GLYPHS = 1024
+STICK_POINT_RADIUS = 5
+D_PAD_RADIUS = 40
 
+_glyph_cache = {}
 
-class Struct(dict):
-    def __init__(self, **kwargs):
-        dict.__init__(self, **kwargs)
-        self.__dict__.update(**kwargs)
-
-    def __getitem__(self, item):
-        return getattr(self, item)
 
-    def getDynamicValue(self, name):
-        def getter():
-            return getattr(self, name)
-        return getter
+def get_glyph(text, font=DEFAULT_FONT, color=DEFAULT_COLOR):
+    # font.render is the most expensive drawing call, each string is only rendered once
+    key = (text, font, tuple(color))
+    glyph = _glyph_cache.get(key)
+    if glyph is None:
+        if len(_glyph_cache) >= MAX_CACHED_GLYPHS:
+            _glyph_cache.clear()
+        glyph = _glyph_cache[key] = font.render(text, True, color)
+    return glyph
 
 
 def draw_button(button, screen):
@@ -50,72 +59,248 @@ def draw_xbox_button(button, screen):
     pygame.draw.circle(screen, COLORS['white'], origin, radius, value)
 
 
+def get_stick_point(stick):
+    ox, oy = stick.rect.center
+    radius = stick.rect.h
+    return int(round(ox + stick.x * radius)), int(round(oy - stick.y * radius))
+
+
 def draw_stick(stick, screen):
-    ox, oy = origin = stick.rect.center
+    origin = stick.rect.center
     radius = stick.rect.h
-    point_radius = 5
-    x, y = int(round(ox + stick.x * radius)), int(round(oy - stick.y * radius))
     pygame.draw.circle(screen, COLORS['white'], origin, radius, 1)
-    pygame.draw.circle(screen, COLORS['red'], (x, y), point_radius, 0)
+    pygame.draw.circle(screen, COLORS['red'], get_stick_point(stick), STICK_POINT_RADIUS, 0)
 
 
-def draw_trigger(trigger, screen):
+def get_trigger_fill(trigger):
+    if trigger.value <= 0.0:
+        return None
     rect = trigger.rect
-    pygame.draw.rect(screen, COLORS['white'], rect, 1)
-    if trigger.value > 0.0:
-        r = rect.copy()
-        r.h = rect.h * trigger.value
-        r.bottom = rect.bottom
+    r = rect.copy()
+    r.h = rect.h * trigger.value
+    r.bottom = rect.bottom
+    return r
+
+
+def draw_trigger(trigger, screen):
+    pygame.draw.rect(screen, COLORS['white'], trigger.rect, 1)
+    r = get_trigger_fill(trigger)
+    if r is not None:
         screen.fill(COLORS['white'], r)
 
 
 def draw_d_pad(d_pad, screen):
-    pygame.draw.circle(screen, COLORS['white'], d_pad[0, 0].rect.center, 40, 1)
+    pygame.draw.circle(screen, COLORS['white'], d_pad[0, 0].rect.center, D_PAD_RADIUS, 1)
     for pad in d_pad.values():
         if pad.value:
             pygame.draw.rect(screen, COLORS['white'], pad.rect, 0)
     pygame.draw.rect(screen, COLORS['white'], d_pad[0, 0].rect, 1)
 
 
-def stick_center_snap(value, snap=0.1):
-    # Feeble attempt to compensate for calibration and loose stick.
-    if value >= snap or value <= -snap:
-        return value
-    else:
-        return 0.0
-
-
 def draw_text(text, pos, screen, font=DEFAULT_FONT, color=DEFAULT_COLOR):
-    textsurface = font.render(text, True, color)
-    screen.blit(textsurface, pos)
+    screen.blit(get_glyph(text, font, color), pos)
     return font.get_linesize()
 
 
-def draw_values(controller_values, analysis_values, screen):
+def layout_values(controller_values, analysis_values, font=DEFAULT_FONT):
+    # list of (text, position) of the values display
     column_spacing = 130
     x_margin = 20
     y_margin = 330
+    line_height = font.get_linesize()
 
     # Controller values display
-    text_height = draw_text('RAW Data', (x_margin, y_margin), screen)
+    lines = ['RAW Data']
     to_draw = ['LX', 'LY', 'RX', 'RY', 'LT', 'RT']
     for key in to_draw:
-        text_height += draw_text('/{} : {: .4f}'.format(key, controller_values[key]),
-                                 (x_margin, y_margin + text_height), screen)
-    draw_text('/DPAD : {}'.format(controller_values['DPAD']), (x_margin, y_margin + text_height), screen)
+        lines.append('/{} : {: .4f}'.format(key, controller_values[key]))
+    lines.append('/DPAD : {}'.format(controller_values['DPAD']))
+    layout = [(text, (x_margin, y_margin + i * line_height)) for i, text in enumerate(lines)]
 
     # Analysis values display
-    text_height = draw_text('Analysis Data', (x_margin + column_spacing, y_margin), screen)
+    lines = ['Analysis Data']
     to_draw = analysis_values.keys()
     for key in to_draw:
-        text_height += draw_text('/{} : {:.4f}'.format(key, analysis_values[key]),
-                                 (x_margin + column_spacing, y_margin + text_height), screen)
+        lines.append('/{} : {:.4f}'.format(key, analysis_values[key]))
+    layout += [(text, (x_margin + column_spacing, y_margin + i * line_height)) for i, text in enumerate(lines)]
+    return layout
+
+
+def draw_values(controller_values, analysis_values, screen):
+    for text, pos in layout_values(controller_values, analysis_values):
+        draw_text(text, pos, screen)
 
 
-def draw_osc_satus(OSC_STATUS, OSC_STATUS_CODE, IP_ADDRESS, CONTROLLER_ROOT_ADDRESS, ANALYSIS_ROOT_ADDRESS, OSC_PORT, screen):
+def layout_osc_status(OSC_STATUS, OSC_DESTINATIONS, CONTROLLER_ROOT_ADDRESS, ANALYSIS_ROOT_ADDRESS,
+                      PACKET_RATE=None, PAUSED=False, font=DEFAULT_FONT):
+    # OSC_DESTINATIONS: list of ((ip, port), status code), only the first ones fit in the window
     x, y = (380, 330)
-    text_height = draw_text('OSC Status : {}'.format(OSC_STATUS[OSC_STATUS_CODE]), (x, y), screen)
-    text_height += draw_text('CLIENT IP : {}'.format(IP_ADDRESS), (x, y + text_height), screen)
-    text_height += draw_text('OSC PORT : {}'.format(OSC_PORT), (x, y + text_height), screen)
-    text_height += draw_text('CONTROLLER ROOT ADDRESS : {}'.format(CONTROLLER_ROOT_ADDRESS), (x, y + text_height), screen)
-    text_height += draw_text('ANALYSIS ROOT ADDRESS : {}'.format(ANALYSIS_ROOT_ADDRESS), (x, y + text_height), screen)
+    lines = []
+    for (ip, port), code in OSC_DESTINATIONS[:MAX_DESTINATION_LINES]:
+        status = OSC_STATUS[3] if PAUSED else OSC_STATUS[code]
+        lines.append('{}:{} : {}'.format(ip, port, status))
+    if len(OSC_DESTINATIONS) > MAX_DESTINATION_LINES:
+        lines.append('+ {} DESTINATIONS'.format(len(OSC_DESTINATIONS) - MAX_DESTINATION_LINES))
+    lines.append('CONTROLLER ROOT ADDRESS : {}'.format(CONTROLLER_ROOT_ADDRESS))
+    lines.append('ANALYSIS ROOT ADDRESS : {}'.format(ANALYSIS_ROOT_ADDRESS))
+    if PACKET_RATE is not None:
+        lines.append('PACKETS/S : {:.1f}'.format(PACKET_RATE))
+    line_height = font.get_linesize()
+    return [(text, (x, y + i * line_height)) for i, text in enumerate(lines)]
+
+
+def draw_osc_satus(OSC_STATUS, OSC_DESTINATIONS, CONTROLLER_ROOT_ADDRESS, ANALYSIS_ROOT_ADDRESS, screen,
+                   PACKET_RATE=None, PAUSED=False):
+    for text, pos in layout_osc_status(OSC_STATUS, OSC_DESTINATIONS, CONTROLLER_ROOT_ADDRESS,
+                                       ANALYSIS_ROOT_ADDRESS, PACKET_RATE, PAUSED):
+        draw_text(text, pos, screen)
+
+
+def merge_rects(rects):
+    # touching rectangles are merged, ie.: the lines of a column of text, a fill costs the same for any small size
+    merged = []
+    for rect in rects:
+        i = rect.inflate(2, 2).collidelist(merged)
+        while i != -1:
+            rect = rect.union(merged.pop(i))
+            i = rect.inflate(2, 2).collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class DirtyScreen:
+    """
+    class DirtyScreen
+
+    Redraws only the parts of the window that changed. The widgets of a frame are added with the add methods, each
+    with a state made of the values it shows, then update() compares the states with those of the previous frame:
+    only the widgets whose state changed are cleared and drawn again, along with the widgets overlapping them, and
+    only their rectangles are sent to the display with pygame.display.update(rects).
+    Widgets are identified by a key, a widget that is not added anymore is erased.
+
+    Usage:
+        dirty_screen = DirtyScreen(screen)
+        while True:
+            dirty_screen.addButton('A', button_a)
+            dirty_screen.addText('rate', 'PACKETS/S : {:.1f}'.format(rate), (380, 400))
+            dirty_screen.update()
+
+    :Args:
+
+        screen: pygame.Surface
+            Display surface, ie.: of pygame.display.set_mode.
+        background: pygame.Color
+            Color the changed widgets are cleared with.
+    """
+    def __init__(self, screen, background=COLORS['black']):
+        self._screen = screen
+        self._background = background
+        self._widgets = []
+        # key: (state, rect) of the widgets drawn last
+        self._drawn = {}
+        self._full_redraw = True
+
+    def add(self, key, state, rect, draw, *args):
+        """
+        Add a widget to the frame.
+        :param key: identifier of the widget, the same from frame to frame
+        :param state: values shown by the widget, it is only drawn again when they change
+        :param rect: pygame.Rect containing everything the widget draws
+        :param draw: function drawing the widget, called as draw(*args, screen)
+        """
+        self._widgets.append((key, state, rect, draw, args))
+
+    def addButton(self, key, button):
+        self.add(key, button.value, button.rect, draw_button, button)
+
+    def addXboxButton(self, key, button):
+        radius = button.rect.h
+        rect = pygame.Rect(0, 0, 2 * radius + 1, 2 * radius + 1)
+        rect.center = button.rect.center
+        self.add(key, button.value, rect, draw_xbox_button, button)
+
+    def addStick(self, key, stick):
+        # the state is the position of the point in pixels, moves smaller than a pixel are not drawn
+        point = get_stick_point(stick)
+        radius = stick.rect.h
+        rect = pygame.Rect(0, 0, 2 * radius + 1, 2 * radius + 1)
+        rect.center = stick.rect.center
+        point_rect = pygame.Rect(0, 0, 2 * STICK_POINT_RADIUS + 1, 2 * STICK_POINT_RADIUS + 1)
+        point_rect.center = point
+        self.add(key, point, rect.union(point_rect), draw_stick, stick)
+
+    def addTrigger(self, key, trigger):
+        r = get_trigger_fill(trigger)
+        self.add(key, r.h if r is not None else None, trigger.rect, draw_trigger, trigger)
+
+    def addDPad(self, key, d_pad):
+        rect = pygame.Rect(0, 0, 2 * D_PAD_RADIUS + 1, 2 * D_PAD_RADIUS + 1)
+        rect.center = d_pad[0, 0].rect.center
+        rect.unionall_ip([pad.rect for pad in d_pad.values()])
+        self.add(key, tuple(pos for pos, pad in sorted(d_pad.items()) if pad.value), rect, draw_d_pad, d_pad)
+
+    def addText(self, key, text, pos, font=DEFAULT_FONT, color=DEFAULT_COLOR):
+        glyph = get_glyph(text, font, color)
+        self.add(key, (text, tuple(color)), glyph.get_rect(topleft=pos), self._blit, glyph, pos)
+
+    def _blit(self, glyph, pos, screen):
+        screen.blit(glyph, pos)
+
+    def invalidate(self):
+        """
+        Draw the whole window at the next update, ie.: after it was covered or resized.
+        """
+        self._full_redraw = True
+
+    def update(self):
+        """
+        Draw the widgets added since the last update and send the changed rectangles to the display.
+        :return: list of the updated rectangles
+        """
+        widgets, self._widgets = self._widgets, []
+        drawn, self._drawn = self._drawn, {}
+        for key, state, rect, draw, args in widgets:
+            self._drawn[key] = (state, rect)
+
+        if self._full_redraw:
+            self._full_redraw = False
+            self._screen.fill(self._background)
+            for key, state, rect, draw, args in widgets:
+                draw(*(args + (self._screen,)))
+            pygame.display.flip()
+            return [self._screen.get_rect()]
+
+        dirty = []
+        redraw = set()
+        for i, (key, state, rect, draw, args) in enumerate(widgets):
+            previous = drawn.pop(key, None)
+            if previous is None or previous[0] != state or previous[1] != rect:
+                redraw.add(i)
+                dirty.append(rect)
+                if previous is not None and previous[1] != rect:
+                    dirty.append(previous[1])
+        # widgets gone since the last frame
+        dirty += [rect for state, rect in drawn.values()]
+        if not dirty:
+            return dirty
+
+        # the widgets overlapping a cleared rectangle are drawn again, which clears their own rectangle too
+        dirty = merge_rects(dirty)
+        rects = [widget[2] for widget in widgets]
+        pending = list(dirty)
+        while pending:
+            cleared = pending.pop()
+            for i in cleared.collidelistall(rects):
+                if i not in redraw:
+                    redraw.add(i)
+                    if not cleared.contains(rects[i]):
+                        dirty.append(rects[i])
+                        pending.append(rects[i])
+
+        for rect in dirty:
+            self._screen.fill(self._background, rect)
+        for i in sorted(redraw):
+            key, state, rect, draw, args = widgets[i]
+            draw(*(args + (self._screen,)))
+        pygame.display.update(dirty)
+        return dirty
@@ -0,0 +1,235 @@
+import errno
+import os
+import re
+import select
+import selectors
+import stat
+import struct
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# struct input_event: struct timeval time, __u16 type, __u16 code, __s32 value
+EVENT_STRUCT = struct.Struct("llHHi")
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+
+# button codes of the xpad driver
+BUTTON_CODES = {0x130: 'A', 0x131: 'B', 0x133: 'X', 0x134: 'Y', 0x136: 'LB', 0x137: 'RB', 0x13a: 'BACK',
+                0x13b: 'START', 0x13c: 'XB', 0x13d: 'LS', 0x13e: 'RS'}
+# d-pad reported as buttons by some drivers: (axis index, value)
+DPAD_BUTTON_CODES = {0x220: (1, 1), 0x221: (1, -1), 0x222: (0, -1), 0x223: (0, 1)}
+# absolute axes: name, default minimum, default maximum
+AXIS_CODES = {0x00: ('LX', -32768, 32767), 0x01: ('LY', -32768, 32767), 0x03: ('RX', -32768, 32767),
+              0x04: ('RY', -32768, 32767), 0x02: ('LT', 0, 1023), 0x05: ('RT', 0, 1023)}
+HAT_CODES = {0x10: 0, 0x11: 1}
+# evdev's y axes point down, the controller's point up
+INVERTED_AXES = ['LY', 'RY']
+TRIGGERS = ['LT', 'RT']
+
+
+def _EVIOCGABS(code):
+    # _IOR('E', 0x40 + code, struct input_absinfo)
+    return (2 << 30) | (24 << 16) | (ord('E') << 8) | (0x40 + code)
+
+
+def packEvent(type, code, value, timestamp=0.):
+    """
+    Encode an input event as the kernel does, ie.: to write a recording or feed a fake device.
+    """
+    sec = int(timestamp)
+    return EVENT_STRUCT.pack(sec, int(round((timestamp - sec) * 1e6)), type, code, value)
+
+
+def findGamepads(devices_file="/proc/bus/input/devices"):
+    """
+    List the event devices handled by the joystick driver, ie.: ['/dev/input/event5'].
+    """
+    gamepads = []
+    try:
+        with open(devices_file) as f:
+            description = f.read()
+    except OSError:
+        return gamepads
+    for block in description.split("\n\n"):
+        match = re.search(r"^H: Handlers=(.*)$", block, re.MULTILINE)
+        if match is None:
+            continue
+        handlers = match.group(1).split()
+        events = [handler for handler in handlers if handler.startswith("event")]
+        if events and any(handler.startswith("js") for handler in handlers):
+            gamepads.append(os.path.join("/dev/input", events[0]))
+    return gamepads
+
+
+def waitAny(gamepads, timeout=None):
+    """
+    Sleep until one of the gamepads has events available or 'timeout' seconds passed.
+    :return: list of the gamepads with events available
+    """
+    if len(gamepads) == 1:
+        return list(gamepads) if gamepads[0].wait(timeout) else []
+    connected = [gamepad for gamepad in gamepads if gamepad.is_connected()]
+    if not connected:
+        if timeout:
+            time.sleep(timeout)
+        return []
+    return select.select(connected, [], [], timeout)[0]
+
+
+class EvdevGamepad:
+    """
+    class EvdevGamepad
+
+    Reads a gamepad straight from a Linux event device, without pygame or a display. The reads are non-blocking
+    and wait() sleeps in select/epoll until events are available.
+    Values are normalized like the other backends of the server: sticks between -1 and 1 pointing up and right,
+    triggers between 0 and 1, buttons 0 or 1 and the D-Pad as an (x, y) tuple.
+
+    The source can also be a recorded event file (ie.: the output of 'cat /dev/input/event5 > capture') or the
+    file descriptor of a pipe, which lets the server run against a fake device.
+
+    :Args:
+
+        device: str or int
+            Path of the event device or of a recording, or an open file descriptor.
+    """
+    def __init__(self, device):
+        if isinstance(device, int):
+            self._fd = device
+            self._name = "fd {}".format(device)
+        else:
+            self._fd = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+            self._name = device
+        if stat.S_ISFIFO(os.fstat(self._fd).st_mode):
+            flags = fcntl.fcntl(self._fd, fcntl.F_GETFL)
+            fcntl.fcntl(self._fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self._is_device = stat.S_ISCHR(os.fstat(self._fd).st_mode)
+        self._buffer = b""
+        self._eof = False
+        self._dpad = [0, 0]
+        self._ranges = {}
+        for code, (name, low, high) in AXIS_CODES.items():
+            self._ranges[code] = self._readRange(code, low, high)
+        # epoll can't watch regular files, which are always readable anyway
+        if stat.S_ISREG(os.fstat(self._fd).st_mode):
+            self._selector = None
+        else:
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._fd, selectors.EVENT_READ)
+
+    def _readRange(self, code, low, high):
+        # recordings and pipes don't know the axis ranges, the xpad defaults are used
+        if self._is_device and fcntl is not None:
+            try:
+                info = struct.unpack("6i", fcntl.ioctl(self._fd, _EVIOCGABS(code), bytes(24)))
+            except OSError:
+                return low, high
+            if info[2] > info[1]:
+                return info[1], info[2]
+        return low, high
+
+    def _normalize(self, code, value):
+        name = AXIS_CODES[code][0]
+        low, high = self._ranges[code]
+        if name in TRIGGERS:
+            normalized = (value - low) / float(high - low)
+        else:
+            normalized = (value - low) / float(high - low) * 2 - 1
+            if name in INVERTED_AXES:
+                normalized = -normalized
+        return name, min(1., max(-1., normalized))
+
+    def _decode(self, type, code, value):
+        if type == EV_KEY:
+            if value == 2:
+                # auto repeat
+                return None
+            if code in BUTTON_CODES:
+                return BUTTON_CODES[code], 1 if value else 0
+            if code in DPAD_BUTTON_CODES:
+                index, direction = DPAD_BUTTON_CODES[code]
+                if value:
+                    self._dpad[index] = direction
+                elif self._dpad[index] == direction:
+                    self._dpad[index] = 0
+                return 'DPAD', tuple(self._dpad)
+        elif type == EV_ABS:
+            if code in AXIS_CODES:
+                return self._normalize(code, value)
+            if code in HAT_CODES:
+                index = HAT_CODES[code]
+                # the hat's y axis points down too
+                self._dpad[index] = -value if index == 1 else value
+                return 'DPAD', tuple(self._dpad)
+        return None
+
+    def fileno(self):
+        return self._fd
+
+    def read(self):
+        """
+        Read every event available without blocking.
+        :return: list of (name, value) tuples, in the order of the events
+        """
+        if self._eof:
+            return []
+        data = []
+        while True:
+            try:
+                chunk = os.read(self._fd, EVENT_STRUCT.size * 64)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno != errno.ENODEV:
+                    raise
+                # the device was unplugged
+                chunk = b""
+            if not chunk:
+                self._eof = True
+                break
+            data.append(chunk)
+        if not data:
+            return []
+        buffer = self._buffer + b"".join(data)
+        size = EVENT_STRUCT.size
+        end = len(buffer) - len(buffer) % size
+        self._buffer = buffer[end:]
+        inputs = []
+        for sec, usec, type, code, value in EVENT_STRUCT.iter_unpack(buffer[:end]):
+            decoded = self._decode(type, code, value)
+            if decoded is not None:
+                inputs.append(decoded)
+        return inputs
+
+    def wait(self, timeout=None):
+        """
+        Sleep until events are available or 'timeout' seconds passed.
+        :return: True if events are available
+        """
+        if self._eof:
+            if timeout:
+                time.sleep(timeout)
+            return False
+        if self._selector is None:
+            return True
+        return bool(self._selector.select(timeout))
+
+    def is_connected(self):
+        """
+        :return: False once the device was unplugged or the end of the recording was read
+        """
+        return not self._eof
+
+    def getName(self):
+        return self._name
+
+    def close(self):
+        if self._selector is not None:
+            self._selector.close()
+        os.close(self._fd)
@@ -0,0 +1,185 @@
+import json
+
+from pyo import Server, serverBooted, serverCreated
+
+import controller
+
+
+class VirtualClock:
+    """
+    class VirtualClock
+
+    Clock that only moves when told to. Can be given as the 'clock' argument of the controller objects.
+
+    :Args:
+
+        start: float
+            Initial time in seconds.
+    """
+    def __init__(self, start=0.):
+        self._now = float(start)
+
+    def __call__(self):
+        return self._now
+
+    def set(self, now):
+        assert now >= self._now, "VirtualClock can't go back in time"
+        self._now = float(now)
+
+    def advance(self, delta):
+        self.set(self._now + delta)
+
+
+class ControllerHarness:
+    """
+    class ControllerHarness
+
+    Feeds timestamped input states to a Controller on a VirtualClock, without any audio device, and records every
+    callback that fires with the virtual time at which it fired.
+    Time jumps from one event deadline to the next, so a stream runs as fast as the event logic allows. With the
+    "thread" engine, a CallbackScheduler on the virtual clock replaces the scheduler of the controller module until
+    cleanup(), and is run on the calling thread.
+
+    Usage:
+        harness = ControllerHarness()
+        harness.watch(['A', 'B'])
+        harness.controller.registerCombination(['A', 'B'], harness.recorder('A+B'))
+        harness.play([(1.0, {'A': 1}), (1.05, {'B': 1}), (1.2, {'A': 0, 'B': 0})])
+        harness.getEvents() # [(1.05, 'A press', ()), (1.23, 'A+B', ()), ...]
+
+    :Args:
+
+        start: float
+            Initial time of the virtual clock. Defaults to 0.
+        engine: str
+            Event engine of the Controller, "tick" (TickButton) or "thread" (Button and CallbackQueue on the
+            callback scheduler). Defaults to "tick".
+    """
+    def __init__(self, start=0., engine="tick"):
+        if not serverCreated():
+            self._server = Server(audio='offline')
+        else:
+            self._server = None
+        if not serverBooted():
+            if self._server is None:
+                raise RuntimeError("ControllerHarness: the existing pyo Server must be booted")
+            self._server.boot()
+        self.clock = VirtualClock(start)
+        self._engine = engine
+        if engine == "thread":
+            self.scheduler = controller.CallbackScheduler(clock=self.clock)
+            controller.setScheduler(self.scheduler)
+            self.controller = controller.Controller(engine="thread", clock=self.clock)
+        elif engine == "tick":
+            self.scheduler = None
+            self.controller = controller.Controller(engine="tick", clock=self.clock, tick_period=None)
+        else:
+            raise ValueError("Unknown engine: {}".format(engine))
+        self._events = []
+
+    def recorder(self, name):
+        """
+        Get a callback that records 'name' and its arguments when called.
+        """
+        def record(*args):
+            self._events.append((self.clock(), name, args))
+        return record
+
+    def watch(self, buttons=None, hold=True):
+        """
+        Replace the press, release and hold callbacks of the buttons by recorders named '<button> press',
+        '<button> release' and '<button> hold'.
+        :param buttons: list of button names, defaults to every button
+        :param hold: also record the hold events
+        """
+        if buttons is None:
+            buttons = self.controller.buttons.keys()
+        for name in buttons:
+            button = self.controller.buttons[name]
+            button.setOnPressCallback(self.recorder("{} press".format(name)))
+            button.setOnReleaseCallback(self.recorder("{} release".format(name)))
+            if hold:
+                button.setOnHoldCallback(self.recorder("{} hold".format(name)))
+
+    def _nextDeadline(self):
+        if self.scheduler is not None:
+            return self.scheduler.nextDeadline()
+        return self.controller.nextDeadline()
+
+    def _runPending(self, deadline):
+        if self.scheduler is not None:
+            self.scheduler.runPending(deadline)
+        else:
+            self.controller.tick(deadline)
+
+    def advance(self, now):
+        """
+        Move the virtual clock to time 'now', firing every event due until then at its own deadline.
+        """
+        while True:
+            deadline = self._nextDeadline()
+            if deadline is None or deadline > now:
+                break
+            self.clock.set(max(deadline, self.clock()))
+            self._runPending(deadline)
+        self.clock.set(now)
+
+    def feed(self, now, state):
+        """
+        Advance to time 'now' and feed a state to the controller.
+        :param state: dict of input name to value, as given to Controller.mainDataCallback
+        """
+        self.advance(now)
+        self.controller.mainDataCallback(state)
+
+    def play(self, stream, until=None):
+        """
+        Feed a stream of states in order.
+        :param stream: iterable of (time, state) tuples, sorted by time
+        :param until: time to advance to once the stream is over, defaults to one second after the last state so
+        that the pending events fire
+        """
+        now = self.clock()
+        for now, state in stream:
+            self.feed(now, state)
+        self.advance(until if until is not None else now + 1.)
+
+    def getEvents(self):
+        """
+        :return: list of (time, name, args) tuples, in the order the callbacks fired
+        """
+        return self._events
+
+    def clearEvents(self):
+        self._events = []
+
+    def cleanup(self):
+        self.controller.cleanup()
+        if self.scheduler is not None:
+            # the next timers of the module get a scheduler on the real clock
+            controller.setScheduler(None)
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def saveStream(path, stream):
+    """
+    Write a stream of (time, state) tuples to a file, one JSON object per line.
+    """
+    with open(path, 'w') as f:
+        for now, state in stream:
+            f.write(json.dumps({'time': now, 'state': state}) + '\n')
+
+
+def loadStream(path):
+    """
+    Read a stream written by saveStream.
+    :return: list of (time, state) tuples
+    """
+    stream = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                frame = json.loads(line)
+                stream.append((frame['time'], frame['state']))
+    return stream
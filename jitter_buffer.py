@@ -0,0 +1,219 @@
+import collections
+import heapq
+import itertools
+import socket
+import struct
+import threading
+import time
+
+from pythonosc.osc_packet import OscPacket
+
+from controller import getScheduler
+from latency import LatencyHistogram
+
+# seconds between the NTP epoch (1900) and the unix epoch (1970)
+NTP_DELTA = 2208988800
+IMMEDIATELY = 1 # OSC time tag meaning "now"
+
+
+def ntpToTime(timetag):
+    return timetag / 4294967296. - NTP_DELTA
+
+
+class JitterBuffer:
+    """
+    class JitterBuffer
+
+    Holds time stamped frames and releases each one at its time stamp plus a fixed delay, so the jitter of the
+    network and of the server's loop doesn't reach the timing of the controller: a few milliseconds of latency are
+    traded for steady intervals between the frames.
+    The clocks of the server and of the client don't need to be synchronized. Their offset is taken as the smallest
+    transit time (arrival time - time stamp) seen during the last 'window' seconds, the fastest frames setting the
+    pace, and 'delay' is added on top of it.
+    Frames are released in the order of their time stamps on the callback scheduler of the controllers. A frame
+    arriving after its release time is released right away and counted as late, a frame older than the last one
+    released is dropped, and so is the oldest frame when the buffer is full.
+
+    :Args:
+
+        callback: callable
+            Called with the items of each frame when it is released.
+        delay: int or float
+            Seconds added to the smallest transit time.
+        capacity: int
+            Maximum number of frames held.
+        window: int or float
+            Seconds over which the smallest transit time is searched.
+        clock: callable
+            Clock of the arrivals and the releases, in the same unit as the time stamps. Defaults to time.time.
+        scheduler: CallbackScheduler
+            Defaults to the scheduler of the controllers. Must use the same clock as 'clock', up to an offset.
+    """
+    def __init__(self, callback: callable, delay=0.01, capacity=64, window=2., clock: callable = None,
+                 scheduler=None):
+        self._callback = callback
+        self._delay = delay
+        self._capacity = capacity
+        self._window = window
+        self._clock = clock if clock is not None else time.time
+        self._scheduler = scheduler if scheduler is not None else getScheduler()
+        self._lock = threading.Lock()
+        self._heap = []
+        self._counter = itertools.count() # keeps the order of frames with the same time stamp
+        # (arrival, transit) pairs with increasing transits, the first one is the smallest of the window
+        self._transits = collections.deque()
+        self._handle = None
+        self._scheduled = None
+        self._last_released = None
+        self._lateness = LatencyHistogram(low=1e-5, high=1.)
+        self._received = 0
+        self._released = 0
+        self._late = 0
+        self._dropped = 0
+
+    def _offset(self, now, transit):
+        transits = self._transits
+        while transits and transits[-1][1] >= transit:
+            transits.pop()
+        transits.append((now, transit))
+        while transits[0][0] < now - self._window:
+            transits.popleft()
+        return transits[0][1]
+
+    def push(self, timestamp, items):
+        """
+        Add a frame.
+        :param timestamp: time at which the frame was captured by the server
+        :param items: given to the callback when the frame is released
+        """
+        with self._lock:
+            now = self._clock()
+            self._received += 1
+            if self._last_released is not None and timestamp < self._last_released:
+                # the state it holds was already overwritten by a newer frame
+                self._dropped += 1
+                return
+            release = timestamp + self._offset(now, now - timestamp) + self._delay
+            if release < now:
+                self._late += 1
+                release = now
+            heapq.heappush(self._heap, (release, timestamp, next(self._counter), items))
+            if len(self._heap) > self._capacity:
+                self._heap.remove(min(self._heap, key=lambda frame: frame[1]))
+                heapq.heapify(self._heap)
+                self._dropped += 1
+            self._schedule(now)
+
+    def _schedule(self, now):
+        # must be called with self._lock acquired
+        release = self._heap[0][0]
+        if self._scheduled is not None and self._scheduled <= release:
+            return
+        self._scheduled = release
+        self._handle = self._scheduler.schedule(max(0., release - now), self._release, handle=self._handle)
+
+    def _release(self):
+        with self._lock:
+            self._scheduled = None
+            now = self._clock()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                release, timestamp, count, items = heapq.heappop(self._heap)
+                if self._last_released is not None and timestamp < self._last_released:
+                    self._dropped += 1
+                    continue
+                self._last_released = timestamp
+                self._lateness.record(now - release)
+                due.append(items)
+            self._released += len(due)
+            if self._heap:
+                self._schedule(now)
+        for items in due:
+            self._callback(items)
+
+    def setDelay(self, delay):
+        self._delay = delay
+
+    def getDelay(self):
+        return self._delay
+
+    def getStats(self):
+        """
+        :return: dict of the number of frames received, released, late and dropped, of the frames held, of the
+                 current clock offset and of the 50th and 99th percentiles of the release lateness in seconds
+        """
+        with self._lock:
+            return {'received': self._received, 'released': self._released, 'late': self._late,
+                    'dropped': self._dropped, 'held': len(self._heap),
+                    'offset': self._transits[0][1] if self._transits else None,
+                    'lateness_p50': self._lateness.percentile(50), 'lateness_p99': self._lateness.percentile(99)}
+
+
+class OscJitterReceiver(threading.Thread):
+    """
+    class OscJitterReceiver
+
+    Receives the OSC bundles of the server on a UDP port and applies their messages through a JitterBuffer, at the
+    time given by the time tag of each bundle (controller_server.py --timetags). Bundles without a time tag are
+    applied as soon as they arrive.
+
+    Usage:
+        receiver = OscJitterReceiver(5005, xb1_controller.oscDataCallback, delay=0.01)
+
+    :Args:
+
+        port: int
+            UDP port the server sends to.
+        callback: callable
+            Called with the address and the arguments of each message, ie.: Controller.oscDataCallback.
+        delay: int or float
+            Delay of the jitter buffer, in seconds.
+        ip: str
+            Address to listen on, all the interfaces by default.
+        kwargs:
+            Other arguments of the JitterBuffer.
+    """
+    def __init__(self, port, callback: callable, delay=0.01, ip="", **kwargs):
+        threading.Thread.__init__(self, daemon=True)
+        self._osc_callback = callback
+        self._buffer = JitterBuffer(self._apply, delay, **kwargs)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((ip, port))
+        # wakes up regularly to check if the receiver was stopped
+        self._socket.settimeout(0.2)
+        self._running = True
+        self.start()
+
+    def _apply(self, messages):
+        callback = self._osc_callback
+        for address, params in messages:
+            callback(address, *params)
+
+    def run(self):
+        while self._running:
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                messages = [(msg.message.address, msg.message.params) for msg in OscPacket(data).messages]
+            except Exception:
+                continue
+            timetag = struct.unpack_from(">Q", data, 8)[0] if data.startswith(b"#bundle") else IMMEDIATELY
+            if timetag == IMMEDIATELY:
+                self._apply(messages)
+            else:
+                self._buffer.push(ntpToTime(timetag), messages)
+
+    def stop(self):
+        self._running = False
+        self.join()
+        self._socket.close()
+
+    def getBuffer(self):
+        return self._buffer
+
+    def getStats(self):
+        return self._buffer.getStats()
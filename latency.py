@@ -0,0 +1,157 @@
+import math
+import time
+
+
+class LatencyHistogram:
+    """
+    class LatencyHistogram
+
+    Fixed-size histogram of durations, in seconds, with logarithmic bins between 'low' and 'high'.
+    Recording a value is O(1) and the memory used never grows, percentiles are precise to the width of a bin
+    (about 12% with 20 bins per decade).
+
+    :Args:
+
+        low: float
+            Lower bound of the histogram, smaller values are counted in the first bin.
+        high: float
+            Upper bound of the histogram, larger values are counted in the last bin.
+        bins_per_decade: int
+            Resolution of the histogram.
+    """
+    def __init__(self, low=1e-5, high=10., bins_per_decade=20):
+        self._low = low
+        self._bins_per_decade = bins_per_decade
+        # first and last bins hold the values out of bounds
+        self._nbins = int(math.ceil(math.log10(high / low) * bins_per_decade)) + 2
+        self._counts = [0] * self._nbins
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def record(self, value):
+        if value < self._low:
+            index = 0
+        else:
+            index = min(self._nbins - 1, 1 + int(math.log10(value / self._low) * self._bins_per_decade))
+        self._counts[index] += 1
+        self._count += 1
+
+    def reset(self):
+        self._counts = [0] * self._nbins
+        self._count = 0
+
+    def percentile(self, p):
+        """
+        Get the value below which p percent of the recorded values fall.
+        :return: upper edge of the matching bin in seconds, or None if nothing was recorded
+        """
+        if not self._count:
+            return None
+        target = p / 100. * self._count
+        total = 0
+        for i, count in enumerate(self._counts):
+            total += count
+            if total >= target:
+                return self._low * 10 ** (i / float(self._bins_per_decade))
+        return self._low * 10 ** ((self._nbins - 1) / float(self._bins_per_decade))
+
+
+class LatencyMonitor:
+    """
+    class LatencyMonitor
+
+    Measures the time between the moment the server sent a bundle and the moment each of its values reached the
+    synth. The server stamps each bundle with its send time, then for each input three stages are recorded in a
+    LatencyHistogram:
+        receive : the bundle stamp was received
+        dispatch : the value was written to its pyo object
+        callback : the Button callbacks triggered by the value returned (buttons and triggers only). The callbacks
+                   deferred by the event queue of the Button are recorded when they return, on the scheduler thread
+                   or in Controller.tick, against the send time of the bundle that triggered them
+
+    The send time is given by the server's clock, so the clocks of both machines must be synchronized when the
+    server runs on another host.
+
+    :Args:
+
+        clock: callable
+            Returns the current time in seconds, must match the clock used by the server. Defaults to time.time.
+    """
+    STAGES = ('receive', 'dispatch', 'callback')
+
+    def __init__(self, clock=None):
+        self._clock = clock if clock is not None else time.time
+        self._histograms = {}
+        self._send_time = None
+        self._receive_latency = 0.
+
+    def _getHistograms(self, which):
+        if which not in self._histograms:
+            self._histograms[which] = {stage: LatencyHistogram() for stage in LatencyMonitor.STAGES}
+        return self._histograms[which]
+
+    def stamp(self, send_time):
+        """
+        Called when the send time of a new bundle is received.
+        """
+        self._send_time = send_time
+        self._receive_latency = self._clock() - send_time
+
+    def recordDispatch(self, which):
+        if self._send_time is None:
+            return
+        histograms = self._getHistograms(which)
+        histograms['receive'].record(self._receive_latency)
+        histograms['dispatch'].record(self._clock() - self._send_time)
+
+    def recordCallback(self, which):
+        if self._send_time is None:
+            return
+        self._getHistograms(which)['callback'].record(self._clock() - self._send_time)
+
+    def wrapCallback(self, which, callback):
+        """
+        Get a function calling 'callback', then recording its completion in the callback stage of 'which' against the
+        send time of the current bundle. Used for the callbacks that run later than the value that triggered them.
+        """
+        send_time = self._send_time
+        if send_time is None:
+            return callback
+        def wrapper(*args):
+            callback(*args)
+            self._getHistograms(which)['callback'].record(self._clock() - send_time)
+        return wrapper
+
+    def reset(self):
+        self._histograms = {}
+
+    def getStats(self, percentiles=(50, 95, 99)):
+        """
+        Get the percentiles of every stage of every input, in seconds.
+        :return: dict, ie.: {'LX': {'dispatch': {'count': 1200, 'p50': 0.0011, 'p95': ..., 'p99': ...}, ...}, ...}
+        """
+        stats = {}
+        for which, histograms in self._histograms.items():
+            stats[which] = {}
+            for stage, histogram in histograms.items():
+                if not len(histogram):
+                    continue
+                stats[which][stage] = {'count': len(histogram)}
+                for p in percentiles:
+                    stats[which][stage]['p{}'.format(p)] = histogram.percentile(p)
+        return stats
+
+    def dump(self, log=print):
+        """
+        Write the stats, one line per input and stage, with the given function, ie.: Monitor.log
+        """
+        stats = self.getStats()
+        for which in sorted(stats):
+            for stage in LatencyMonitor.STAGES:
+                if stage not in stats[which]:
+                    continue
+                values = stats[which][stage]
+                log("Latency /{} {} : n={} p50={:.2f}ms p95={:.2f}ms p99={:.2f}ms".format(
+                    which, stage, values['count'], values['p50'] * 1000, values['p95'] * 1000, values['p99'] * 1000))
@@ -264,12 +264,12 @@ def controller_worker(controller_continuous_array, controller_buttons_array, con
 
         #update array
         with controller_continuous_array.get_lock():
-            for i, elem in enumerate(continuous_ref_array):
-                controller_continuous_array[i].value = controller_values[elem]
+            controller_continuous_array[:] = [controller_values[elem] for elem in continuous_ref_array]
 
+        # the d-pad is split in two entries : DPAD1 and DPAD2
+        controller_values['DPAD1'], controller_values['DPAD2'] = controller_values['DPAD']
         with controller_buttons_array.get_lock():
-            for i, elem in enumerate(btns_ref_array):
-                controller_buttons_array[i].value = controller_values[elem]
+            controller_buttons_array[:] = [controller_values[elem] for elem in btns_ref_array]
     # [end MAIN CONTROLLER UPDATE LOOP]
 
 
@@ -433,10 +433,23 @@ controller_process = multiprocessing.Process(target=controller_worker, args=(con
                                              controller_values_btns, continuous_ref, btns_ref, WORKER_STATE))
 
 controller_process.start()
+
+# feed the controller with the shared arrays, only the values that changed are sent to the audio objects
+def readControllerState():
+    with controller_values_continuous.get_lock():
+        state = dict(zip(continuous_ref, controller_values_continuous[:]))
+    with controller_values_btns.get_lock():
+        btns = controller_values_btns[:]
+    state.update(zip(btns_ref[:-2], btns[:-2]))
+    state['DPAD'] = btns[-2:]
+    xb1_controller.mainDataCallback(state, epsilon=0.002)
+
+controller_state_reader = Pattern(readControllerState, time=1/60.).play()
 #mon.logSessionStart()
 main_win.Show()
 app.MainLoop()
 
+controller_state_reader.stop()
 server.stop()
 #mon.logSessionEnd()
 xb1_controller.cleanup()
@@ -0,0 +1,119 @@
+import errno
+import socket
+import time
+
+# status of a destination
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_UNREACHABLE = 2
+STATUS_DROPPING = 4 # the socket's buffer was full, packets are dropped instead of waiting
+
+UNREACHABLE_ERRORS = (errno.ENETUNREACH, errno.EHOSTUNREACH, errno.EHOSTDOWN, errno.ENETDOWN)
+
+
+def parseDestination(destination, default_port):
+    """
+    Parse 'host', 'host:port' or ':port' into a (host, port) tuple.
+    """
+    host, sep, port = destination.rpartition(":")
+    if not sep:
+        return destination, default_port
+    return host or "127.0.0.1", int(port)
+
+
+class OscFanOut:
+    """
+    class OscFanOut
+
+    Sends the same datagram to several destinations through one non-blocking UDP socket, so a bundle is encoded once
+    whatever the number of synths listening. The host names are resolved once, when the destinations are added.
+    Each destination keeps its own status: a destination failing is retried after 'retry_delay' seconds without
+    holding back the others, and a full socket buffer drops the packet instead of blocking the input loop.
+    Multicast groups are sent to like any other destination, with the given TTL.
+
+    Usage:
+        fanout = OscFanOut([('127.0.0.1', 5005), ('192.168.1.20', 5005), ('239.0.0.1', 5005)])
+        fanout.send(template.getData())
+
+    :Args:
+
+        destinations: list
+            (host, port) tuples.
+        multicast_ttl: int
+            Number of hops of the multicast packets, 1 keeps them on the local network.
+        retry_delay: int or float
+            Seconds before sending again to a destination that failed.
+    """
+    def __init__(self, destinations, multicast_ttl=1, retry_delay=0.5):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, multicast_ttl)
+        self._retry_delay = retry_delay
+        self._destinations = []
+        self._addresses = []
+        self._status = []
+        self._retry_time = []
+        self._sent = []
+        self._dropped = []
+        for destination in destinations:
+            self.addDestination(*destination)
+
+    def addDestination(self, host, port):
+        address = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+        self._destinations.append((host, port))
+        self._addresses.append(address)
+        self._status.append(STATUS_OK)
+        self._retry_time.append(0.)
+        self._sent.append(0)
+        self._dropped.append(0)
+
+    def send(self, data, now=None):
+        """
+        Send 'data' to every destination that is not waiting for its retry delay.
+        :param now: current time of time.monotonic, used for the retry delay
+        :return: number of destinations the data was sent to
+        """
+        if now is None:
+            now = time.monotonic()
+        sendto = self._socket.sendto
+        status = self._status
+        count = 0
+        for i, address in enumerate(self._addresses):
+            if now < self._retry_time[i]:
+                continue
+            try:
+                sendto(data, address)
+            except BlockingIOError:
+                status[i] = STATUS_DROPPING
+                self._dropped[i] += 1
+                continue
+            except OSError as e:
+                status[i] = STATUS_UNREACHABLE if e.errno in UNREACHABLE_ERRORS else STATUS_ERROR
+                self._retry_time[i] = now + self._retry_delay
+                self._dropped[i] += 1
+                continue
+            status[i] = STATUS_OK
+            self._sent[i] += 1
+            count += 1
+        return count
+
+    def getDestinations(self):
+        return list(self._destinations)
+
+    def getStatus(self):
+        """
+        :return: list of ((host, port), status) tuples, in the order of the destinations
+        """
+        return list(zip(self._destinations, self._status))
+
+    def getStats(self):
+        """
+        :return: list of ((host, port), packets sent, packets dropped) tuples
+        """
+        return list(zip(self._destinations, self._sent, self._dropped))
+
+    def close(self):
+        self._socket.close()
+
+    def __len__(self):
+        return len(self._addresses)
@@ -0,0 +1,63 @@
+from osc_template import OscBundleTemplate
+
+# OSC namespace of controller_server.py, also used by replay.py to send the sessions with the same bundles
+CONTROLLER_ROOT_ADDRESS = '/XB1'
+ANALYSIS_ROOT_ADDRESS = '/ANA'
+BUTTONS_ADDRESS = '/btn'
+CONTINUOUS_INPUTS_ADDRESS = '/cts'
+TIME_ADDRESS = '/time'
+OSC_TIME_ADDRESS = "{}{}".format(CONTROLLER_ROOT_ADDRESS, TIME_ADDRESS)
+
+# messages of a gamepad, in the order of the bundle
+CONTROLLER_DATA_TYPES = {'A':"i", 'B':"i", 'X':"i", 'Y':"i", 'LB':"i", 'RB':"i", 'LS':"i", 'RS':"i", 'BACK':"i",
+                         'START':"i", 'XB':"i", 'DPAD':["i","i"], 'LX':"f", 'LY':"f", 'RX':"f", 'RY':"f", 'LT':"f",
+                         'RT':"f"}
+ANALYSIS_PARAMS = ['LXVel', 'LYVel', 'RXVel', 'RYVel', 'LTVel', 'RTVel', 'Density']
+
+
+def getDeviceRoot(root, index, indexed):
+    # a single gamepad keeps the namespace without index, ie.: /XB1/btn/A instead of /XB1/0/btn/A
+    if not indexed:
+        return root
+    return "{}/{}".format(root, index)
+
+
+def getControllerAddress(key, index=0, indexed=False):
+    # differentiate between buttons and continuous inputs
+    root = getDeviceRoot(CONTROLLER_ROOT_ADDRESS, index, indexed)
+    if "i" in CONTROLLER_DATA_TYPES[key]:
+        return "{}{}/{}".format(root, BUTTONS_ADDRESS, key)
+    return "{}{}/{}".format(root, CONTINUOUS_INPUTS_ADDRESS, key)
+
+
+def getAnalysisAddress(key, index=0, indexed=False):
+    return "{}/{}".format(getDeviceRoot(ANALYSIS_ROOT_ADDRESS, index, indexed), key)
+
+
+def buildOscTemplate(count, indexed=None):
+    """
+    Encode the layout of the bundle once, only the argument bytes are written every frame.
+    The messages of every gamepad are batched in the same bundle, after a time stamp message for the client's latency
+    stats.
+    :param count: number of gamepads
+    :param indexed: publish each gamepad under its own root, defaults to True with more than one gamepad
+    :return: (template, time stamp setter, [(controller setters, D-Pad setter, analysis setters) of each gamepad]),
+        the controller and analysis setters are lists of (key, setter), without the D-Pad
+    """
+    if indexed is None:
+        indexed = count > 1
+    contents = [(OSC_TIME_ADDRESS, "d")]
+    for index in range(count):
+        contents.append([(getControllerAddress(key, index, indexed), "".join(types))
+                         for key, types in CONTROLLER_DATA_TYPES.items()])
+        contents.append([(getAnalysisAddress(key, index, indexed), "f") for key in ANALYSIS_PARAMS])
+    template = OscBundleTemplate(contents)
+    device_setters = []
+    for index in range(count):
+        controller_setters = [(key, template.getSetter(getControllerAddress(key, index, indexed)))
+                              for key in CONTROLLER_DATA_TYPES if key != 'DPAD']
+        set_dpad = template.getSetter(getControllerAddress('DPAD', index, indexed))
+        analysis_setters = [(key, template.getSetter(getAnalysisAddress(key, index, indexed)))
+                            for key in ANALYSIS_PARAMS]
+        device_setters.append((controller_setters, set_dpad, analysis_setters))
+    return template, template.getSetter(OSC_TIME_ADDRESS), device_setters
@@ -0,0 +1,138 @@
+import functools
+import struct
+
+BUNDLE_HEADER = b"#bundle\x00"
+IMMEDIATELY = 1 # OSC time tag meaning "now"
+NTP_DELTA = 2208988800 # seconds between the NTP epoch (1900) and the unix epoch (1970)
+TIMETAG = struct.Struct(">Q")
+
+# struct formats of the supported OSC argument types, big-endian as required by the OSC specification
+ARG_FORMATS = {'i': 'i', 'f': 'f', 'd': 'd', 'h': 'q'}
+
+
+def _padded(data):
+    # OSC strings are null terminated and padded to a multiple of 4 bytes
+    return data + b"\x00" * (4 - len(data) % 4)
+
+
+class OscBundleTemplate:
+    """
+    class OscBundleTemplate
+
+    OSC bundle whose layout (addresses, type tags, nesting) is encoded once in a preallocated bytearray. Only the
+    argument bytes are patched in place before each send, so building a frame allocates nothing.
+    The encoded bytes are the same as the ones built by pythonosc's OscBundleBuilder with IMMEDIATELY time tags,
+    until setTimeTag is called.
+
+    Usage:
+        template = OscBundleTemplate([('/time', 'd'), [('/XB1/btn/A', 'i'), ('/XB1/btn/DPAD', 'ii')]])
+        set_a = template.getSetter('/XB1/btn/A')
+        set_a(1)
+        sock.sendto(template.getData(), (ip, port))
+
+    :Args:
+
+        contents: list
+            Contents of the bundle, in order. Each element is either an (address, type tags) tuple for a message,
+            or a list of contents for a nested bundle. Supported type tags are 'i', 'f', 'd' and 'h'.
+    """
+    def __init__(self, contents):
+        self._offsets = {}
+        self._formats = {}
+        self._elements = {}
+        self._timetag_offsets = []
+        encoded = self._encodeBundle(contents, 0)
+        self._data = bytearray(encoded)
+        # copy of the data as it was last sent, used to find the messages that changed
+        self._sent = bytearray(self._data)
+        self._header = bytearray(BUNDLE_HEADER + TIMETAG.pack(IMMEDIATELY))
+        self._setters = {}
+        for address, offset in self._offsets.items():
+            self._setters[address] = functools.partial(struct.Struct(self._formats[address]).pack_into,
+                                                       self._data, offset)
+
+    def _encodeBundle(self, contents, position):
+        self._timetag_offsets.append(position + len(BUNDLE_HEADER))
+        data = BUNDLE_HEADER + TIMETAG.pack(IMMEDIATELY)
+        for content in contents:
+            # each element is preceded by its size
+            start = position + len(data) + 4
+            if isinstance(content, list):
+                element = self._encodeBundle(content, start)
+            else:
+                element = self._encodeMessage(content[0], content[1], start)
+                # size and message, as copied in the delta bundles
+                self._elements[content[0]] = (start - 4, start + len(element))
+            data += struct.pack(">i", len(element)) + element
+        return data
+
+    def _encodeMessage(self, address, types, position):
+        assert address not in self._offsets, "Address {} is already in the bundle".format(address)
+        for type in types:
+            assert type in ARG_FORMATS, "Unsupported OSC type tag: {}".format(type)
+        data = _padded(address.encode()) + _padded(("," + types).encode())
+        fmt = ">" + "".join(ARG_FORMATS[type] for type in types)
+        self._offsets[address] = position + len(data)
+        self._formats[address] = fmt
+        # arguments start at zero
+        return data + bytes(struct.calcsize(fmt))
+
+    def getSetter(self, address):
+        """
+        Get a function writing the arguments of a message in place, ie.: setter(0.5) or setter(1, 0) for 'ii'.
+        Calling it is the cheapest way to update a value every frame.
+        """
+        return self._setters[address]
+
+    def setArgs(self, address, *args):
+        self._setters[address](*args)
+
+    def setTimeTag(self, timestamp):
+        """
+        Set the time tag of the bundle and of the nested ones, ie.: the time at which the values were captured.
+        :param timestamp: unix time in seconds, as time.time(), or IMMEDIATELY
+        """
+        if timestamp == IMMEDIATELY:
+            timetag = IMMEDIATELY
+        else:
+            timetag = int((timestamp + NTP_DELTA) * 4294967296.)
+        for offset in self._timetag_offsets:
+            TIMETAG.pack_into(self._data, offset, timetag)
+        TIMETAG.pack_into(self._header, len(BUNDLE_HEADER), timetag)
+
+    def getAddresses(self):
+        return list(self._offsets.keys())
+
+    def getData(self):
+        """
+        :return: the encoded bundle. The bytearray is updated in place, so it must be sent before the next change.
+        """
+        return self._data
+
+    def getDeltaData(self, always=()):
+        """
+        Get a flat bundle holding only the messages whose arguments changed since the last call to getDeltaData or
+        markSent, and mark the current values as sent.
+        :param always: addresses added to the bundle whenever it is not empty, ie.: a time stamp
+        :return: bytes, or None if no message changed
+        """
+        data = self._data
+        sent = self._sent
+        changed = []
+        for address, (start, end) in self._elements.items():
+            if address not in always and data[start:end] != sent[start:end]:
+                changed.append(data[start:end])
+        if not changed:
+            return None
+        elements = [data[self._elements[address][0]:self._elements[address][1]] for address in always]
+        self.markSent()
+        return self._header + b"".join(elements + changed)
+
+    def markSent(self):
+        """
+        Mark the current values as sent, ie.: after sending the full bundle with getData.
+        """
+        self._sent[:] = self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,112 @@
+"""
+Stream a session recorded with controller_server.py --capture to the synth, over the same transports as the server.
+
+usage: python replay.py session.xb1 [--speed 1 | --max-speed] [--loop] [--transport osc|binary|shm] [--dest host:port]
+"""
+import argparse
+import time
+
+from osc_fanout import OscFanOut, parseDestination
+from osc_layout import buildOscTemplate
+from session_capture import CaptureReader
+import shared_state
+import state_packet
+
+IP_ADDRESS = "127.0.0.1"
+OSC_PORT = 5005
+
+
+def createOscTemplate(count):
+    """
+    Build the bundle of the server for 'count' gamepads, with the layout of osc_layout.
+    :return: (template, function writing the states and the time stamp in the template)
+    """
+    template, set_time, setters = buildOscTemplate(count)
+
+    def fill(states, now):
+        for (values, analysis), (controller_setters, set_dpad, analysis_setters) in zip(states, setters):
+            for key, setter in controller_setters:
+                setter(values[key])
+            set_dpad(*values['DPAD'])
+            for key, setter in analysis_setters:
+                setter(analysis[key])
+        set_time(now)
+    return template, fill
+
+
+def replay(reader, send, speed=1.):
+    """
+    Send every frame of a capture, at 'speed' times the recorded pace, or as fast as possible if speed is None.
+    :return: number of frames sent
+    """
+    frames = 0
+    first = start = None
+    for timestamp, packet in reader:
+        if first is None:
+            first = timestamp
+            start = time.monotonic()
+        elif speed is not None:
+            delay = start + (timestamp - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        send(packet)
+        frames += 1
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a controller session recorded by controller_server.py")
+    parser.add_argument("capture", help="File recorded with controller_server.py --capture")
+    parser.add_argument("--speed", type=float, default=1., help="Playback speed, 1 is the recorded pace")
+    parser.add_argument("--max-speed", action="store_true", help="Send the frames as fast as possible")
+    parser.add_argument("--loop", action="store_true", help="Start over at the end of the capture")
+    parser.add_argument("--transport", choices=["osc", "binary", "shm"], default="osc",
+                        help="Same as the transport of controller_server.py")
+    parser.add_argument("--dest", action="append", default=None,
+                        help="Destination as host:port, can be repeated. Defaults to {}:{}".format(
+                            IP_ADDRESS, OSC_PORT))
+    parser.add_argument("--shm-name", default=shared_state.SHM_NAME,
+                        help="Name of the shared memory block of the shm transport")
+    args = parser.parse_args()
+
+    reader = CaptureReader(args.capture)
+    count = reader.getDeviceCount()
+    encoder = state_packet.StatePacketEncoder(count)
+    if args.transport == "shm":
+        shm_writer = shared_state.SharedStateWriter(len(encoder), args.shm_name)
+        output = shm_writer.publish
+    else:
+        destinations = [parseDestination(destination, OSC_PORT) for destination in args.dest or [IP_ADDRESS]]
+        fanout = OscFanOut(destinations)
+        output = fanout.send
+    if args.transport == "osc":
+        template, fill = createOscTemplate(count)
+
+    def send(packet):
+        # the states are sent again with the current time, for the latency stats of the client
+        sequence, send_time, states = state_packet.decodeStates(packet)
+        if args.transport == "osc":
+            fill(states, time.time())
+            output(template.getData())
+        else:
+            output(encoder.encode(time.time(), states))
+
+    speed = None if args.max_speed else args.speed
+    try:
+        while True:
+            start = time.perf_counter()
+            frames = replay(reader, send, speed)
+            elapsed = time.perf_counter() - start
+            print("Replayed {} frames in {:.2f} s ({:.0f} frames/s)".format(
+                frames, elapsed, frames / elapsed if elapsed else 0))
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.transport == "shm":
+            shm_writer.close()
+
+
+if __name__ == "__main__":
+    main()
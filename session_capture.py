@@ -0,0 +1,132 @@
+import struct
+import zlib
+
+MAGIC = b"XB1CAP"
+FORMAT_VERSION = 1
+# magic, format version, number of gamepads, size of a state packet
+FILE_HEADER = struct.Struct("<6sBBH")
+# compressed size and number of frames of a chunk
+CHUNK_HEADER = struct.Struct("<II")
+# monotonic time stamp in front of each state packet
+FRAME_TIME = struct.Struct("<d")
+
+
+class CaptureWriter:
+    """
+    class CaptureWriter
+
+    Records a controller session into an append-only binary file: every polled state, as a state_packet packet
+    preceded by its monotonic time stamp. Frames are gathered in chunks compressed with zlib, a chunk is written
+    every 'chunk_frames' frames so at most one chunk is lost if the program is killed.
+
+    File layout:
+        header: b"XB1CAP", format version, number of gamepads, size of a state packet
+        chunks: compressed size, number of frames, zlib data of the (time stamp, state packet) frames
+
+    :Args:
+
+        path: str
+            File to create, replaced if it exists.
+        count: int
+            Number of gamepads of the state packets.
+        packet_size: int
+            Size of the state packets, ie.: len(StatePacketEncoder(count)).
+        chunk_frames: int
+            Frames per compressed chunk.
+    """
+    def __init__(self, path, count, packet_size, chunk_frames=256):
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION, count, packet_size))
+        self._packet_size = packet_size
+        self._chunk_frames = chunk_frames
+        self._chunk = bytearray()
+        self._frames = 0
+        self._total_frames = 0
+
+    def write(self, timestamp, packet):
+        """
+        Add a frame.
+        :param timestamp: time.monotonic() at which the state was polled
+        :param packet: state packet of StatePacketEncoder.encode
+        """
+        assert len(packet) == self._packet_size, "Wrong state packet size"
+        self._chunk += FRAME_TIME.pack(timestamp)
+        self._chunk += packet
+        self._frames += 1
+        if self._frames >= self._chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """
+        Compress and write the frames added since the last chunk.
+        """
+        if not self._frames:
+            return
+        data = zlib.compress(bytes(self._chunk), 6)
+        self._file.write(CHUNK_HEADER.pack(len(data), self._frames) + data)
+        self._file.flush()
+        self._total_frames += self._frames
+        self._chunk = bytearray()
+        self._frames = 0
+
+    def getFrameCount(self):
+        return self._total_frames + self._frames
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class CaptureReader:
+    """
+    class CaptureReader
+
+    Reads a file written by CaptureWriter, one chunk in memory at a time.
+
+    Usage:
+        reader = CaptureReader("session.xb1")
+        for timestamp, packet in reader:
+            sequence, send_time, states = state_packet.decodeStates(packet)
+
+    :Args:
+
+        path: str
+            File to read.
+    """
+    def __init__(self, path):
+        self._path = path
+        with open(path, "rb") as f:
+            header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise ValueError("{} is not a controller capture".format(path))
+        magic, version, self._count, self._packet_size = FILE_HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("{} is not a controller capture".format(path))
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported capture format version: {}".format(version))
+
+    def getDeviceCount(self):
+        return self._count
+
+    def getPacketSize(self):
+        return self._packet_size
+
+    def __iter__(self):
+        frame_size = FRAME_TIME.size + self._packet_size
+        with open(self._path, "rb") as f:
+            f.seek(FILE_HEADER.size)
+            while True:
+                header = f.read(CHUNK_HEADER.size)
+                if len(header) < CHUNK_HEADER.size:
+                    return
+                size, frames = CHUNK_HEADER.unpack(header)
+                compressed = f.read(size)
+                if len(compressed) < size:
+                    # the last chunk was cut short, ie.: the disk was full
+                    return
+                chunk = zlib.decompress(compressed)
+                for offset in range(0, frames * frame_size, frame_size):
+                    yield FRAME_TIME.unpack_from(chunk, offset)[0], \
+                          chunk[offset + FRAME_TIME.size:offset + frame_size]
@@ -0,0 +1,270 @@
+import random
+import struct
+import threading
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8
+    shared_memory = None
+
+SHM_NAME = "xb1_state"
+# version counter in front of the state packet, odd while the writer is updating the block
+COUNTER = struct.Struct("<I")
+# then the id of the writer, a new writer (the server restarted) creates a new block with a new id
+WRITER_ID = struct.Struct("<I")
+HEADER_SIZE = COUNTER.size + WRITER_ID.size
+# seconds without a new packet before the reader checks that its block is still the one of the writer
+STALE_TIME = 0.5
+# seconds between two reads of the block while waiting for a packet
+WAIT_INTERVAL = 0.0001
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    except TypeError:
+        # python < 3.13 tracks every attached block and would destroy it when the reader exits
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except (ImportError, AttributeError):
+            pass
+        return shm
+
+
+class SharedStateWriter:
+    """
+    class SharedStateWriter
+
+    Publishes the state packets of state_packet.StatePacketEncoder into a named shared memory block, for a synth
+    running on the same machine: no socket and no OSC parsing between the server and the client.
+    The packet is preceded by a version counter used as a sequence lock: it is odd while the packet is written and
+    even once it is complete, so a reader can tell a torn copy from a complete one without any lock. The counter is
+    followed by a random id of the writer, so a reader can tell the block of a restarted server from the old one.
+
+    :Args:
+
+        size: int
+            Size of the state packets, ie.: len(StatePacketEncoder(count)).
+        name: str
+            Name of the shared memory block, the reader must use the same one.
+    """
+    def __init__(self, size, name=SHM_NAME):
+        if shared_memory is None:
+            raise RuntimeError("The shared memory transport requires python 3.8 or newer")
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + size)
+        except FileExistsError:
+            # left over by a server that didn't exit cleanly
+            stale = shared_memory.SharedMemory(name=name, create=False)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + size)
+        self._buf = self._shm.buf
+        self._size = size
+        self._version = 0
+        COUNTER.pack_into(self._buf, 0, 0)
+        WRITER_ID.pack_into(self._buf, COUNTER.size, random.getrandbits(32))
+
+    def publish(self, packet):
+        """
+        Write a state packet, replacing the previous one.
+        """
+        buf = self._buf
+        self._version = (self._version + 1) & 0xFFFFFFFF
+        COUNTER.pack_into(buf, 0, self._version)
+        buf[HEADER_SIZE:HEADER_SIZE + self._size] = packet
+        self._version = (self._version + 1) & 0xFFFFFFFF
+        COUNTER.pack_into(buf, 0, self._version)
+
+    def getName(self):
+        return self._shm.name
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+class SharedStateReader:
+    """
+    class SharedStateReader
+
+    Reads the state packets published by a SharedStateWriter and hands each new one to a
+    state_packet.StatePacketDecoder. Nothing is read until poll() is called, ie.: from a pyo Pattern so the values
+    are picked up by the audio thread, or from a CallbackLoop. A block that doesn't exist yet (the server is not
+    started) is looked for again at each poll. When no new packet came for STALE_TIME seconds, the block is opened
+    again by name: if the server exited the reader waits for the next one, if it restarted the reader moves to the
+    block of the new writer. Both are printed and counted in getStats().
+    The latency of the transport is about half the time between two polls, see SharedStatePoller to poll faster than
+    the audio thread.
+
+    Usage:
+        reader = SharedStateReader(StatePacketDecoder([xb1_controller]))
+        reader_pattern = Pattern(reader.poll, time=0.002).play()
+
+    :Args:
+
+        decoder: StatePacketDecoder
+            Decoder applying the packets to the controllers.
+        name: str
+            Name of the shared memory block given to the writer.
+    """
+    def __init__(self, decoder, name=SHM_NAME):
+        if shared_memory is None:
+            raise RuntimeError("The shared memory transport requires python 3.8 or newer")
+        self._decoder = decoder
+        self._name = name
+        self._shm = None
+        self._buf = None
+        self._version = 0
+        self._writer_id = None
+        self._idle_since = None
+        self._torn = 0
+        self._lost = 0
+        self._reattached = 0
+
+    def _open(self):
+        try:
+            shm = _attach(self._name)
+        except FileNotFoundError:
+            return False
+        self._use(shm)
+        return True
+
+    def _use(self, shm):
+        writer_id = WRITER_ID.unpack_from(shm.buf, COUNTER.size)[0]
+        if self._writer_id is not None:
+            self._reattached += 1
+            print("SharedStateReader: attached to the new block of '{}'".format(self._name))
+        self._shm = shm
+        self._buf = shm.buf
+        self._writer_id = writer_id
+        # the version of the new writer starts over
+        self._version = 0
+        self._idle_since = None
+
+    def _detach(self):
+        self._buf = None
+        self._shm.close()
+        self._shm = None
+
+    def _checkWriter(self):
+        # the block of an exited server is unlinked, the one of a restarted server is a new block under the same name
+        self._idle_since = None
+        try:
+            shm = _attach(self._name)
+        except FileNotFoundError:
+            self._detach()
+            self._lost += 1
+            print("SharedStateReader: the block '{}' is gone, waiting for the server".format(self._name))
+            return
+        if WRITER_ID.unpack_from(shm.buf, COUNTER.size)[0] == self._writer_id:
+            shm.close()
+            return
+        self._detach()
+        self._use(shm)
+
+    def read(self):
+        """
+        Copy the packet published last, if it changed since the previous read.
+        :return: bytes, or None if there is no new packet
+        """
+        if self._buf is None and not self._open():
+            return None
+        buf = self._buf
+        version = COUNTER.unpack_from(buf, 0)[0]
+        if version == self._version or version & 1:
+            now = time.monotonic()
+            if self._idle_since is None:
+                self._idle_since = now
+            elif now - self._idle_since >= STALE_TIME:
+                self._checkWriter()
+            return None
+        self._idle_since = None
+        packet = bytes(buf[HEADER_SIZE:])
+        if COUNTER.unpack_from(buf, 0)[0] != version:
+            # the writer updated the packet while it was copied, the next read gets the new one
+            self._torn += 1
+            return None
+        self._version = version
+        return packet
+
+    def wait(self, timeout, interval=WAIT_INTERVAL):
+        """
+        Wait for a new packet, reading the block every 'interval' seconds.
+        :return: bytes, or None if no new packet came within 'timeout' seconds
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            packet = self.read()
+            if packet is not None:
+                return packet
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+
+    def poll(self, timeout=0., interval=WAIT_INTERVAL):
+        """
+        Apply the packet published last to the controllers, if it changed since the previous poll.
+        :param timeout: seconds to wait for a new packet, see wait()
+        :return: True if a packet was applied
+        """
+        packet = self.wait(timeout, interval) if timeout else self.read()
+        if packet is None:
+            return False
+        return self._decoder.decode(packet)
+
+    def getStats(self):
+        stats = self._decoder.getStats()
+        stats['torn'] = self._torn
+        stats['lost'] = self._lost
+        stats['reattached'] = self._reattached
+        return stats
+
+    def close(self):
+        if self._shm is not None:
+            self._detach()
+
+
+class SharedStatePoller(threading.Thread):
+    """
+    class SharedStatePoller
+
+    Reads a SharedStateReader from its own thread, every 'interval' seconds, and hands the new packets to its decoder.
+    A pyo Pattern can't poll faster than the audio buffer, this thread can, at the cost of the CPU time of the polls.
+
+    Usage:
+        poller = SharedStatePoller(SharedStateReader(StatePacketDecoder([xb1_controller])), 0.0002)
+        ...
+        poller.stop()
+
+    :Args:
+
+        reader: SharedStateReader
+            Reader of the block, closed when the poller is stopped.
+        interval: float
+            Seconds between two reads of the block.
+    """
+    def __init__(self, reader, interval=WAIT_INTERVAL):
+        threading.Thread.__init__(self, daemon=True)
+        self._reader = reader
+        self._interval = interval
+        self._running = True
+        self.start()
+
+    def run(self):
+        while self._running:
+            # wakes up regularly to check if the poller was stopped
+            self._reader.poll(0.2, self._interval)
+
+    def stop(self):
+        self._running = False
+        self.join()
+        self._reader.close()
+
+    def getStats(self):
+        return self._reader.getStats()
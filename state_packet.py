@@ -0,0 +1,230 @@
+import socket
+import struct
+import threading
+
+VERSION = 1
+# a packet further behind the last one than this is taken as a restart of the server, not as a late packet
+RESTART_GAP = 256
+
+# order of the inputs in the packet
+BUTTONS = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'LS', 'RS', 'BACK', 'START', 'XB']
+CONTINUOUS_INPUTS = ['LX', 'LY', 'RX', 'RY', 'LT', 'RT']
+ANALYSIS_PARAMS = ['LXVel', 'LYVel', 'RXVel', 'RYVel', 'LTVel', 'RTVel', 'Density']
+
+# header: version, number of gamepads, sequence number, send time
+HEADER_FORMAT = "BBId"
+# one block per gamepad: button bits, D-Pad x and y, continuous inputs, analysis parameters
+DEVICE_FORMAT = "Hbb{}f{}f".format(len(CONTINUOUS_INPUTS), len(ANALYSIS_PARAMS))
+HEADER_SIZE = struct.calcsize("<" + HEADER_FORMAT)
+DEVICE_SIZE = struct.calcsize("<" + DEVICE_FORMAT)
+# keys of the values of a gamepad block following the button bits, the D-Pad is given as its x and y
+VALUE_KEYS = ['DPAD1', 'DPAD2'] + CONTINUOUS_INPUTS + ANALYSIS_PARAMS
+# number of fields of a gamepad block: the button bits then the values
+DEVICE_FIELDS = 1 + len(VALUE_KEYS)
+
+_structs = {}
+
+
+def getStruct(count):
+    """
+    Get the struct of a packet holding 'count' gamepads. The whole packet is read by one unpack_from.
+    """
+    if count not in _structs:
+        _structs[count] = struct.Struct("<" + HEADER_FORMAT + DEVICE_FORMAT * count)
+    return _structs[count]
+
+
+def decodeStates(packet):
+    """
+    Unpack a state packet into dictionaries, the reverse of StatePacketEncoder.encode.
+    :return: (sequence number, send time, list of (controller values, analysis values) dictionaries)
+    """
+    fields = getStruct(packet[1]).unpack_from(packet)
+    states = []
+    for start in range(4, len(fields), DEVICE_FIELDS):
+        mask = fields[start]
+        values = {key: (mask >> bit) & 1 for bit, key in enumerate(BUTTONS)}
+        values['DPAD'] = (fields[start + 1], fields[start + 2])
+        values.update(zip(CONTINUOUS_INPUTS, fields[start + 3:start + 3 + len(CONTINUOUS_INPUTS)]))
+        analysis = dict(zip(ANALYSIS_PARAMS, fields[start + 3 + len(CONTINUOUS_INPUTS):start + DEVICE_FIELDS]))
+        states.append((values, analysis))
+    return fields[2], fields[3], states
+
+
+class StatePacketEncoder:
+    """
+    class StatePacketEncoder
+
+    Packs the whole state of the gamepads into one fixed layout packet: a header (version, number of gamepads,
+    sequence number and send time) followed by one block per gamepad holding the buttons as bits, the D-Pad, the
+    continuous inputs and the analysis parameters. A single gamepad takes 70 bytes, against about 700 bytes for the
+    OSC bundle. Little-endian, without padding.
+
+    :Args:
+
+        count: int
+            Number of gamepads.
+    """
+    def __init__(self, count=1):
+        self._count = count
+        self._struct = getStruct(count)
+        self._data = bytearray(self._struct.size)
+        self._seq = 0
+
+    def encode(self, now, states):
+        """
+        Pack the state of every gamepad.
+        :param now: send time, as time.time()
+        :param states: list of (controller values, analysis values) dictionaries, one per gamepad
+        :return: the packet. The bytearray is updated in place, so it must be sent before the next call.
+        """
+        args = [VERSION, self._count, self._seq, now]
+        for values, analysis in states:
+            mask = 0
+            for bit, key in enumerate(BUTTONS):
+                if values[key]:
+                    mask |= 1 << bit
+            dpad = values['DPAD']
+            args.append(mask)
+            args.append(dpad[0])
+            args.append(dpad[1])
+            args.extend([values[key] for key in CONTINUOUS_INPUTS])
+            args.extend([analysis[key] for key in ANALYSIS_PARAMS])
+        self._struct.pack_into(self._data, 0, *args)
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        return self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StatePacketDecoder:
+    """
+    class StatePacketDecoder
+
+    Unpacks the packets of StatePacketEncoder with one struct.unpack_from and feeds the values straight into the
+    controllers with Controller.mainDataCallback, so only the objects whose value changed are updated. The buttons
+    are only given when their bits changed.
+    Packets older than the last one applied (reordered or duplicated by the network) are ignored, and the gaps in
+    the sequence numbers are counted as lost. A packet behind the last one by more than RESTART_GAP, or sent later
+    than it, comes from a restarted server whose sequence numbers start over: the decoder starts over with it and
+    gives every button again.
+
+    :Args:
+
+        controllers: list
+            Controller objects, one per gamepad in the order of the server, ie.: list(ControllerGroup(4)).
+    """
+    def __init__(self, controllers):
+        self._controllers = list(controllers)
+        count = len(self._controllers)
+        self._struct = getStruct(count)
+        self._count = count
+        self._last_seq = None
+        self._last_time = None
+        self._previous_masks = [None] * count
+        self._received = 0
+        self._lost = 0
+        self._late = 0
+        self._rejected = 0
+        self._restarts = 0
+
+    def decode(self, data):
+        """
+        Apply a packet to the controllers.
+        :return: False if the packet was ignored
+        """
+        if len(data) < HEADER_SIZE or data[0] != VERSION or data[1] != self._count or \
+                len(data) < self._struct.size:
+            self._rejected += 1
+            return False
+        fields = self._struct.unpack_from(data)
+        seq = fields[2]
+        send_time = fields[3]
+        if self._last_seq is not None:
+            gap = (seq - self._last_seq) & 0xFFFFFFFF
+            if gap == 0 or gap >= 0x80000000:
+                # a late packet was sent before the last one, the first packets of a restarted server after it
+                if gap != 0 and gap < 0x100000000 - RESTART_GAP or send_time > self._last_time:
+                    self._restart()
+                else:
+                    self._late += 1
+                    return False
+            else:
+                self._lost += gap - 1
+        self._last_seq = seq
+        self._last_time = send_time
+        self._received += 1
+
+        ncontinuous = len(CONTINUOUS_INPUTS)
+        for i, ctl in enumerate(self._controllers):
+            ctl.stampSendTime(send_time)
+            start = 4 + i * DEVICE_FIELDS
+            values = dict(zip(CONTINUOUS_INPUTS, fields[start + 3:start + 3 + ncontinuous]))
+            values['DPAD'] = [fields[start + 1], fields[start + 2]]
+            mask = fields[start]
+            if mask != self._previous_masks[i]:
+                self._previous_masks[i] = mask
+                values.update((key, (mask >> bit) & 1) for bit, key in enumerate(BUTTONS))
+            ctl.mainDataCallback(values, dict(zip(ANALYSIS_PARAMS, fields[start + 3 + ncontinuous:
+                                                                            start + DEVICE_FIELDS])))
+        return True
+
+    def _restart(self):
+        # the state of the new server is applied whole
+        self._restarts += 1
+        self._previous_masks = [None] * self._count
+
+    def getStats(self):
+        """
+        :return: dict of the number of packets received, lost, late (reordered or duplicated) and rejected, and of
+            the restarts of the server
+        """
+        return {'received': self._received, 'lost': self._lost, 'late': self._late, 'rejected': self._rejected,
+                'restarts': self._restarts}
+
+
+class StatePacketReceiver(threading.Thread):
+    """
+    class StatePacketReceiver
+
+    Receives the state packets on a UDP port and hands them to a StatePacketDecoder, from its own thread.
+
+    :Args:
+
+        port: int
+            UDP port the server sends to.
+        decoder: StatePacketDecoder
+            Decoder applying the packets to the controllers.
+        ip: str
+            Address to listen on, all the interfaces by default.
+    """
+    def __init__(self, port, decoder, ip=""):
+        threading.Thread.__init__(self, daemon=True)
+        self._decoder = decoder
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((ip, port))
+        # wakes up regularly to check if the receiver was stopped
+        self._socket.settimeout(0.2)
+        self._running = True
+        self.start()
+
+    def run(self):
+        buffer = bytearray(2048)
+        view = memoryview(buffer)
+        while self._running:
+            try:
+                size = self._socket.recv_into(buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self._decoder.decode(view[:size])
+
+    def stop(self):
+        self._running = False
+        self.join()
+        self._socket.close()
+
+    def getStats(self):
+        return self._decoder.getStats()
@@ -0,0 +1,23 @@
+# display state shared by the server's backends, usable without pygame
+
+
+class Struct(dict):
+    def __init__(self, **kwargs):
+        dict.__init__(self, **kwargs)
+        self.__dict__.update(**kwargs)
+
+    def __getitem__(self, item):
+        return getattr(self, item)
+
+    def getDynamicValue(self, name):
+        def getter():
+            return getattr(self, name)
+        return getter
+
+
+def stick_center_snap(value, snap=0.1):
+    # Feeble attempt to compensate for calibration and loose stick.
+    if value >= snap or value <= -snap:
+        return value
+    else:
+        return 0.0